@@ -0,0 +1,59 @@
+"""
+Micro-benchmark of packet framing
+
+Compare the legacy bytearray.split loop of Instrument.data_received with PacketFramer
+on synthetic ASCII frames received in chunks of various sizes.
+
+    python -m benchmarks.bench_framer
+"""
+from timeit import default_timer
+from inlinino.instruments import PacketFramer
+
+TERMINATOR = b'\r\n'
+FRAME = b'03/15/21\t12:00:00\t700\t4130\t532\t4130\t650\t4130\t538'
+N_FRAMES = 20000
+CHUNK_SIZES = [16, 256, 4096, 65536, N_FRAMES * (len(FRAME) + len(TERMINATOR))]
+
+
+def legacy_framing(stream, chunk_size):
+    buffer, packets = bytearray(), []
+    for i in range(0, len(stream), chunk_size):
+        buffer.extend(stream[i:i + chunk_size])
+        while TERMINATOR in buffer:
+            packet, buffer = buffer.split(TERMINATOR, 1)
+            packets.append(packet)
+    return packets
+
+
+def framer_framing(stream, chunk_size):
+    framer, packets = PacketFramer(TERMINATOR), []
+    for i in range(0, len(stream), chunk_size):
+        for packet in framer.feed(stream[i:i + chunk_size]):
+            packets.append(bytes(packet))
+    return packets
+
+
+def timeit(f, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = default_timer()
+        result = f(*args)
+        best = min(best, default_timer() - start)
+    return best, result
+
+
+def main():
+    stream = (FRAME + TERMINATOR) * N_FRAMES
+    print(f'{N_FRAMES} frames of {len(FRAME)} bytes')
+    print(f'{"chunk (bytes)":>14} {"legacy (frames/s)":>18} {"framer (frames/s)":>18} {"speedup":>8}')
+    for chunk_size in CHUNK_SIZES:
+        t_legacy, p_legacy = timeit(legacy_framing, stream, chunk_size, repeat=1 if chunk_size > 65536 else 3)
+        t_framer, p_framer = timeit(framer_framing, stream, chunk_size)
+        if p_legacy != p_framer:
+            raise RuntimeError('Framing results differ.')
+        print(f'{chunk_size:>14} {N_FRAMES / t_legacy:>18.0f} {N_FRAMES / t_framer:>18.0f} '
+              f'{t_legacy / t_framer:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Import time report of Inlinino entry points and instrument modules
+
+Each target is imported in a fresh interpreter with python -X importtime to report its total
+import time and the top-level packages contributing the most to it. Results can be saved as
+a baseline and compared to a previous baseline to catch startup regressions between releases
+(exit code is 1 if a regression is found).
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import inlinino.cli --top 10
+    python -m benchmarks.bench_import --save-baseline benchmarks/baseline_import.json
+    python -m benchmarks.bench_import --compare benchmarks/baseline_import.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from collections import defaultdict
+
+from inlinino.instruments.registry import BUILTIN_INSTRUMENTS
+
+REPEAT = 3  # imports per target, best is reported
+TOP = 5  # packages reported per target
+REGRESSION_THRESHOLD = 0.2  # relative slow down considered as a regression
+TARGETS = ['inlinino', 'inlinino.acquisition', 'inlinino.cli', 'inlinino.replay', 'inlinino.gui'] + \
+          sorted(set(target.split(':')[0] for target in BUILTIN_INSTRUMENTS.values()))
+
+
+def import_time(target):
+    """
+    Import target in a fresh interpreter
+    :param target: name of module to import
+    :return: total import time (ms) and dictionary of import time (ms) by top-level package (self time)
+    """
+    p = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr.strip().splitlines()[-1])
+    total, packages = 0, defaultdict(float)
+    for line in p.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1000
+        if name.strip() == target:
+            total = int(cumulative_us) / 1000
+    return total, packages
+
+
+def run(targets):
+    results = {}
+    for target in targets:
+        try:
+            best = None
+            for _ in range(REPEAT):
+                total, packages = import_time(target)
+                if best is None or total < best[0]:
+                    best = total, packages
+            total, packages = best
+            results[target] = {'ms': total, 'packages': dict(sorted(packages.items(), key=lambda x: -x[1]))}
+        except Exception as e:
+            results[target] = {'error': f'{e.__class__.__name__}: {e}'}
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name, {})
+        if 'ms' in result and 'ms' in reference and result['ms'] > reference['ms'] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_import', description=__doc__.split('\n')[1])
+    parser.add_argument('targets', nargs='*', default=TARGETS, help='modules to import (default: %(default)s)')
+    parser.add_argument('--top', type=int, default=TOP, help='packages reported per target (default: %(default)s)')
+    parser.add_argument('--save-baseline', metavar='FILE', help='save results to json file')
+    parser.add_argument('--compare', metavar='FILE', help='compare results to baseline json file')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='relative slow down reported as regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    results = run(args.targets)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(f'{"target":<32} {"ms":>8} {"baseline":>9}  top packages (ms)')
+    for name, result in results.items():
+        if 'error' in result:
+            print(f'{name:<32} {result["error"]}')
+            continue
+        reference = baseline.get('results', {}).get(name, {}).get('ms')
+        top = ', '.join(f'{k} {v:.0f}' for k, v in list(result['packages'].items())[:args.top])
+        print(f'{name:<32} {result["ms"]:>8.1f} ' +
+              (f'{result["ms"] / reference - 1:>+9.0%}' if reference else f'{"-":>9}') + f'  {top}')
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(), 'results': results},
+                      f, indent=2)
+        print(f'Baseline saved to {args.save_baseline}')
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'Regression (>{args.threshold:.0%} slower): {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Throughput benchmark of the formatting of rows of log files
+
+Rows typical of each instrument module are formatted with the original implementation of Log.write
+(strftime and each precision applied separately on every row) and with RowFormatter (format string
+joined once and date and time cached per second) to report rows per second before and after. Both
+outputs are checked to be identical. Results can be saved as a baseline and compared to a previous
+baseline to catch regressions between releases (exit code is 1 if a regression is found).
+
+    python -m benchmarks.bench_log
+    python -m benchmarks.bench_log --save-baseline benchmarks/baseline_log.json
+    python -m benchmarks.bench_log --compare benchmarks/baseline_log.json
+"""
+import argparse
+import json
+import platform
+import sys
+from time import gmtime, strftime
+from timeit import default_timer
+
+import numpy as np
+
+from inlinino import __version__
+from inlinino.log import RowFormatter
+
+MIN_DURATION = 0.5  # seconds, minimum duration of each measurement
+REPEAT = 3  # measurements per case, best is reported
+REGRESSION_THRESHOLD = 0.2  # relative slow down considered as a regression
+N_ROWS = 10000  # rows per case
+START = 1615809600.0  # 2021-03-15 12:00:00
+
+
+def legacy_format(precision, data, timestamp):
+    # Log.write before RowFormatter
+    if precision:
+        return strftime('%Y/%m/%d %H:%M:%S', gmtime(timestamp)) + ("%.3f" % timestamp)[-4:] + \
+               ', ' + ', '.join(p % d for p, d in zip(precision, data)) + '\n'
+    else:
+        return strftime('%Y/%m/%d %H:%M:%S', gmtime(timestamp)) + ("%.3f" % timestamp)[-4:] + \
+               ', ' + ', '.join(str(d) for d in data) + '\n'
+
+
+# Cases: name -> (variable_precision, rows as list of (data, timestamp))
+def case_generic():
+    return ['%d', '%d', '%d'], [([4130 + k % 7, 4129, 4128 - k % 5], START + k) for k in range(N_ROWS)]
+
+
+def case_acs():
+    rng = np.random.default_rng(0)
+    c, a = rng.random(85), rng.random(85)
+    c, a = np.array2string(c, max_line_width=np.inf), np.array2string(a, max_line_width=np.inf)
+    return ['%d', '%s', '%s', '%.2f', '%.2f', '%s'], \
+           [([123456 + 250 * k, c, a, 25.1234, 18.5678, False], START + 0.25 * k) for k in range(N_ROWS)]
+
+
+def case_dataq():
+    return ['%.3f', '%.3f', '%.5f'], \
+           [([1.2345 + k * 1e-4, 0.5678, -0.01234], START + 0.001 * k) for k in range(N_ROWS)]
+
+
+def case_hyperbb():
+    row = list(np.linspace(0, 3000, 32))
+    return [], [(row, START + 0.5 * k) for k in range(N_ROWS // 10)]
+
+
+CASES = {'generic': case_generic, 'acs': case_acs, 'dataq': case_dataq, 'hyperbb': case_hyperbb}
+
+
+def measure(format_rows, n_rows):
+    best = float('inf')
+    n = max(1, int(MIN_DURATION / max(1e-9, _time(format_rows))))
+    for _ in range(REPEAT):
+        start = default_timer()
+        for _ in range(n):
+            format_rows()
+        best = min(best, (default_timer() - start) / n)
+    return n_rows / best
+
+
+def _time(function):
+    start = default_timer()
+    function()
+    return default_timer() - start
+
+
+def run(cases):
+    results = {}
+    for name in cases:
+        precision, rows = CASES[name]()
+        formatter = RowFormatter(precision)
+        if [legacy_format(precision, d, t) for d, t in rows] != [formatter(d, t) for d, t in rows]:
+            results[name] = {'error': 'Output of RowFormatter differs from original implementation'}
+            continue
+
+        def before():
+            for data, timestamp in rows:
+                legacy_format(precision, data, timestamp)
+
+        def after():
+            f = RowFormatter(precision)
+            for data, timestamp in rows:
+                f(data, timestamp)
+
+        results[name] = {'rows_per_second_before': measure(before, len(rows)),
+                         'rows_per_second': measure(after, len(rows))}
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name, {})
+        if 'rows_per_second' in result and 'rows_per_second' in reference and \
+                result['rows_per_second'] * (1 + threshold) < reference['rows_per_second']:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_log', description=__doc__.split('\n')[1])
+    parser.add_argument('cases', nargs='*', default=list(CASES.keys()), help='cases to run (default: all)')
+    parser.add_argument('--save-baseline', metavar='FILE', help='save results to json file')
+    parser.add_argument('--compare', metavar='FILE', help='compare results to baseline json file')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='relative slow down reported as regression (default: %(default)s)')
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in CASES.keys():
+            parser.error(f'unknown case {name}, available: {", ".join(CASES.keys())}')
+
+    results = run(args.cases)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(f'{"case":<10} {"before rows/s":>14} {"rows/s":>12} {"speedup":>8} {"baseline":>10}')
+    for name, result in results.items():
+        if 'error' in result:
+            print(f'{name:<10} {result["error"]}')
+            continue
+        reference = baseline.get('results', {}).get(name, {}).get('rows_per_second')
+        print(f'{name:<10} {result["rows_per_second_before"]:>14.0f} {result["rows_per_second"]:>12.0f} '
+              f'{result["rows_per_second"] / result["rows_per_second_before"]:>7.1f}x ' +
+              (f'{result["rows_per_second"] / reference - 1:>+9.0%}' if reference else f'{"-":>10}'))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'inlinino': __version__, 'python': platform.python_version(),
+                       'platform': platform.platform(), 'results': results}, f, indent=2)
+        print(f'Baseline saved to {args.save_baseline}')
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'Regression (>{args.threshold:.0%} slower): {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Throughput benchmark of the parsers of every instrument module
+
+Synthetic, but realistic, frames are parsed repeatedly by each instrument module (or parser)
+to report frames per second, microseconds per frame, and peak memory allocated per frame
+(tracemalloc). Results can be saved as a baseline and compared to a previous baseline to catch
+regressions between releases (exit code is 1 if a regression is found).
+
+    python -m benchmarks.bench_parsers
+    python -m benchmarks.bench_parsers --save-baseline benchmarks/baseline_parsers.json
+    python -m benchmarks.bench_parsers --compare benchmarks/baseline_parsers.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+from struct import pack
+from timeit import default_timer
+
+import numpy as np
+
+from inlinino import CFG, package_dir, __version__
+from inlinino.acquisition import AcquisitionManager
+from inlinino.signals import HeadlessSignals
+
+MIN_DURATION = 0.5  # seconds, minimum duration of each measurement
+REPEAT = 3  # measurements per case, best is reported
+REGRESSION_THRESHOLD = 0.2  # relative slow down considered as a regression
+PATH_TO_DEVICE_FILES = os.path.join(package_dir, 'cfg')
+TMP_DIR = tempfile.mkdtemp(prefix='inlinino_bench_')
+
+
+def load_instrument(module, **cfg):
+    """
+    Load instrument module with a temporary configuration (not saved) and without user interface
+    """
+    cfg = dict(model='Bench', serial_number=module, module=module, log_path=TMP_DIR, log_raw=False,
+               log_products=False, **cfg)
+    CFG.instruments.append(cfg)
+    try:
+        return AcquisitionManager(HeadlessSignals).load(len(CFG.instruments) - 1)
+    finally:
+        CFG.instruments.pop()
+
+
+def write_tmp_file(name, content):
+    filename = os.path.join(TMP_DIR, name)
+    with open(filename, 'w') as f:
+        f.write(content)
+    return filename
+
+
+def nmea_sentence(body):
+    checksum = 0
+    for c in body.encode('ascii'):
+        checksum ^= c
+    return ('$%s*%02X' % (body, checksum)).encode('ascii')
+
+
+# Cases: name -> setup function returning (parse function, frame)
+def case_generic():
+    instrument = load_instrument('generic', terminator=b'\r\n', separator=b'\t',
+                                 variable_names=['beta470', 'beta532', 'beta660'],
+                                 variable_units=['counts', 'counts', 'counts'], variable_columns=[3, 5, 7],
+                                 variable_types=['int', 'int', 'int'], variable_precision=['%d', '%d', '%d'])
+    return instrument.parse, b'03/15/21\t12:00:00\t470\t4130\t532\t4129\t660\t4128\t538'
+
+
+def case_acs():
+    instrument = load_instrument('acs', device_file=os.path.join(PATH_TO_DEVICE_FILES, 'acs301_20180129.dev'))
+    parser = instrument._parser
+    n = parser.output_wavelength
+    header = pack('!HBBlHHHHHHHIBB', parser.frame_length, 5, 1, int(parser.serial_number, 16),
+                  1520, 0, 1510, 32000, 48000, 1530, 1540, 123456, 1, n)
+    counts = b''.join(pack('!HHHH', 2800 + k, 2500 + k, 2700 + k, 2400 + k) for k in range(n))
+    frame = instrument.REGISTRATION_BYTES + header + counts
+    frame += pack('!H', sum(frame) % 65536) + b'\x00'
+    return instrument.parse, frame
+
+
+def case_lisst():
+    from inlinino.instruments.lisst import LISSTParser
+    parser = LISSTParser(os.path.join(PATH_TO_DEVICE_FILES, 'LISST1183_20180119_InstrumentData.txt'),
+                         os.path.join(PATH_TO_DEVICE_FILES, 'LISST1183_20180119_Lisst.ini'),
+                         write_tmp_file('bench_ringarea.asc', '  '.join(['1.0'] * 32)),
+                         write_tmp_file('bench_zsc.asc', '\n'.join(['100'] * 32 + ['1500', '1800', '0', '1200',
+                                                                                    '0', '2000', '1512', '1200'])))
+    values = [str(200 + 10 * k) for k in range(32)] + ['1450', '1750', '0', '1180', '0', '2100', '1513', '1230']
+    packet = ('\r\n{\r\n' + '\r\n'.join(values) + '\r\n}\r\n').encode(parser.ENCODING)
+
+    def parse(packet):
+        return parser.calibrate(parser.unpack_packet(packet))
+    return parse, packet
+
+
+def case_hyperbb():
+    from inlinino.instruments.hyperbb import HyperBBParser
+    parser = HyperBBParser(os.path.join(PATH_TO_DEVICE_FILES, 'HBB8005_CalPlaque_20210315.mat'),
+                           os.path.join(PATH_TO_DEVICE_FILES, 'HBB8005_CalTemp_20210315.mat'))
+    wl = int(parser.wavelength[len(parser.wavelength) // 2])
+    packet = ('1 12 2021-03-15 12:00:00 100 %d 500 3 1000 2000.0 10.0 1500.0 10.0 100.0 1.0 90.0 1.0 '
+              '2100.0 10.0 2200.0 10.0 110.0 1.0 120.0 1.0 25.0 20.0 5.0 0 0' % wl).encode()
+
+    def parse(packet):
+        return parser.calibrate(np.array([parser.parse(packet)], dtype=float))
+    return parse, packet
+
+
+def case_sunav2():
+    calibration_file = write_tmp_file('bench_suna.cal', 'C0 189.0\nC1 0.7\nC2 0.0\nC3 0.0\nC4 0.0\n')
+    instrument = load_instrument('sunav2', calibration_file=calibration_file)
+    values = ['SATSLF1504', '2021074', '12.500000', '25.31', '0.3546', '0.1234', '0.0456', '0.00',
+              '20000', '500', '1'] + [str(10000 + 20 * k) for k in range(instrument.N_CHANNELS)] + \
+             ['20.1', '19.8', '22.4', '3600', '5.2', '12.1', '11.5', '5.0', '400',
+              '0.01', '0.02', '0.0001', '0.000002', '0.000100', '0', '0.0000', '0.0000', '0.0000', '123']
+    return instrument.parse, ','.join(values).encode('ascii')
+
+
+def case_nmea():
+    instrument = load_instrument('nmea', variable_names=['datetime', 'latitude', 'longitude', 'altitude',
+                                                         'gps_qual', 'num_sats', 'horizontal_dil'],
+                                 variable_units=['', 'degN', 'degE', 'm', '', 'count', 'm'],
+                                 variable_types=['str', 'float', 'float', 'float', 'int', 'float', 'float'],
+                                 variable_precision=['%s', '%.6f', '%.6f', '%.2f', '%s', '%.1f', '%.1f'])
+    return instrument.parse, nmea_sentence('GPGGA,120000.00,4351.5381,N,06940.3412,W,1,09,0.9,12.3,M,-31.2,M,,')
+
+
+def case_taratsg():
+    instrument = load_instrument('taratsg')
+    return instrument.parse, b't1= 18.1234, c1= 4.56789, s= 35.1234, sv=1512.345, t2= 18.2345'
+
+
+def case_dataq():
+    instrument = load_instrument('dataq', channels_enabled=[0, 1, 2, 3])
+    return instrument.parse, b'1.2345,0.5678,-0.1234,2.3456'
+
+
+CASES = {'generic': case_generic, 'acs': case_acs, 'lisst': case_lisst, 'hyperbb': case_hyperbb,
+         'sunav2': case_sunav2, 'nmea': case_nmea, 'taratsg': case_taratsg, 'dataq': case_dataq}
+
+
+def measure(parse, frame):
+    # Calibrate number of iterations to last at least MIN_DURATION
+    n = 1
+    while True:
+        start = default_timer()
+        for _ in range(n):
+            parse(frame)
+        elapsed = default_timer() - start
+        if elapsed >= MIN_DURATION / 10:
+            break
+        n *= 10
+    n = max(1, int(n * MIN_DURATION / elapsed))
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = default_timer()
+        for _ in range(n):
+            parse(frame)
+        best = min(best, (default_timer() - start) / n)
+    # Memory allocated while parsing a single frame
+    tracemalloc.start()
+    current = tracemalloc.get_traced_memory()[0]
+    parse(frame)
+    peak = tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return {'frames_per_second': 1 / best, 'us_per_frame': best * 1e6, 'peak_bytes_per_frame': peak}
+
+
+def run(cases):
+    results = {}
+    for name in cases:
+        try:
+            parse, frame = CASES[name]()
+            parse(frame)  # Check frame is valid and warm up
+            results[name] = measure(parse, frame)
+        except Exception as e:
+            results[name] = {'error': f'{e.__class__.__name__}: {e}'}
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name, {})
+        if 'us_per_frame' in result and 'us_per_frame' in reference and \
+                result['us_per_frame'] > reference['us_per_frame'] * (1 + threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_parsers', description=__doc__.split('\n')[1])
+    parser.add_argument('cases', nargs='*', default=list(CASES.keys()), help='cases to run (default: all)')
+    parser.add_argument('--save-baseline', metavar='FILE', help='save results to json file')
+    parser.add_argument('--compare', metavar='FILE', help='compare results to baseline json file')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='relative slow down reported as regression (default: %(default)s)')
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in CASES.keys():
+            parser.error(f'unknown case {name}, available: {", ".join(CASES.keys())}')
+
+    logging.getLogger().setLevel(logging.ERROR)  # Silence instruments (e.g. warnings on parsing)
+    results = run(args.cases)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(f'{"case":<10} {"frames/s":>12} {"us/frame":>10} {"peak B/frame":>13} {"baseline":>10}')
+    for name, result in results.items():
+        if 'error' in result:
+            print(f'{name:<10} {result["error"]}')
+            continue
+        reference = baseline.get('results', {}).get(name, {}).get('us_per_frame')
+        print(f'{name:<10} {result["frames_per_second"]:>12.0f} {result["us_per_frame"]:>10.2f} '
+              f'{result["peak_bytes_per_frame"]:>13d} ' +
+              (f'{result["us_per_frame"] / reference - 1:>+9.0%}' if reference else f'{"-":>10}'))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'inlinino': __version__, 'python': platform.python_version(),
+                       'platform': platform.platform(), 'results': results}, f, indent=2)
+        print(f'Baseline saved to {args.save_baseline}')
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'Regression (>{args.threshold:.0%} slower): {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
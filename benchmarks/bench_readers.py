@@ -0,0 +1,137 @@
+"""
+Throughput benchmark of the readers of binary log files
+
+A binary file of synthetic ACS frames (with pad bytes and corrupted frames in between) is logged
+with LogBinary, then read into an array of frames and timestamps, frame by frame with iter_bin and
+at once with read_bin (vectorized), to report megabytes per second of each reader. Both readers are
+checked to return the same frames.
+Results can be saved as a baseline and compared to a previous baseline to catch regressions
+between releases (exit code is 1 if a regression is found).
+
+    python -m benchmarks.bench_readers
+    python -m benchmarks.bench_readers --save-baseline benchmarks/baseline_readers.json
+    python -m benchmarks.bench_readers --compare benchmarks/baseline_readers.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from struct import pack
+from timeit import default_timer
+
+import numpy as np
+
+from inlinino import __version__, package_dir
+from inlinino.log import LogBinary
+from inlinino.readers import iter_bin, read_bin
+
+REPEAT = 3  # measurements per reader, best is reported
+REGRESSION_THRESHOLD = 0.2  # relative slow down considered as a regression
+N_FRAMES = 50000  # frames logged (about 35 MB for an ACS with 82 wavelengths)
+START = 1615809600.0  # 2021-03-15 12:00:00
+DEVICE_FILE = os.path.join(package_dir, 'cfg', 'acs301_20180129.dev')
+REGISTRATION = b'\xff\x00\xff\x00'
+
+
+def write_acs_file(path, n_frames=N_FRAMES):
+    from pyACS.acs import ACS as ACSParser
+    parser = ACSParser(DEVICE_FILE)
+    n = parser.output_wavelength
+    rng = np.random.default_rng(0)
+    log = LogBinary({'path': path, 'filename_prefix': 'Bench', 'length': 24 * 60, 'asynchronous': False})
+    for k in range(n_frames):
+        header = pack('!HBBlHHHHHHHIBB', parser.frame_length, 5, 1, int(parser.serial_number, 16),
+                      1520, 0, 1510, 32000, 48000, 1530, 1540, 123456 + 250 * k, 1, n)
+        frame = REGISTRATION + header + rng.integers(0, 65536, 4 * n).astype('>u2').tobytes()
+        if k % 100 == 0:
+            log.write(b'\x00')  # Pad byte
+        if k % 1000 == 0:
+            log.write(REGISTRATION + b'\x00' * 10)  # Corrupted frame
+        log.write(frame + pack('!H', sum(frame) % 65536) + b'\x00', START + 0.25 * k)
+    filename = os.path.join(path, log.filename)
+    log.close()
+    return filename, parser.frame_length
+
+
+def iter_bin_to_array(filename, frame_length):
+    frames, timestamps = [], []
+    for data, timestamp in iter_bin(filename, REGISTRATION, frame_length):
+        frames.append(data[-frame_length:])
+        timestamps.append(timestamp)
+    return np.frombuffer(b''.join(frames), np.uint8).reshape(-1, frame_length), np.array(timestamps)
+
+
+def measure(function):
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = default_timer()
+        function()
+        best = min(best, default_timer() - start)
+    return best
+
+
+def run():
+    path = tempfile.mkdtemp(prefix='inlinino_bench_')
+    try:
+        filename, frame_length = write_acs_file(path)
+        size = os.path.getsize(filename)
+        frames, timestamps = iter_bin_to_array(filename, frame_length)
+        records = read_bin(filename, REGISTRATION, frame_length)
+        if not np.array_equal(frames, records['frame']) or not np.array_equal(timestamps, records['time']):
+            return {'error': 'Frames read by read_bin differ from iter_bin'}
+        return {'iter_bin': {'mb_per_second': size / 1e6 / measure(lambda: iter_bin_to_array(filename, frame_length))},
+                'read_bin': {'mb_per_second': size / 1e6 / measure(
+                    lambda: read_bin(filename, REGISTRATION, frame_length))}}
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name, {})
+        if 'mb_per_second' in result and 'mb_per_second' in reference and \
+                result['mb_per_second'] * (1 + threshold) < reference['mb_per_second']:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_readers', description=__doc__.split('\n')[1])
+    parser.add_argument('--save-baseline', metavar='FILE', help='save results to json file')
+    parser.add_argument('--compare', metavar='FILE', help='compare results to baseline json file')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='relative slow down reported as regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    results = run()
+    if 'error' in results:
+        print(results['error'])
+        sys.exit(1)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print(f'{"reader":<10} {"MB/s":>8} {"baseline":>10}')
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name, {}).get('mb_per_second')
+        print(f'{name:<10} {result["mb_per_second"]:>8.0f} ' +
+              (f'{result["mb_per_second"] / reference - 1:>+9.0%}' if reference else f'{"-":>10}'))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'inlinino': __version__, 'python': platform.python_version(),
+                       'platform': platform.platform(), 'results': results}, f, indent=2)
+        print(f'Baseline saved to {args.save_baseline}')
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'Regression (>{args.threshold:.0%} slower): {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -86,33 +86,126 @@ CFG = Cfg()
 
 
 class RingBuffer:
-    # Ring buffer based on numpy.roll for np.array
+    # Circular buffer for np.array, values are written in place at a write index (no copy of the buffer)
     # Same concept as FIFO except that the size of the numpy array does not vary
-    def __init__(self, _length, _dtype=None):
+    # Values of several channels are stored in the columns of a single 2-D array
+    def __init__(self, _length, _dtype=None, _channels=None):
         # initialize buffer with NaN values
         # length correspond to the size of the buffer
+        # channels correspond to the number of columns of a 2-D buffer (None for a 1-D buffer)
+        shape = (_length,) if _channels is None else (_length, _channels)
         if _dtype is None:
-            self.data = np.empty(_length)  # np.dtype = float64
-            self.data[:] = np.NAN
+            self._data = np.empty(shape)  # np.dtype = float64
+            self._data[:] = np.NAN
         else:
             # type needs to be compatible with np.NaN
-            self.data = np.empty(_length, dtype=_dtype)
-            self.data[:] = None
+            self._data = np.empty(shape, dtype=_dtype)
+            self._data[:] = None
+        self.length = _length
+        self.channels = _channels
+        self._index = 0  # position of next value written, which is the oldest value
 
     def extend(self, _x):
-        # Add np.array at the end of the buffer
-        x = np.array(_x, copy=False)  # dtype=None
-        step = x.size
-        self.data = np.roll(self.data, -step)
-        self.data[-step:] = x
-
-    def get(self, _n=1):
-        # return the most recent n element(s) in buffer
-        return self.data[-1 * _n:]
-
-    def getleft(self, _n=1):
-        # return the oldest n element(s) in buffer
-        return self.data[0:_n]
+        # Add np.array at the end of the buffer (rows of channels for a 2-D buffer)
+        x = np.asarray(_x)
+        x = x.reshape(-1) if self.channels is None else x.reshape(-1, self.channels)
+        step = len(x)
+        if step >= self.length:
+            self._data[:] = x[-self.length:]
+            self._index = 0
+            return
+        end = self._index + step
+        if end <= self.length:
+            self._data[self._index:end] = x
+        else:
+            split = self.length - self._index
+            self._data[self._index:] = x[:split]
+            self._data[:step - split] = x[split:]
+        self._index = end % self.length
+
+    def _ordered(self, start, n, copy):
+        # n element(s) from start (position relative to the oldest element), a view unless wrapping or copy
+        start = (self._index + start) % self.length
+        if start + n <= self.length:
+            data = self._data[start:start + n]
+            return data.copy() if copy else data
+        return np.concatenate((self._data[start:], self._data[:start + n - self.length]))
+
+    def get(self, _n=1, copy=False):
+        # return the most recent n element(s) in buffer, oldest first
+        # n is bounded by the length of the buffer, get(0) is empty (np.roll version returned the whole buffer)
+        n = min(max(_n, 0), self.length)
+        return self._ordered(self.length - n, n, copy)
+
+    def getleft(self, _n=1, copy=False):
+        # return the oldest n element(s) in buffer, getleft(0) is empty
+        return self._ordered(0, min(max(_n, 0), self.length), copy)
+
+    @property
+    def data(self):
+        # all elements in buffer, oldest first
+        return self.get(self.length)
 
     def __str__(self):
         return str(self.data)
+
+
+class History:
+    # Time series of several channels kept at multiple resolutions, to plot long periods at constant cost
+    # Level 0 holds the values received, each next level holds the min and max of FACTOR elements of the level below
+    # Levels are updated incrementally as values are added, each level keeps the same number of elements
+    FACTOR = 10
+    LEVELS = 4  # values, min/max of 10, 100, and 1000 values
+
+    def __init__(self, _length, _channels):
+        # length correspond to the number of elements kept at each level
+        self.channels = _channels
+        self._time = [RingBuffer(_length) for _ in range(self.LEVELS)]  # time of first value of elements
+        self._min = [RingBuffer(_length, _channels=_channels) for _ in range(self.LEVELS)]  # values at level 0
+        self._max = [None] + [RingBuffer(_length, _channels=_channels) for _ in range(1, self.LEVELS)]
+        # Elements of decimated levels being accumulated
+        self._bin_time = [None] * self.LEVELS
+        self._bin_min = np.empty((self.LEVELS, _channels))
+        self._bin_max = np.empty((self.LEVELS, _channels))
+        self._bin_count = [0] * self.LEVELS
+
+    def extend(self, _x, _timestamp):
+        # Add values of channels received at timestamp, and update decimated levels
+        x = np.asarray(_x, dtype=float).reshape(self.channels)
+        self._time[0].extend(_timestamp)
+        self._min[0].extend(x)
+        t, lo, hi = _timestamp, x, x
+        for level in range(1, self.LEVELS):
+            if self._bin_count[level] == 0:
+                self._bin_time[level] = t
+                self._bin_min[level] = lo
+                self._bin_max[level] = hi
+            else:
+                np.fmin(self._bin_min[level], lo, out=self._bin_min[level])  # NaN are ignored
+                np.fmax(self._bin_max[level], hi, out=self._bin_max[level])
+            self._bin_count[level] += 1
+            if self._bin_count[level] < self.FACTOR:
+                break
+            # Element complete, added to level and accumulated in next level
+            t, lo, hi = self._bin_time[level], self._bin_min[level], self._bin_max[level]
+            self._time[level].extend(t)
+            self._min[level].extend(lo)
+            self._max[level].extend(hi)
+            self._bin_count[level] = 0
+
+    def get(self, _start, _max_elements=1000):
+        # return time and values of channels since start, from the finest level holding the whole period
+        # in less than max elements (or the coarsest level), elements of decimated levels are returned as
+        # two values (min then max) at the same time so curves show the range of values of each element
+        for level in range(self.LEVELS):
+            t = self._time[level].data
+            oldest = t[0]  # NaN until level is full, holding all values received
+            n = len(t) - np.searchsorted(t, _start) if not np.isnan(oldest) else np.count_nonzero(t >= _start)
+            if (np.isnan(oldest) or oldest <= _start) and n <= _max_elements or level == self.LEVELS - 1:
+                break
+        t = t[len(t) - n:]
+        if level == 0:
+            return t, self._min[0].get(n, copy=True)
+        values = np.empty((2 * n, self.channels))
+        values[0::2], values[1::2] = self._min[level].get(n), self._max[level].get(n)
+        return np.repeat(t, 2), values
@@ -4,10 +4,11 @@ from inlinino.gui import App
 
 inlinino = App([])
 
-# Get instrument selected
-if len(sys.argv) == 2:
+# Get instrument(s) selected
+if len(sys.argv) > 1:
     try:
-        inlinino.start(int(sys.argv[1]))
+        instrument_indices = [int(a) for a in sys.argv[1:]]
+        inlinino.start(instrument_indices[0] if len(instrument_indices) == 1 else instrument_indices)
     except ValueError as e:
         # raise e
         logging.critical('Invalid arguments.')
@@ -0,0 +1,77 @@
+import logging
+from inlinino import CFG
+from inlinino.instruments import IOLoop
+from inlinino.instruments.registry import registry
+
+
+class AcquisitionManager:
+    """
+    Load and control any subset of the instruments configured within a single session
+
+    Each instrument keeps its own processing thread (pipeline) while sharing the process, and hence
+    the libraries and user interface, with the other instruments. Interfaces supporting it are read by
+    a single event loop shared by all instruments. Instrument classes are imported from the registry
+    only when loaded.
+    """
+    def __init__(self, signal_factory):
+        """
+        :param signal_factory: callable returning a new signal object for each instrument loaded
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.signal_factory = signal_factory
+        self.instruments = dict()  # cfg_id: instrument
+        self.io_loop = IOLoop()
+
+    def is_supported(self, cfg_id) -> bool:
+        return CFG.instruments[cfg_id]['module'] in registry
+
+    def load(self, cfg_id):
+        if cfg_id in self.instruments.keys():
+            return self.instruments[cfg_id]
+        cfg = CFG.instruments[cfg_id]
+        if not self.is_supported(cfg_id):
+            raise ValueError(f"Instrument module {cfg['module']} not supported")
+        self.logger.debug(f"Loading instrument [{cfg_id}] {cfg['model']} {cfg['serial_number']}")
+        instrument = registry.get(cfg['module'])(cfg_id, self.signal_factory())
+        instrument.io_loop = self.io_loop
+        self.instruments[cfg_id] = instrument
+        return instrument
+
+    def load_many(self, cfg_ids):
+        """
+        Load instruments, skipping the ones failing to load
+        :param cfg_ids: list of index of instruments in CFG
+        :return: list of instruments loaded and list of (cfg_id, exception) for instruments that failed to load
+        """
+        loaded, failed = [], []
+        for cfg_id in cfg_ids:
+            try:
+                loaded.append(self.load(cfg_id))
+            except Exception as e:
+                self.logger.warning(f'Unable to load instrument [{cfg_id}].')
+                self.logger.warning(e)
+                failed.append((cfg_id, e))
+        return loaded, failed
+
+    def close(self):
+        for instrument in self.instruments.values():
+            instrument.close()
+        self.io_loop.stop()
+
+    def log_start(self):
+        for instrument in self.instruments.values():
+            if instrument.alive:
+                instrument.log_start()
+
+    def log_stop(self):
+        for instrument in self.instruments.values():
+            instrument.log_stop()
+
+    def status(self):
+        return [{'cfg_id': cfg_id, 'name': instrument.name, 'interface': instrument.interface_name,
+                 'alive': instrument.alive, 'logging': instrument.log_active(),
+                 'gaps': instrument.gaps.count, 'downtime': instrument.gaps.total}
+                for cfg_id, instrument in self.instruments.items()]
+
+    def __str__(self):
+        return ', '.join(str(instrument) for instrument in self.instruments.values())
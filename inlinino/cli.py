@@ -1,265 +1,140 @@
-# -*- coding: utf-8 -*-
-# @Author: nils
-# @Date:   2016-05-16 17:17:09
-# @Last Modified by:   nils
-# @Last Modified time: 2016-07-27 17:04:09
-
-import cmd
-import os
-
-
-class CLI(cmd.Cmd):
-    '''
-    Command Line Interface
-    '''
-
-    # Configuring Cmd Through Attributes
-    prompt = '>>'
-    intro = 'Inlinino 2.0 alpha (May 16, 2016)\n' + \
-            'Type "help", "support", or "credits" for more information.'
-
-    doc_header = 'List of commands available (type help <topic>):'
-    # misc_header = 'misc_header'
-    # undoc_header = 'undoc_header'
-    # ruler = '-'
-
-    # Initialize interface
-    def __init__(self, _app):
-        cmd.Cmd.__init__(self)
-        self.m_app = _app
-
-    # Instruments
-    def do_instrument(self, line):
-        if line == "":
-            print('WARNING: Command instrument take an argument ' +
-                  '(connect, close, or list).')
-            return
-
-        arg = line.split()
-        narg = len(arg)
-
-        if arg[0] == "connect":
-            if narg != 2 and narg != 3:
-                print('WARNING: ' + arg[0] + ' takes 1 or 2 arguments\n' +
-                      '\t specify instrument to connect and the port (option)')
-                return
-            # Connect to instrument specified in arg[1]
-            if arg[1] not in self.m_app.m_instruments.keys():
-                if self.m_app.m_cfg.m_v > 0:
-                    print('Unknown instrument')
-                return
-            if narg == 2:
-                if not self.m_app.m_instruments[arg[1]].Connect():
-                    print('ERROR: Instrument not connected.')
-            else:
-                if not self.m_app.m_instruments[arg[1]].Connect(arg[2]):
-                    print('ERROR: Instrument not connected.')
-        elif arg[0] == "close":
-            if narg != 2:
-                print('WARNING: ' + arg[0] + ' takes 1 argument\n' +
-                      '\t specify instrument to disconnect')
-                return
-            # Connect to instrument specified in arg[1]
-            if arg[1] not in self.m_app.m_instruments.keys():
-                if self.m_app.m_cfg.m_v > 0:
-                    print('Unknown instrument')
-                return
-            self.m_app.m_instruments[arg[1]].Close()
-        elif arg[0] == 'list':
-            if narg > 2:
-                print('WARNING: ' + arg[0] + ' takes 1 argument maximum\n' +
-                      '\t list or list ports')
-                return
-            if narg < 2:
-                # Display list of instruments
-                foo = ''
-                for instr_key in self.m_app.m_instruments.keys():
-                    foo += str(instr_key) + '\n'
-                print(foo, end='', flush=True)
-            elif arg[1] == 'ports':
-                # Display list of ports
-                self.m_app.m_com.ListPorts()
-                print(self.m_app.m_com)
-            else:
-                print('WARNING: Unknown argument ' + arg[1] + ' for list')
-        elif arg[0] == 'read':
-            # Read Cache from instruments
-            if narg > 2:
-                print('WARNING: ' + arg[0] + ' takes 1 argument maximum\n' +
-                      '\t read or read [instrument_name]')
-                return
-            elif narg == 1:
-                for inst, inst in self.m_app.m_instruments.items():
-                    print(inst.ReadCache())
-            elif narg == 2:
-                if arg[1] not in self.m_app.m_instruments.keys():
-                    if self.m_app.m_cfg.m_v > 0:
-                        print('Unknown instrument')
-                    return
-                print(self.m_app.m_instruments[arg[1]].ReadCache())
-        else:
-            print('WARNING: Unknown command ' + line)
-
-    def complete_instrument(self, text, line, begidx, endidx):
-        cmd_available = ['connect', 'close', 'list', 'read']
-        if not text:
-            completions = cmd_available
-        else:
-            completions = [f for f in cmd_available
-                           if f.startswith(text)]
-        return completions
-
-    def help_instrument(self):
-        print('instrument [arg]\n\t' +
-              '<connect> [instrument_name] [port_name]\n\t' +
-              '\tconnect to instrument using specified port\n\t' +
-              '<close> [instrument_name]\n\t' +
-              '\tclose connection with instrument\n\t' +
-              '<list> [ports]\n\t' +
-              '\tlist all instruments or ports\n\t'
-              '<read> [instrument_name]\n\t' +
-              '\tread instrument cache\n\t' +
-              '\tif [instrument_name] is not specified,\n\t' +
-              '\t\tread cache of all instruments')
-
-    # Log
-    def do_log(self, line):
-        arg = line.split()
-        narg = len(arg)
-        if narg == 0 or narg > 2:
-            print('WARNING: Command log take 1 or 2 arguments ' +
-                  '(start, stop or header).')
-        elif arg[0] == "start":
-            self.m_app.m_log_data.Start()
-            print("Start logging data.")
-        elif arg[0] == "stop":
-            self.m_app.m_log_data.Stop()
-            print("Stop logging data.")
-        elif arg[0] == "header":
-            if narg != 2:
-                print('WARNING: ' + arg[0] + ' takes 1 argument\n' +
-                      '\t header [log_file_name_header]')
-                return
-            self.m_app.m_log_data.m_file_header = arg[1]
-        elif arg[0] == "filename":
-            if (self.m_app.m_log_data.m_file_name is not None and
-                    self.m_app.m_log_data.m_active_log):
-                foo = os.path.join(self.m_app.m_log_data.m_file_path,
-                                   self.m_app.m_log_data.m_file_name)
-            else:
-                foo = os.path.join(self.m_app.m_log_data.m_file_path,
-                                   self.m_app.m_log_data.m_file_header) \
-                    + '_yyyymmdd_HHMMSS.csv'
-            print(foo)
-        else:
-            print('WARNING: Unknown command ' + line)
-
-    def complete_log(self, text, line, begidx, endidx):
-        cmd_available = ['start', 'stop', 'header', 'filename']
-        if not text:
-            completions = cmd_available
-        else:
-            completions = [f for f in cmd_available
-                           if f.startswith(text)]
-        return completions
-
-    def help_log(self):
-        print('log [arg]\n\t<start> logging data\n\t<stop> logging data\n\t' +
-              '<header> [log_file_name_header] change file name header' +
-              '\n\t<filename> return current filename')
-
-    # Status
-    def do_status(self, line):
-        print(self.m_app)
-
-    def help_status(self):
-        print('status\n\tDisplay some parameters and state of instruments')
-
-    # Plot (Use matplotlib)
-    # def do_plot(self, line):
-    #     arg = line.split()
-    #     narg = len(arg)
-    #     if narg == 0 or narg > 2:
-    #         print('WARNING: Command plot take 1 argument ' +
-    #               '(start or stop).')
-    #     elif arg[0] == "start":
-    #         self.m_app.m_plot.Start()
-    #     elif arg[0] == "stop":
-    #         self.m_app.m_plot.Stop()
-    #     elif arg[0] == "header":
-    #         if narg != 2:
-    #             print('WARNING: ' + arg[0] + ' takes 1 argument\n' +
-    #                   '\t header [log_file_name_header]')
-    #             return
-    #         self.m_app.m_log_data.m_file_header = arg[1]
-    #     else:
-    #         print('WARNING: Unknown command ' + line)
-
-    # def complete_plot(self, text, line, begidx, endidx):
-    #     cmd_available = ['start', 'stop']
-    #     if not text:
-    #         completions = cmd_available
-    #     else:
-    #         completions = [f for f in cmd_available
-    #                        if f.startswith(text)]
-    #     return completions
-
-    # def help_plot(self):
-    #     print('log [arg]\n\t<start> plotting data\n\t<stop> plotting data' +
-    #           '\n\tThis function has not been tested yet.' +
-    #           '\n\tBased on matplotlib')
-
-    # Exit
-    def do_exit(self, line):
-        return self.do_EOF(line)
-
-    def help_exit(self):
-        return self.help_EOF()
-
-    def do_EOF(self, line):
-        return True
-
-    def help_EOF(self):
-        print('exit or EOF\n\t' +
-              'Quit Inlinino after:\n\t' +
-              '\t- closing all instrument connection\n\t' +
-              '\t- stoping all logging activity\n\t' +
-              'All data is saved automatically.')
-
-    # Credits
-    def do_credits(self, line):
-        print('### Credits ###\n' +
-              'Developped by Nils Haëntjens (University of Maine)\n' +
-              'Inspired by Instrumentino from Joel Koenka\n')
-
-    def help_credits(self):
-        print('credits\n\t' +
-              'Display credits\n\t')
-
-    # Support
-    def do_support(self, line):
-        print('### Support ###\n' +
-              'Send questions, bug reports, fixes, enhancements, t-shirts, ' +
-              'money, lobsters & beers to Nils\n' +
-              '<nils.haentjens+inlinino@maine.edu>')
-
-    def help_support(self):
-        print('support\n\t' +
-              'Display support informations\n\t')
-
-    # Override Cmd class methods
-    def emptyline(self):
-        # By default empty line re-do previous command
-        # Rewrite it to do nothing
-        pass
-
-    def do_shell(self, line):
-        # Run a shell command
-        print(os.popen(line).read())
-
-    def help_shell(self):
-        print('! or shell\n\tRun command on host shell')
+"""
+Headless acquisition, without user interface nor Qt
+
+Instruments are loaded from the configuration file (inlinino_cfg.json), their interface is opened
+with the connection parameters of the optional field "connection" of each instrument, and data is
+logged until the process is interrupted (Ctrl+C or SIGTERM). Suited for computers left unattended.
+
+    python -m inlinino.cli [cfg_id ...] [--no-log] [--status-interval SECONDS]
+
+Examples of connection field:
+    "connection": {"port": "/dev/ttyUSB0", "baudrate": 19200}  (serial, default baudrate of instrument if missing)
+    "connection": {"ip": "0.0.0.0", "port": 10110}  (socket, udp by default)
+    "connection": {"ip": "192.168.1.20", "port": 4001, "protocol": "tcp_client"}  (socket, tcp_server also supported)
+"""
+import argparse
+import logging
+import signal
+from threading import Event
+from time import time
+
+from inlinino import CFG
+from inlinino.acquisition import AcquisitionManager
+from inlinino.instruments import SerialInterface, InterfaceException
+from inlinino.signals import HeadlessSignals
+
+
+class CLI:
+    """
+    Run acquisition of instruments without user interface
+    """
+    STATUS_INTERVAL = 60  # seconds
+
+    def __init__(self, status_interval=STATUS_INTERVAL):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.acquisition = AcquisitionManager(HeadlessSignals)
+        self.status_interval = status_interval
+        self.packets = dict()  # cfg_id: [received, logged, corrupted] since start
+        self._stop = Event()
+
+    @staticmethod
+    def connection_parameters(instrument):
+        """
+        Get parameters to open interface of instrument from its configuration
+        :param instrument: instrument loaded
+        :return: keyword arguments for Instrument.open
+        """
+        cfg = CFG.instruments[instrument.cfg_id]
+        if 'connection' not in cfg.keys():
+            raise ValueError('Missing field connection')
+        kwargs = dict(cfg['connection'])
+        if isinstance(instrument._interface, SerialInterface):
+            if 'baudrate' not in kwargs.keys() and hasattr(instrument, 'default_serial_baudrate'):
+                kwargs['baudrate'] = instrument.default_serial_baudrate
+            if 'timeout' not in kwargs.keys() and hasattr(instrument, 'default_serial_timeout'):
+                kwargs['timeout'] = instrument.default_serial_timeout
+        return kwargs
+
+    def start(self, cfg_ids, log=True):
+        """
+        Load and open instruments, instruments failing are skipped
+        :param cfg_ids: list of index of instruments in CFG
+        :param log: start logging data
+        :return: number of instruments started
+        """
+        loaded, failed = self.acquisition.load_many(cfg_ids)
+        for instrument in loaded:
+            try:
+                instrument.open(**self.connection_parameters(instrument))
+                self.logger.info(f'Connected {instrument.name} on {instrument.interface_name}')
+                self.packets[instrument.cfg_id] = [0, 0, 0]
+            except (ValueError, TypeError, InterfaceException) as e:
+                self.logger.error(f'Unable to connect {instrument.name}: {e}')
+        if log:
+            self.acquisition.log_start()
+        return len(self.packets)
+
+    def run(self):
+        """
+        Report status of instruments until stopped
+        """
+        last_status = time()
+        while not self._stop.wait(1):
+            self.update_packets()
+            if self.status_interval and time() - last_status >= self.status_interval:
+                self.log_status()
+                last_status = time()
+            if not any(instrument.alive for instrument in self.acquisition.instruments.values()):
+                self.logger.error('No instrument connected.')
+                break
+
+    def update_packets(self):
+        for cfg_id, packets in self.packets.items():
+            snapshot = self.acquisition.instruments[cfg_id].signal.snapshot()
+            packets[0] += snapshot.packets_received
+            packets[1] += snapshot.packets_logged
+            packets[2] += snapshot.packets_corrupted
+
+    def log_status(self):
+        for cfg_id, (received, logged, corrupted) in self.packets.items():
+            instrument = self.acquisition.instruments[cfg_id]
+            self.logger.info(f'{instrument} received: {received}, logged: {logged}, corrupted: {corrupted}' +
+                             (f', {instrument.gaps}' if instrument.gaps.count else ''))
+
+    def stop(self, *args):
+        self._stop.set()
+
+    def close(self):
+        self.acquisition.close()
+        self.update_packets()
+        self.log_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m inlinino.cli', description='Inlinino headless acquisition.')
+    parser.add_argument('cfg_ids', nargs='*', type=int,
+                        help='index of instruments in configuration (default: all instruments with a connection)')
+    parser.add_argument('--no-log', action='store_true', help='do not log data')
+    parser.add_argument('--status-interval', type=float, default=CLI.STATUS_INTERVAL,
+                        help='seconds between status reports, 0 to disable (default: %(default)s)')
+    args = parser.parse_args()
+    # Console is for operators, debug messages remain in engineering log file
+    for handler in logging.getLogger().handlers:
+        if type(handler) == logging.StreamHandler:
+            handler.setLevel(logging.INFO)
+
+    cfg_ids = args.cfg_ids or [i for i, cfg in enumerate(CFG.instruments) if 'connection' in cfg.keys()]
+    if not cfg_ids:
+        parser.error('no instrument to start, specify cfg_ids or add connection field to instruments')
+    cli = CLI(args.status_interval)
+    signal.signal(signal.SIGINT, cli.stop)
+    signal.signal(signal.SIGTERM, cli.stop)
+    try:
+        if cli.start(cfg_ids, log=not args.no_log):
+            cli.run()
+    finally:
+        cli.close()
 
 
 if __name__ == '__main__':
-    CLI(None).cmdloop()
+    main()
@@ -0,0 +1,220 @@
+"""
+Convert raw (.raw) and binary (.bin) files logged by an instrument into product files, in parallel
+
+Each file is replayed (see inlinino.replay) through the parser and calibration of the instrument by
+one of a pool of processes, without user interface, and the products are logged in the format of the
+instrument (csv or npy). Products of a file are written in a temporary directory and moved to the output
+directory once the file is converted, and each file converted is recorded in a journal, so an interrupted
+conversion is resumed where it stopped by running the same command again. Products are never overwritten,
+except the products of the same input file converted previously (file modified or --restart).
+
+    python -m inlinino.convert <cfg_id> <directory|file> [...] --output DIR [--workers N] [--restart]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import time
+
+from inlinino.log import compressor
+from inlinino.readers import log_file_ext
+
+JOURNAL = 'inlinino_convert.jsonl'  # files converted, in output directory
+TMP_PREFIX = '.inlinino_convert_'  # temporary directories of files being converted, in output directory
+EXTENSIONS = ['raw', 'bin']
+
+_instrument = None  # instrument of worker process
+
+
+def _init_worker(cfg_id, log_level):
+    global _instrument
+    from inlinino.acquisition import AcquisitionManager
+    from inlinino.signals import HeadlessSignals
+    logging.getLogger().setLevel(log_level)
+    _instrument = AcquisitionManager(HeadlessSignals).load(cfg_id)
+
+
+def convert_file(filename, output, replace=()):
+    """
+    Convert file with instrument of worker process
+    :param filename: path to raw or binary file (compressed or not)
+    :param output: directory of product files
+    :param replace: names of product files that can be overwritten (products of previous conversion of file)
+    :return: dictionary of input file, product files, and statistics
+    """
+    tmp = os.path.join(output, TMP_PREFIX + os.path.basename(filename))
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    _instrument.log_update_cfg({'path': tmp})
+    from inlinino.replay import Replay
+    stats = Replay(_instrument).run([filename], log_raw=False, log_products=True)
+    compressor.join()  # Files closed are compressed in the background (log_compress_closed)
+    products = sorted(os.listdir(tmp))
+    conflicts = [n for n in products if n not in replace and os.path.exists(os.path.join(output, n))]
+    if conflicts:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise FileExistsError(f'Products already in output, from another file: {", ".join(conflicts)}')
+    for name in products:
+        os.replace(os.path.join(tmp, name), os.path.join(output, name))
+    os.rmdir(tmp)
+    return {'input': os.path.abspath(filename), 'size': os.path.getsize(filename),
+            'mtime': os.path.getmtime(filename), 'products': products, 'bytes': stats['bytes'],
+            'packets': stats.get('packets_received', 0), 'corrupted': stats.get('packets_corrupted', 0),
+            'elapsed': stats['elapsed']}
+
+
+class Converter:
+    """
+    Convert files of an instrument with a pool of processes, resuming from journal of output directory
+    """
+    def __init__(self, cfg_id, output, workers=None):
+        """
+        :param cfg_id: index of instrument in configuration
+        :param output: directory of product files
+        :param workers: number of processes (default: number of processors)
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.cfg_id = cfg_id
+        self.output = output
+        self.workers = workers or os.cpu_count() or 1
+
+    @property
+    def journal(self) -> str:
+        return os.path.join(self.output, JOURNAL)
+
+    @staticmethod
+    def find_files(paths, prefix=''):
+        """
+        List raw and binary files, compressed or not
+        :param paths: files or directories (files starting with prefix are searched in directories)
+        :param prefix: prefix of files of instrument (model and serial number)
+        :return: sorted list of path to files
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(os.path.join(path, f) for f in os.listdir(path)
+                             if f.startswith(prefix) and log_file_ext(f) in EXTENSIONS)
+            else:
+                files.append(path)
+        return sorted(set(files))
+
+    def converted(self) -> dict:
+        """
+        Files converted, read from journal
+        :return: dictionary of path to input file: entry of journal
+        """
+        entries = dict()
+        if os.path.exists(self.journal):
+            with open(self.journal) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Line incomplete, interrupted while written
+                    entries[entry['input']] = entry
+        return entries
+
+    def pending(self, files) -> list:
+        """
+        Files not converted yet, or modified since converted
+        """
+        converted = self.converted()
+        pending = []
+        for filename in files:
+            entry = converted.get(os.path.abspath(filename))
+            if entry is None or entry['size'] != os.path.getsize(filename) or \
+                    entry['mtime'] != os.path.getmtime(filename):
+                pending.append(filename)
+        return pending
+
+    def run(self, files, restart=False, progress=None):
+        """
+        Convert files, blocking until all files are converted
+        :param files: list of path to files
+        :param restart: convert all files, ignoring journal
+        :param progress: function called with (entry, files done, files to convert, bytes done, bytes to convert)
+            after each file converted
+        :return: dictionary of statistics
+        """
+        if not os.path.isdir(self.output):
+            os.makedirs(self.output)
+        converted = self.converted()  # Products of files converted again can be replaced
+        if restart and os.path.exists(self.journal):
+            os.remove(self.journal)
+        for name in os.listdir(self.output):  # Left by interrupted conversion
+            if name.startswith(TMP_PREFIX):
+                shutil.rmtree(os.path.join(self.output, name), ignore_errors=True)
+        pending = self.pending(files)
+        sizes = {f: os.path.getsize(f) for f in pending}
+        stats = {'files': len(files), 'skipped': len(files) - len(pending), 'converted': 0, 'failed': [],
+                 'bytes': 0, 'packets': 0}
+        start = time()
+        executor = ProcessPoolExecutor(min(self.workers, max(len(pending), 1)), initializer=_init_worker,
+                                       initargs=(self.cfg_id, logging.getLogger().getEffectiveLevel()))
+        futures = {executor.submit(convert_file, f, self.output,
+                                   converted.get(os.path.abspath(f), {}).get('products', [])): f for f in pending}
+        done_bytes = 0
+        try:
+            with open(self.journal, 'a') as journal:
+                for future in as_completed(futures):
+                    filename = futures[future]
+                    done_bytes += sizes[filename]
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        self.logger.error(f'Unable to convert {filename}: {e}')
+                        stats['failed'].append(filename)
+                        continue
+                    journal.write(json.dumps(entry) + '\n')
+                    journal.flush()
+                    stats['converted'] += 1
+                    stats['bytes'] += entry['bytes']
+                    stats['packets'] += entry['packets']
+                    if progress is not None:
+                        progress(entry, stats['converted'] + len(stats['failed']), len(pending),
+                                 done_bytes, sum(sizes.values()))
+        finally:
+            for future in futures:  # Interrupted, files converted are in journal
+                future.cancel()
+            executor.shutdown(wait=True)
+        stats['elapsed'] = time() - start
+        return stats
+
+
+def main():
+    from inlinino import CFG
+
+    parser = argparse.ArgumentParser(prog='python -m inlinino.convert',
+                                     description='Convert files logged by Inlinino into product files.')
+    parser.add_argument('cfg_id', type=int, help='index of instrument in configuration')
+    parser.add_argument('paths', nargs='+', help='raw (.raw) or binary (.bin) files, compressed or not (.gz, .xz), '
+                                                 'or directories of files of instrument')
+    parser.add_argument('--output', required=True, help='directory of product files')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes (default: number of processors)')
+    parser.add_argument('--restart', action='store_true', help='convert all files, even if already converted')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)  # Silence replay (e.g. every file open)
+    cfg = CFG.instruments[args.cfg_id]
+    converter = Converter(args.cfg_id, args.output, args.workers)
+    files = converter.find_files(args.paths, cfg['model'] + cfg['serial_number'] + '_')
+    start = time()
+
+    def progress(entry, done, total, done_bytes, total_bytes):
+        elapsed = time() - start
+        eta = elapsed / done_bytes * (total_bytes - done_bytes) if done_bytes else 0
+        print(f'[{done}/{total}] {os.path.basename(entry["input"])}: {entry["packets"]} packets, '
+              f'{len(entry["products"])} product file(s), {done_bytes / max(elapsed, 1e-9) / 1e6:.2f} MB/s, '
+              f'ETA {eta / 60:.1f} min', flush=True)
+
+    stats = converter.run(files, args.restart, progress)
+    print(f"Converted {stats['converted']} file(s) ({stats['bytes'] / 1e6:.1f} MB, {stats['packets']} packets) "
+          f"in {stats['elapsed']:.1f} s with {converter.workers} process(es), "
+          f"{stats['skipped']} already converted, {len(stats['failed'])} failed")
+
+
+if __name__ == '__main__':
+    main()
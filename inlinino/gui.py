@@ -6,32 +6,25 @@ import sys, os, glob
 import logging
 from time import time, gmtime, strftime
 from serial.tools.list_ports import comports as list_serial_comports
-from inlinino import RingBuffer, CFG, __version__, PATH_TO_RESOURCES
-from inlinino.instruments import Instrument, SerialInterface, SocketInterface, InterfaceException
-from inlinino.instruments.acs import ACS
-from inlinino.instruments.dataq import DATAQ
-from inlinino.instruments.hyperbb import HyperBB
-from inlinino.instruments.lisst import LISST
-from inlinino.instruments.nmea import NMEA
-from inlinino.instruments.suna import SunaV1, SunaV2
-from inlinino.instruments.taratsg import TaraTSG
-from pyACS.acs import ACS as ACSParser
-from inlinino.instruments.lisst import LISSTParser
+from inlinino import History, CFG, __version__, PATH_TO_RESOURCES
+from inlinino.instruments import SerialInterface, SocketInterface, InterfaceException
+from inlinino.acquisition import AcquisitionManager
+from inlinino.signals import CoalescedSignals
 import numpy as np
 from math import floor
 
 logger = logging.getLogger('GUI')
 
 
-class InstrumentSignals(QtCore.QObject):
+class InstrumentSignals(QtCore.QObject, CoalescedSignals):
+    # Low rate signals are delivered through Qt, high rate signals are polled by MainWindow (see CoalescedSignals)
     status_update = QtCore.pyqtSignal()
-    packet_received = QtCore.pyqtSignal()
-    packet_corrupted = QtCore.pyqtSignal()
-    packet_logged = QtCore.pyqtSignal()
-    new_data = QtCore.pyqtSignal(object, float)
-    new_aux_data = QtCore.pyqtSignal(list)
     alarm = QtCore.pyqtSignal(bool)
 
+    def __init__(self):
+        QtCore.QObject.__init__(self)
+        CoalescedSignals.__init__(self, data_maxlen=MainWindow.BUFFER_LENGTH)
+
 
 def seconds_to_strmmss(seconds):
     min = floor(seconds / 60)
@@ -52,12 +45,26 @@ class MainWindow(QtGui.QMainWindow):
                   '#7f7f7f',  # middle gray
                   '#bcbd22',  # curry yellow-green
                   '#17becf']  # blue-teal
-    BUFFER_LENGTH = 240
-    MAX_PLOT_REFRESH_RATE = 4   # Hz
-
-    def __init__(self, instrument=None):
+    BUFFER_LENGTH = 240  # rows of data received between refreshes kept for the plot
+    HISTORY_LENGTH = 4096  # elements kept at each level of history (see inlinino.History)
+    HISTORY_MAX_ELEMENTS = 1000  # elements plotted per curve, at the level of history matching the period shown
+    HISTORY_PERIODS = {'1 min': 60, '10 min': 600, '1 hour': 3600, '6 hours': 21600, '24 hours': 86400}  # seconds
+    UI_REFRESH_RATE = 4  # Hz, default, can be set per instrument with cfg field ui_refresh_rate
+    ALARM_DATA_TIMEOUT_TEXT = "An error with the serial connection occured or " \
+                              "no data was received in the past minute.\n\n" \
+                              "Does the instrument receive power?\n" \
+                              "Are the serial cable and serial to USB adapter connected?\n" \
+                              "Is the instruments set to continuously send data?\n"
+    ALARM_DISK_TEXT = "The disk where data is logged is about to be full.\n\n" \
+                      "Free space on the disk or change the log directory of the instrument.\n" \
+                      "See the engineering log for the free space and time left.\n"
+
+    def __init__(self, instrument=None, embedded=False):
         super(MainWindow, self).__init__()
         uic.loadUi(os.path.join(PATH_TO_RESOURCES, 'main.ui'), self)
+        self.embedded = embedded  # Panel of AcquisitionWindow
+        if self.embedded:
+            self.setWindowFlags(QtCore.Qt.Widget)
         # Graphical Adjustments
         self.dock_widget.setTitleBarWidget(QtGui.QWidget(None))
         self.label_app_version.setText('Inlinino v' + __version__)
@@ -70,16 +77,11 @@ class MainWindow(QtGui.QMainWindow):
         pg.setConfigOption('foreground', pg.mkColor(self.FOREGROUND_COLOR))
         # Set figure with pyqtgraph
         # pg.setConfigOption('antialias', True)  # Lines are drawn with smooth edges at the cost of reduced performance
-        self._buffer_timestamp = None
-        self._buffer_data = []
-        self.last_plot_refresh = time()
+        self._history = None  # History with one channel per variable
+        self._last_timestamp = 0  # time of last data received, end of period plotted
         self.timeseries_widget = None
         self.init_timeseries_plot()
-        # Set instrument
-        if instrument:
-            self.init_instrument(instrument)
-        else:
-            self.instrument = None
+        self.instrument = None
         self.packets_received = 0
         self.packets_logged = 0
         self.packets_corrupted = 0
@@ -90,10 +92,16 @@ class MainWindow(QtGui.QMainWindow):
         self.button_serial.clicked.connect(self.act_instrument_interface)
         self.button_log.clicked.connect(self.act_instrument_log)
         self.button_figure_clear.clicked.connect(self.act_clear_timeseries_plot)
-        # Set clock
+        self.combo_box_history.addItems(self.HISTORY_PERIODS.keys())
+        self.combo_box_history.currentIndexChanged.connect(self.update_timeseries_plot)
+        # Set clock (shared clock of AcquisitionWindow is used when embedded)
         self.signal_clock = QtCore.QTimer()
         self.signal_clock.timeout.connect(self.set_clock)
-        self.signal_clock.start(1000)
+        if not self.embedded:
+            self.signal_clock.start(1000)
+        # Set refresh of packet counters, data, and plots (started with instrument)
+        self.signal_refresh = QtCore.QTimer()
+        self.signal_refresh.timeout.connect(self.on_refresh)
         # Alarm message box for data timeout
         self.alarm_sound = QtMultimedia.QMediaPlayer()
         self.alarm_playlist = QtMultimedia.QMediaPlaylist(self.alarm_sound)
@@ -109,27 +117,24 @@ class MainWindow(QtGui.QMainWindow):
         self.alarm_message_box = QtWidgets.QMessageBox()
         self.alarm_message_box.setIcon(QtWidgets.QMessageBox.Warning)
         self.alarm_message_box.setWindowTitle("Data Timeout Alarm")
-        self.alarm_message_box.setText("An error with the serial connection occured or "
-                                       "no data was received in the past minute.\n\n"
-                                       "Does the instrument receive power?\n"
-                                       "Are the serial cable and serial to USB adapter connected?\n"
-                                       "Is the instruments set to continuously send data?\n")
+        self.alarm_message_box.setText(self.ALARM_DATA_TIMEOUT_TEXT)
         self.alarm_message_box.setStandardButtons(QtWidgets.QMessageBox.Ignore)
         self.alarm_message_box.buttonClicked.connect(self.alarm_message_box_button_clicked)
         # Plugins variables
         self.plugin_aux_data_variable_names = []
         self.plugin_aux_data_variable_values = []
+        # Set instrument
+        if instrument:
+            self.init_instrument(instrument)
 
     def init_instrument(self, instrument):
         self.instrument = instrument
         self.label_instrument_name.setText(self.instrument.short_name)
         self.instrument.signal.status_update.connect(self.on_status_update)
-        self.instrument.signal.packet_received.connect(self.on_packet_received)
-        self.instrument.signal.packet_corrupted.connect(self.on_packet_corrupted)
-        self.instrument.signal.packet_logged.connect(self.on_packet_logged)
-        self.instrument.signal.new_data.connect(self.on_new_data)
         self.instrument.signal.alarm.connect(self.on_data_timeout)
         self.on_status_update()  # Need to be run as on instrument setup the signals were not connected
+        ui_refresh_rate = CFG.instruments[self.instrument.cfg_id].get('ui_refresh_rate', self.UI_REFRESH_RATE)
+        self.signal_refresh.start(int(1000 / ui_refresh_rate))
 
         # Set Plugins specific to instrument
         # Auxiliary Data Plugin
@@ -141,8 +146,6 @@ class MainWindow(QtGui.QMainWindow):
                 self.plugin_aux_data_variable_values.append(QtGui.QLabel('?'))
                 self.group_box_aux_data_layout.addRow(self.plugin_aux_data_variable_names[-1],
                                                       self.plugin_aux_data_variable_values[-1])
-            # Connect signal
-            self.instrument.signal.new_aux_data.connect(self.on_new_aux_data)
 
         # Select Channels To Plot Plugin
         self.group_box_active_timeseries_variables.setVisible(self.instrument.plugin_active_timeseries_variables)
@@ -197,7 +200,7 @@ class MainWindow(QtGui.QMainWindow):
                         self.instrument.open(port=dialog.port, baudrate=dialog.baudrate, bytesize=dialog.bytesize,
                                              parity=dialog.parity, stopbits=dialog.stopbits, timeout=dialog.timeout)
                     elif type(self.instrument._interface) == SocketInterface:
-                        self.instrument.open(ip=dialog.ip, port=dialog.port)
+                        self.instrument.open(ip=dialog.ip, port=dialog.port, protocol=dialog.protocol)
                 except InterfaceException as e:
                     QtGui.QMessageBox.warning(self, "Inlinino: Connect " + self.instrument.name,
                                               'ERROR: Failed connecting ' + self.instrument.name + '. ' +
@@ -219,7 +222,7 @@ class MainWindow(QtGui.QMainWindow):
                 self.instrument.log_start()
 
     def act_clear_timeseries_plot(self):
-        if len(self._buffer_data) > 0:
+        if self._history is not None and self._history.channels > 0:
             # Send no data which reset buffers
             self.instrument.signal.new_data.emit([], time())
 
@@ -268,38 +271,48 @@ class MainWindow(QtGui.QMainWindow):
         self.label_packets_corrupted.setText(str(self.packets_corrupted))
 
     @QtCore.pyqtSlot()
-    def on_packet_received(self):
-        self.packets_received += 1
+    def on_refresh(self):
+        snapshot = self.instrument.signal.snapshot()
+        if snapshot.packets_received:
+            self.on_packet_received(snapshot.packets_received)
+        if snapshot.packets_logged:
+            self.on_packet_logged(snapshot.packets_logged)
+        if snapshot.packets_corrupted:
+            self.on_packet_corrupted(snapshot.packets_corrupted)
+        if snapshot.data:
+            for data, timestamp in snapshot.data:
+                self.on_new_data(data, timestamp)
+            self.update_timeseries_plot()
+        if snapshot.aux_data is not None:
+            self.on_new_aux_data(snapshot.aux_data)
+
+    def on_packet_received(self, count=1):
+        self.packets_received += count
         self.label_packets_received.setText(str(self.packets_received))
         if self.packets_corrupted_flag and time() - self.last_packet_corrupted_timestamp > 5:
             self.label_packets_corrupted.setStyleSheet(f'font-weight:normal;color: {self.FOREGROUND_COLOR};')
             self.packets_corrupted_flag = False
 
-    @QtCore.pyqtSlot()
-    def on_packet_logged(self):
-        self.packets_logged += 1
-        if self.packets_received < self.packets_logged < 2:  # Fix inconsistency when start logging
+    def on_packet_logged(self, count=1):
+        self.packets_logged += count
+        if self.packets_received < self.packets_logged == count:  # Fix inconsistency when start logging
             self.packets_received = self.packets_logged
             self.label_packets_received.setText(str(self.packets_received))
         self.label_packets_logged.setText(str(self.packets_logged))
 
-    @QtCore.pyqtSlot()
-    def on_packet_corrupted(self):
+    def on_packet_corrupted(self, count=1):
         ts = time()
-        self.packets_corrupted += 1
+        self.packets_corrupted += count
         self.label_packets_corrupted.setText(str(self.packets_corrupted))
         if ts - self.last_packet_corrupted_timestamp < 5:  # seconds
             self.label_packets_corrupted.setStyleSheet('font-weight:bold;color: #e0463e;')  # red
             self.packets_corrupted_flag = True
         self.last_packet_corrupted_timestamp = ts
 
-    @QtCore.pyqtSlot(list, float)
-    @QtCore.pyqtSlot(np.ndarray, float)
     def on_new_data(self, data, timestamp):
-        if len(self._buffer_data) != len(data):
-            # Init buffers
-            self._buffer_timestamp = RingBuffer(self.BUFFER_LENGTH)
-            self._buffer_data = [RingBuffer(self.BUFFER_LENGTH) for i in range(len(data))]
+        if self._history is None or self._history.channels != len(data):
+            # Init history
+            self._history = History(self.HISTORY_LENGTH, len(data))
             # Init Plot (need to do so when number of curve changes)
             self.init_timeseries_plot()
             # Init curves
@@ -314,29 +327,26 @@ class MainWindow(QtGui.QMainWindow):
                                      name=legend[i])
                 )
                 
-        # Update buffers
-        self._buffer_timestamp.extend(timestamp)
-        for i in range(len(data)):
-            self._buffer_data[i].extend(data[i])
+        # Update history
+        if len(data):  # No data clears plot
+            self._history.extend(data, timestamp)
+            self._last_timestamp = timestamp
+
+    def update_timeseries_plot(self):
         # TODO Update real-time figure (depend on instrument type)
-        # Update timeseries figure
-        if time() - self.last_plot_refresh < 1 / self.MAX_PLOT_REFRESH_RATE:
+        # Update timeseries figure, period shown is plotted from the level of history holding it in a few elements
+        if self._history is None or not self._history.channels:
             return
-        timestamp = self._buffer_timestamp.get(self.BUFFER_LENGTH)  # Not used anymore
-        for i in range(len(data)):
-            y = self._buffer_data[i].get(self.BUFFER_LENGTH)
-            x = np.arange(len(y))
-            y[np.isinf(y)] = 0
-            nsel = np.isnan(y)
-            if not np.all(nsel):
-                sel = np.logical_not(nsel)
-                y[nsel] = np.interp(x[nsel], x[sel], y[sel])
-                # self.timeseries_widget.plotItem.items[i].setData(y, connect="finite")
+        start = self._last_timestamp - self.HISTORY_PERIODS.get(self.combo_box_history.currentText(), 60)
+        timestamp, values = self._history.get(start, self.HISTORY_MAX_ELEMENTS)
+        values[np.isinf(values)] = 0
+        for i in range(self._history.channels):
+            y = values[:, i]
+            sel = np.logical_not(np.isnan(y))
+            if np.any(sel):
                 self.timeseries_widget.plotItem.items[i].setData(timestamp[sel], y[sel], connect="finite")
         self.timeseries_widget.plotItem.enableAutoRange(x=True)  # Needed as somehow the user disable sometimes
-        self.last_plot_refresh = time()
 
-    @QtCore.pyqtSlot(list)
     def on_new_aux_data(self, data):
         if self.instrument.plugin_aux_data:
             for i, v in enumerate(data):
@@ -350,6 +360,12 @@ class MainWindow(QtGui.QMainWindow):
     @QtCore.pyqtSlot(bool)
     def on_data_timeout(self, active):
         if active and not self.alarm_message_box_active:
+            if self.instrument.disk_alarm:
+                self.alarm_message_box.setWindowTitle("Disk Space Alarm")
+                self.alarm_message_box.setText(self.ALARM_DISK_TEXT)
+            else:
+                self.alarm_message_box.setWindowTitle("Data Timeout Alarm")
+                self.alarm_message_box.setText(self.ALARM_DATA_TIMEOUT_TEXT)
             # Start alarm and Open message box
             self.alarm_playlist.setCurrentIndex(0)
             self.alarm_sound.play()
@@ -383,9 +399,91 @@ class MainWindow(QtGui.QMainWindow):
             event.ignore()
 
 
+class AcquisitionWindow(QtGui.QMainWindow):
+    """
+    Single window acquiring data from multiple instruments
+    Each instrument has its own panel (embedded MainWindow) in a tab, panels share the window,
+    the clock, and a table summarizing the status of every instrument.
+    """
+    STATUS_COLUMNS = ['Instrument', 'Interface', 'Status', 'Received', 'Logged', 'Corrupted']
+    STATUS_REFRESH_RATE = 1  # Hz
+
+    def __init__(self, manager):
+        super().__init__()
+        self.manager = manager
+        self.setWindowTitle(f'Inlinino v{__version__}')
+        palette = QtGui.QPalette()
+        palette.setColor(palette.Window, QtGui.QColor(MainWindow.BACKGROUND_COLOR))
+        palette.setColor(palette.WindowText, QtGui.QColor(MainWindow.FOREGROUND_COLOR))
+        self.setPalette(palette)
+        # Shared status table
+        self.status_table = QtWidgets.QTableWidget(0, len(self.STATUS_COLUMNS))
+        self.status_table.setHorizontalHeaderLabels(self.STATUS_COLUMNS)
+        self.status_table.verticalHeader().setVisible(False)
+        self.status_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.status_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.status_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+        self.status_table.cellDoubleClicked.connect(self.on_status_table_double_clicked)
+        # One panel per instrument
+        self.tab_widget = QtWidgets.QTabWidget()
+        self.panels = []
+        for instrument in self.manager.instruments.values():
+            self.add_panel(instrument)
+        splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+        splitter.addWidget(self.status_table)
+        splitter.addWidget(self.tab_widget)
+        splitter.setStretchFactor(1, 4)
+        self.setCentralWidget(splitter)
+        # Shared clock
+        self.signal_clock = QtCore.QTimer()
+        self.signal_clock.timeout.connect(self.on_clock)
+        self.signal_clock.start(int(1000 / self.STATUS_REFRESH_RATE))
+        self.on_clock()
+
+    def add_panel(self, instrument):
+        panel = MainWindow(instrument, embedded=True)
+        self.panels.append(panel)
+        self.tab_widget.addTab(panel, instrument.short_name)
+        self.status_table.insertRow(self.status_table.rowCount())
+
+    def on_clock(self):
+        for row, panel in enumerate(self.panels):
+            panel.set_clock()
+            instrument = panel.instrument
+            if instrument.alive:
+                status = 'Logging' if instrument.log_active() else 'Connected'
+            else:
+                status = 'Disconnected'
+            for col, value in enumerate([instrument.name, instrument.interface_name, status,
+                                         panel.packets_received, panel.packets_logged, panel.packets_corrupted]):
+                item = self.status_table.item(row, col)
+                if item is None:
+                    self.status_table.setItem(row, col, QtWidgets.QTableWidgetItem(str(value)))
+                else:
+                    item.setText(str(value))
+
+    def on_status_table_double_clicked(self, row, column):
+        self.tab_widget.setCurrentIndex(row)
+
+    def closeEvent(self, event):
+        msg = QtGui.QMessageBox(self)
+        msg.setIcon(QtGui.QMessageBox.Question)
+        msg.setWindowTitle("Inlinino: Closing Application")
+        msg.setText("Are you sure to quit ?")
+        msg.setStandardButtons(QtGui.QMessageBox.Yes | QtGui.QMessageBox.No)
+        msg.setDefaultButton(QtGui.QMessageBox.No)
+        if msg.exec_() == QtGui.QMessageBox.Yes:
+            self.manager.close()
+            QtGui.QApplication.instance().closeAllWindows()  # NEEDED IF OTHER WINDOWS OPEN BY SPECIFIC INSTRUMENTS
+            event.accept()
+        else:
+            event.ignore()
+
+
 class DialogStartUp(QtGui.QDialog):
     LOAD_INSTRUMENT = 1
     SETUP_INSTRUMENT = 2
+    LOAD_MULTIPLE_INSTRUMENTS = 3
 
     def __init__(self):
         super(DialogStartUp, self).__init__()
@@ -396,15 +494,30 @@ class DialogStartUp(QtGui.QDialog):
         self.combo_box_instrument_to_load.addItems(instruments_configured)
         self.combo_box_instrument_to_setup.addItems(self.instruments_to_setup)
         self.combo_box_instrument_to_delete.addItems(instruments_configured)
+        for name in instruments_configured:
+            item = QtWidgets.QListWidgetItem(name, self.list_widget_instruments_to_load)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            item.setCheckState(QtCore.Qt.Unchecked)
         self.button_load.clicked.connect(self.act_load_instrument)
+        self.button_load_multiple.clicked.connect(self.act_load_multiple_instruments)
         self.button_setup.clicked.connect(self.act_setup_instrument)
         self.button_delete.clicked.connect(self.act_delete_instrument)
         self.selection_index = None
+        self.selection_indices = []
 
     def act_load_instrument(self):
         self.selection_index = self.combo_box_instrument_to_load.currentIndex()
         self.done(self.LOAD_INSTRUMENT)
 
+    def act_load_multiple_instruments(self):
+        self.selection_indices = [i for i in range(self.list_widget_instruments_to_load.count())
+                                  if self.list_widget_instruments_to_load.item(i).checkState() == QtCore.Qt.Checked]
+        if not self.selection_indices:
+            QtGui.QMessageBox.warning(self, 'Inlinino: Load instruments', 'Select at least one instrument.',
+                                      QtGui.QMessageBox.Ok)
+            return
+        self.done(self.LOAD_MULTIPLE_INSTRUMENTS)
+
     def act_setup_instrument(self):
         self.selection_index = self.combo_box_instrument_to_setup.currentIndex()
         self.done(self.SETUP_INSTRUMENT)
@@ -423,6 +536,7 @@ class DialogStartUp(QtGui.QDialog):
             CFG.write()
             self.combo_box_instrument_to_load.removeItem(index)
             self.combo_box_instrument_to_delete.removeItem(index)
+            self.list_widget_instruments_to_load.takeItem(index)
             logger.warning(f"Deleted instrument [{index}] {instrument}")
 
 
@@ -604,6 +718,7 @@ class DialogInstrumentSetup(QtGui.QDialog):
         elif self.cfg['module'] == 'acs':
             self.cfg['manufacturer'] = 'WetLabs'
             try:
+                from pyACS.acs import ACS as ACSParser
                 # serial number in ACSParser is given in hexadecimal and preceded by 2 bytes indicating meter type
                 foo = ACSParser(self.cfg['device_file']).serial_number
                 if foo[:4] == '0x53':
@@ -622,6 +737,7 @@ class DialogInstrumentSetup(QtGui.QDialog):
             self.cfg['manufacturer'] = 'Sequoia'
             self.cfg['model'] = 'LISST'
             try:
+                from inlinino.instruments.lisst import LISSTParser
                 self.cfg['serial_number'] = str(LISSTParser(self.cfg['device_file'], self.cfg['ini_file'],
                                                             self.cfg['dcal_file'], self.cfg['zsc_file']).serial_number)
             except:
@@ -788,6 +904,10 @@ class DialogSocketConnection(QtGui.QDialog):
     def port(self) -> int:
         return int(self.sb_port.value())
 
+    @property
+    def protocol(self) -> str:
+        return self.combobox_protocol.currentText()
+
     # @property
     # def timeout(self) -> int:
     #     return int(self.sb_timeout.value())
@@ -855,17 +975,25 @@ class App(QtGui.QApplication):
         QtGui.QApplication.__init__(self, *args)
         self.splash_screen = QtGui.QSplashScreen(QtGui.QPixmap(os.path.join(PATH_TO_RESOURCES, 'inlinino.ico')))
         self.splash_screen.show()
+        self.acquisition = AcquisitionManager(InstrumentSignals)
         self.main_window = MainWindow()
+        self.acquisition_window = None
         self.startup_dialog = DialogStartUp()
         self.splash_screen.close()
 
     def start(self, instrument_index=None):
+        if isinstance(instrument_index, (list, tuple)):
+            if len(instrument_index) > 1:
+                self.start_multiple(instrument_index)
+            instrument_index = instrument_index[0] if instrument_index else None
         if not isinstance(instrument_index, int) or instrument_index > len(CFG.instruments):
             logger.debug('Startup Dialog')
             self.startup_dialog.show()
             act = self.startup_dialog.exec_()
             if act == self.startup_dialog.LOAD_INSTRUMENT:
                 instrument_index = self.startup_dialog.selection_index
+            elif act == self.startup_dialog.LOAD_MULTIPLE_INSTRUMENTS:
+                self.start_multiple(self.startup_dialog.selection_indices)
             elif act == self.startup_dialog.SETUP_INSTRUMENT:
                 setup_dialog = DialogInstrumentSetup(
                     self.startup_dialog.instruments_to_setup[self.startup_dialog.selection_index])
@@ -882,32 +1010,14 @@ class App(QtGui.QApplication):
         # Load instrument
         instrument_name = CFG.instruments[instrument_index]['model'] + ' ' \
                           + CFG.instruments[instrument_index]['serial_number']
-        instrument_module_name = CFG.instruments[instrument_index]['module']
         logger.debug('Loading instrument [' + str(instrument_index) + '] ' + instrument_name)
         instrument_loaded = False
         while not instrument_loaded:
             try:
-                if instrument_module_name == 'generic':
-                    self.main_window.init_instrument(Instrument(instrument_index, InstrumentSignals()))
-                elif instrument_module_name == 'acs':
-                    self.main_window.init_instrument(ACS(instrument_index, InstrumentSignals()))
-                elif instrument_module_name == 'dataq':
-                    self.main_window.init_instrument(DATAQ(instrument_index, InstrumentSignals()))
-                elif instrument_module_name == 'hyperbb':
-                    self.main_window.init_instrument(HyperBB(instrument_index, InstrumentSignals()))
-                elif instrument_module_name == 'lisst':
-                    self.main_window.init_instrument(LISST(instrument_index, InstrumentSignals()))
-                elif instrument_module_name == 'nmea':
-                    self.main_window.init_instrument(NMEA(instrument_index, InstrumentSignals()))
-                elif instrument_module_name == 'sunav2':
-                    self.main_window.init_instrument(SunaV2(instrument_index, InstrumentSignals()))
-                elif instrument_module_name == 'sunav1':
-                    self.main_window.init_instrument(SunaV1(instrument_index, InstrumentSignals()))
-                elif instrument_module_name == 'taratsg':
-                    self.main_window.init_instrument(TaraTSG(instrument_index, InstrumentSignals()))
-                else:
+                if not self.acquisition.is_supported(instrument_index):
                     logger.critical('Instrument module not supported')
                     sys.exit(-1)
+                self.main_window.init_instrument(self.acquisition.load(instrument_index))
                 instrument_loaded = True
             except Exception as e:
                 raise e
@@ -926,3 +1036,20 @@ class App(QtGui.QApplication):
         # Start Main Window
         self.main_window.show()
         sys.exit(self.exec_())
+
+    def start_multiple(self, instrument_indices):
+        logger.debug('Loading instruments ' + ', '.join(str(i) for i in instrument_indices))
+        invalid = [i for i in instrument_indices if not isinstance(i, int) or not 0 <= i < len(CFG.instruments)]
+        if invalid:
+            logger.critical('Invalid instrument index: ' + ', '.join(str(i) for i in invalid))
+            sys.exit(-1)
+        loaded, failed = self.acquisition.load_many(instrument_indices)
+        for cfg_id, e in failed:
+            DialogInstrumentSetup.notification(f'Unable to load instrument [{cfg_id}]. Please check configuration.', e)
+        if not loaded:
+            logger.critical('No instrument loaded')
+            sys.exit(-1)
+        # Start Acquisition Window
+        self.acquisition_window = AcquisitionWindow(self.acquisition)
+        self.acquisition_window.show()
+        sys.exit(self.exec_())
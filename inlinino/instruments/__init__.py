@@ -1,8 +1,11 @@
+import os
 import socket
 import serial
-from threading import Thread
-from time import time
-from inlinino.log import Log, LogText
+import queue
+import selectors
+from threading import Thread, Lock, Event
+from time import time, sleep
+from inlinino.log import Log, LogText, disk_monitor
 from inlinino import CFG
 import logging
 
@@ -16,6 +19,11 @@ class Instrument:
                            'log_path', 'log_raw', 'log_products',
                            'variable_columns', 'variable_types', 'variable_names', 'variable_units', 'variable_precision']
     DATA_TIMEOUT = 60  # seconds
+    PIPELINE_DRAIN_TIMEOUT = 10  # seconds
+    RECONNECT_DELAY_MIN = 1  # seconds, first delay between attempts to reopen a failed interface
+    RECONNECT_DELAY_MAX = 60  # seconds, delay doubles after each failed attempt up to this value
+    COUNTER_SCALE = None  # seconds per unit of counter in frames (e.g. 0.001 for ms), None if no counter
+    TIMESTAMP_SOURCES = ['read', 'bytes', 'counter']
 
     def __init__(self, cfg_id, signal=None):
         self.logger = logging.getLogger(self.__class__.__name__)
@@ -23,12 +31,28 @@ class Instrument:
         # Communication Interface
         self._interface = SerialInterface()
         self._terminator = None
-        self._buffer = bytearray()
+        self._buffer = bytearray()  # Used by instruments implementing their own framing (e.g. ACS)
         self._max_buffer_length = 16384
+        self._framer = None
+        self._clock = FrameClock()
+        self.timestamp_source = 'bytes'  # read: time of read, bytes: position in stream, counter: instrument
 
-        # Thread
+        # Threads: reading from interface and processing data received
         self._thread = None
+        self._worker = None
+        self._worker_stop = Event()  # Stop processing thread without draining pipeline (sentinel can't be queued)
+        self._pipeline = PipelineQueue()
+        self._pipeline_drop_warning_timestamp = 0
+        self.io_loop = None  # Shared event loop reading interfaces, dedicated thread is used if None
         self.alive = False  # Might be replaced by Thread.is_alive()
+        self._data_timeout_flag = False
+        self._data_received_timestamp = None
+
+        # Reconnection of interface on failure (e.g. USB serial adapter unplugged)
+        self.reconnect_enabled = True
+        self._interface_kwargs = None
+        self._closing = Event()  # Interrupt reconnection delays
+        self.gaps = GapStatistics()
 
         # Logger
         self._log_raw = None
@@ -36,11 +60,13 @@ class Instrument:
         self._log_active = False
         self.log_raw_enabled = False
         self.log_prod_enabled = False
+        self.disk_alarm = False
 
         # Simple parser
         self.separator = None
         self.variable_columns = None
         self.variable_types = None
+        self._generic_parser = None
 
         # User Interface
         self.signal = signal
@@ -73,7 +99,7 @@ class Instrument:
     def bare_log_prefix(self) -> str:
         return self.model + self.serial_number
 
-    def setup(self, cfg, raw_logger=LogText):
+    def setup(self, cfg, raw_logger=LogText, product_logger=Log):
         self.logger.debug('Setup')
         if self.alive:
             self.logger.warning('Closing port before updating connection')
@@ -99,6 +125,18 @@ class Instrument:
             else:
                 raise ValueError(f'Invalid communication interface {cfg["interface"]}')
         self._terminator = cfg['terminator']
+        self._framer = PacketFramer(self._terminator, self._max_buffer_length)
+        # Pipeline between reading and processing threads (optional fields)
+        self._pipeline = PipelineQueue(cfg.get('pipeline_queue_size', PipelineQueue.DEFAULT_MAXSIZE),
+                                       cfg.get('pipeline_policy', PipelineQueue.DEFAULT_POLICY))
+        self.reconnect_enabled = cfg.get('reconnect', True)
+        # Timestamping of frames (optional field)
+        timestamp_source = cfg.get('timestamp_source', 'bytes')
+        if timestamp_source not in self.TIMESTAMP_SOURCES:
+            raise ValueError(f'Invalid timestamp source {timestamp_source}')
+        if timestamp_source == 'counter' and self.COUNTER_SCALE is None:
+            raise ValueError(f'Timestamp source counter not supported by {cfg["module"]}')
+        self.timestamp_source = timestamp_source
         # Logger
         self.model = cfg['model']
         self.serial_number = cfg['serial_number']
@@ -106,12 +144,24 @@ class Instrument:
         for k in ['length', 'variable_names', 'variable_units', 'variable_precision']:
             if k in cfg.keys():
                 log_cfg[k] = cfg[k]
+        for k in list(Log.WRITER_CFG.keys()) + list(Log.COMPRESSION_CFG.keys()) + \
+                list(Log.ROTATION_CFG.keys()):  # Optional fields log_fsync, ...
+            if 'log_' + k in cfg.keys():
+                log_cfg[k] = cfg['log_' + k]
         if not self._log_raw:
             self.logger.debug('Init loggers')
             self._log_raw = raw_logger(log_cfg, self.signal.status_update)
-            self._log_prod = Log(log_cfg, self.signal.status_update)
+            self._log_prod = product_logger(log_cfg, self.signal.status_update)
         else:
+            if type(self._log_prod) is not product_logger:  # Format of products changed
+                self._log_prod.close()
+                disk_monitor.unregister(self._log_prod)
+                self._log_prod = product_logger(log_cfg, self.signal.status_update)
             self.log_update_cfg(log_cfg)
+        # Free space of volume of log files (optional fields)
+        for log in (self._log_raw, self._log_prod):
+            disk_monitor.register(log, self.on_disk_alarm, cfg.get('log_disk_policy', 'alarm'),
+                                  cfg.get('log_secondary_path', None))
         self._log_active = False
         self.log_raw_enabled = cfg['log_raw']
         self.log_prod_enabled = cfg['log_products']
@@ -122,6 +172,8 @@ class Instrument:
             self.variable_columns = cfg['variable_columns']
         if 'variable_types' in cfg.keys():
             self.variable_types = cfg['variable_types']
+        if self.separator is not None and self.variable_columns is not None and self.variable_types is not None:
+            self._generic_parser = GenericParser(self.separator, self.variable_columns, self.variable_types)
         # User Interface
         # self.manufacturer = cfg['manufacturer']
         self.variable_names = cfg['variable_names']
@@ -132,9 +184,25 @@ class Instrument:
         if not self.alive:
             # Open serial connection
             self._interface.open(**kwargs)
+            self._interface_kwargs = kwargs
+            self._clock = FrameClock(self._interface.byte_duration if self.timestamp_source != 'read' else None,
+                                     self.COUNTER_SCALE if self.timestamp_source == 'counter' else None)
+            self._closing.clear()
+            self.gaps.reset()
             self.alive = True
-            # Start reading/writing thread
-            self._thread = Thread(name=self.name, target=self.run)
+            self._data_timeout_flag = False
+            self._data_received_timestamp = None
+            # Start processing thread (framing, parsing, and logging)
+            self._pipeline.reset_counters()
+            self._worker_stop = Event()  # New event as a processing thread that didn't join might still be running
+            self._worker = Thread(name=self.name + ' processing', target=self.process, args=(self._worker_stop,))
+            self._worker.daemon = True
+            self._worker.start()
+            # Start reading with shared event loop if interface support it, otherwise with dedicated thread
+            if self.io_loop is not None and self._interface.fileno() is not None:
+                self._thread = Thread(name=self.name, target=self.run_in_loop)
+            else:
+                self._thread = Thread(name=self.name, target=self.run)
             self._thread.daemon = True
             self._thread.start()
             # Signal to UI
@@ -143,15 +211,37 @@ class Instrument:
     def close(self, wait_thread_join=True):
         if self.alive:
             self.alive = False
+            self._closing.set()
             self.signal.status_update.emit()
+            if self.io_loop is not None:
+                self.io_loop.unregister(self)
             self._interface.stop()
             if wait_thread_join:
                 self._thread.join(self._interface.timeout)
                 if self._thread.is_alive():
                     self.logger.warning('Thread did not join.')
+            # Process data left in pipeline before closing log files, unless processing is stuck (e.g. disk stall)
+            deadline = time() + self.PIPELINE_DRAIN_TIMEOUT
+            try:
+                self._pipeline.put(None, timeout=self.PIPELINE_DRAIN_TIMEOUT)
+            except queue.Full:
+                self._worker_stop.set()
+            self._worker.join(max(deadline - time(), 0))
+            if self._worker.is_alive():
+                self._worker_stop.set()
+                self.logger.warning('Processing thread did not join.')
+            if self._pipeline.dropped_chunks:
+                self.logger.warning(f'Pipeline dropped {self._pipeline.dropped_chunks} chunks '
+                                    f'({self._pipeline.dropped_bytes} bytes), maximum queue depth was '
+                                    f'{self._pipeline.max_depth}')
             self.log_stop()
             self._interface.close()
-            self._buffer = bytearray()
+            self.reset_buffers()
+
+    def reset_buffers(self):
+        # Discard incomplete packets
+        self._buffer = bytearray()
+        self._framer.reset()
 
     def run(self):
         if self._interface.is_open:
@@ -159,47 +249,137 @@ class Instrument:
             self._interface.init()
             # Send init frame to instrument
             self.init_interface()
-            # Set data timeout flag
-            data_timeout_flag = False
-            data_received = None
         while self.alive and self._interface.is_open:
             try:
                 # read all that is there or wait for one byte (blocking)
                 data = self._interface.read()
                 timestamp = time()
                 if data:
-                    try:
-                        self.data_received(data, timestamp)
-                        if len(self._buffer) > self._max_buffer_length:
-                            self.logger.warning('Buffer exceeded maximum length. Buffer emptied to prevent overflow')
-                            self._buffer = bytearray()
-                        data_received = timestamp
-                        if data_timeout_flag:
-                            data_timeout_flag = False
-                            self.signal.alarm.emit(False)
-                    except Exception as e:
-                        self.logger.warning(e)
-                        # raise e
+                    self.feed(data, timestamp)
                 else:
-                    if data_received is not None and \
-                            timestamp - data_received > self.DATA_TIMEOUT and data_timeout_flag is False:
-                        self.logger.error(f'No data received during the past {timestamp - data_received:.2f} seconds')
-                        data_timeout_flag = True
-                        self.signal.alarm.emit(True)
+                    self.check_data_timeout(timestamp)
             except InterfaceException as e:
                 # probably some I/O problem such as disconnected USB serial
-                # adapters -> exit
+                # adapters -> reopen interface or exit
                 self.logger.error(e)
                 self.signal.alarm.emit(True)
-                break
+                if not self.reconnect():
+                    break
         self.close(wait_thread_join=False)
 
+    def run_in_loop(self):
+        # Initialize interface and instrument before handing reads to event loop as it might block
+        if self._interface.is_open:
+            self._interface.init()
+            self.init_interface()
+            self.io_loop.register(self)
+
+    def feed(self, data, timestamp, block=True):
+        """
+        Hand data read from interface to processing thread
+        Called from reading thread or event loop, must return quickly.
+        :param block: wait for space in pipeline with policy block (False from event loop, data is dropped instead)
+        """
+        if not self._pipeline.push(data, timestamp, block) and \
+                timestamp - self._pipeline_drop_warning_timestamp > self.DATA_TIMEOUT:
+            self.logger.warning(f'Pipeline queue full ({self._pipeline.policy}), '
+                                f'dropped {self._pipeline.dropped_chunks} chunks so far')
+            self._pipeline_drop_warning_timestamp = timestamp
+        self._data_received_timestamp = timestamp
+        if self._data_timeout_flag:
+            self._data_timeout_flag = False
+            if not self.disk_alarm:
+                self.signal.alarm.emit(False)
+
+    def check_data_timeout(self, timestamp):
+        if self._data_received_timestamp is not None and self._data_timeout_flag is False and \
+                timestamp - self._data_received_timestamp > self.DATA_TIMEOUT:
+            self.logger.error(f'No data received during the past '
+                              f'{timestamp - self._data_received_timestamp:.2f} seconds')
+            self._data_timeout_flag = True
+            self.signal.alarm.emit(True)
+
+    def on_disk_alarm(self, active):
+        # Called from disk monitor thread when the volume of log files is about to be full
+        self.disk_alarm = active
+        if active or not self._data_timeout_flag:
+            self.signal.alarm.emit(active)
+
+    def interface_failed(self, exception):
+        # Called from a separate thread by event loop
+        self.logger.error(exception)
+        self.signal.alarm.emit(True)
+        if self.reconnect():
+            self.io_loop.register(self)
+        else:
+            self.close(wait_thread_join=False)
+
+    def reconnect(self):
+        """
+        Reopen interface after a failure, with exponential backoff, until success or instrument closed.
+        Log files are kept open so acquisition resumes in the same files, the duration of the gap is
+        recorded in gap statistics. The data timeout alarm stays on until data is received again.
+        :return: True if interface was reopened, False if reconnection is disabled or instrument was closed
+        """
+        if not self.reconnect_enabled or self._interface_kwargs is None or not self.alive:
+            return False
+        gap_start = time()
+        self._data_timeout_flag = True  # Alarm is turned off by next data received
+        try:
+            self._interface.close()  # Release port so device can be re-enumerated with same name
+        except OSError:
+            pass
+        self.logger.warning(f'Interface failed, reconnecting {self.name}')
+        delay, attempts = self.RECONNECT_DELAY_MIN, 0
+        while self.alive:
+            attempts += 1
+            try:
+                self._interface.reopen(**self._interface_kwargs)
+            except (InterfaceException, OSError, ValueError) as e:
+                self.logger.debug(f'Reconnection attempt {attempts} failed: {e}')
+                if self._closing.wait(delay):
+                    break
+                delay = min(2 * delay, self.RECONNECT_DELAY_MAX)
+                continue
+            if not self.alive:  # Closed while reopening
+                self._interface.close()
+                break
+            gap = time() - gap_start
+            self.gaps.add(gap_start, gap)
+            self.logger.info(f'Reconnected {self.name} on {self.interface_name} after {gap:.1f} seconds '
+                             f'and {attempts} attempt(s), {self.gaps}')
+            self._interface.init()
+            self.init_interface()
+            self.signal.status_update.emit()
+            return True
+        return False
+
+    def process(self, stop=None):
+        """
+        Process data of pipeline until sentinel (None) is received or stop is set
+        :param stop: threading.Event, set to stop without processing data left in pipeline
+        """
+        while stop is None or not stop.is_set():
+            item = self._pipeline.get()
+            if item is None:  # Sentinel sent on close
+                break
+            try:
+                self.data_received(*item)
+                if len(self._buffer) > self._max_buffer_length:
+                    self.logger.warning('Buffer exceeded maximum length. Buffer emptied to prevent overflow')
+                    self._buffer = bytearray()
+            except Exception as e:
+                self.logger.warning(e)
+                # raise e
+
     def data_received(self, data, timestamp):
-        self._buffer.extend(data)
-        while self._terminator in self._buffer:
-            packet, self._buffer = self._buffer.split(self._terminator, 1)
+        overflows = self._framer.overflows
+        # Packets are views on the framer buffer, copy once as parsers and loggers keep a reference
+        packets = [bytes(packet) for packet in self._framer.feed(data)]
+        timestamps = self.frame_timestamps(packets, timestamp)
+        for packet, packet_timestamp in zip(packets, timestamps):
             try:
-                self.handle_packet(packet, timestamp)
+                self.handle_packet(packet, packet_timestamp)
             except IndexError:
                 self.signal.packet_corrupted.emit()
                 self.logger.warning('Incomplete packet or Incorrect variable column requested.')
@@ -215,6 +395,25 @@ class Instrument:
                 self.logger.warning(e)
                 self.logger.debug(packet)
                 # raise e
+        if self._framer.overflows != overflows:
+            self.logger.warning('Buffer exceeded maximum length. Dropped bytes up to next terminator to resync')
+
+    def frame_timestamps(self, packets, timestamp):
+        """
+        Time at which each packet split from a chunk was received, from its position in the stream
+        :param packets: packets split from chunk (without terminator)
+        :param timestamp: time at which chunk was read
+        :return: list of timestamps
+        """
+        if self._clock.byte_duration is None:
+            return [timestamp] * len(packets)
+        # Bytes received after the end of each packet: rest of chunk and incomplete packet left in framer
+        remaining, timestamps = len(self._framer), [None] * len(packets)
+        terminator_length = len(self._framer.terminator)
+        for i in range(len(packets) - 1, -1, -1):
+            timestamps[i] = remaining
+            remaining += len(packets[i]) + terminator_length
+        return [self._clock.spread(timestamp, r) for r in timestamps]
 
     def handle_packet(self, packet, timestamp):
         self.signal.packet_received.emit()
@@ -257,9 +456,9 @@ class Instrument:
 
     def log_get_file_ext(self):
         if self.log_raw_enabled or not self.log_prod_enabled:
-            return self._log_raw.FILE_EXT
+            return self._log_raw.file_ext
         else:
-            return self._log_prod.FILE_EXT
+            return self._log_prod.file_ext
 
     def log_update_cfg(self, log_cfg):
         self.logger.debug('Update loggers configuration')
@@ -273,16 +472,7 @@ class Instrument:
         pass
 
     def parse(self, packet):
-        foo = packet.split(self.separator)
-        bar = []
-        for c, t in zip(self.variable_columns, self.variable_types):
-            if t == "int":
-                bar.append(int(foo[c]))
-            elif t == "float":
-                bar.append(float(foo[c]))
-            else:
-                raise ValueError("Variable type not supported.")
-        return bar
+        return self._generic_parser.parse(packet)
 
     def __str__(self):
         if self.alive:
@@ -294,6 +484,393 @@ class Instrument:
             return self.name + '[off]'
 
 
+class GenericParser:
+    """
+    Parse packets of delimited values into a list of int or float
+
+    The selection and conversion of columns (variable_columns and variable_types) is compiled once
+    into a single function instead of being interpreted for each packet.
+    Errors are the same as Instrument.parse: IndexError if a column is missing and ValueError if a
+    value can't be converted or a type is not supported.
+    """
+    TYPES = {'int': int, 'float': float}
+
+    def __init__(self, separator, columns, types):
+        self.separator = separator
+        self.columns = list(columns)
+        self.types = list(types)
+        self.parse = self.compile()
+
+    def compile(self):
+        values = []
+        for c, t in zip(self.columns, self.types):
+            if t in self.TYPES.keys():
+                values.append(f'{t}(foo[{int(c)}])')
+            else:
+                values.append('unsupported()')
+        source = 'def parse(packet):\n' \
+                 '    foo = packet.split(separator)\n' \
+                 f'    return [{", ".join(values)}]\n'
+        namespace = {'separator': self.separator, 'unsupported': self.unsupported}
+        exec(compile(source, '<GenericParser>', 'exec'), namespace)
+        return namespace['parse']
+
+    @staticmethod
+    def unsupported():
+        raise ValueError('Variable type not supported.')
+
+
+class PacketFramer:
+    """
+    Split a stream of bytes into packets delimited by a terminator
+
+    Bytes are accumulated in a preallocated buffer which is scanned only once for terminators,
+    packets are returned as memoryview slices of that buffer (no copy), and the incomplete
+    packet left at the end of the buffer is moved to the front only when the buffer is full.
+    Packets returned are only valid until the next call to feed or reset.
+    When an incomplete packet exceeds max_length, its bytes are dropped and the framer
+    resynchronizes on the next terminator instead of emptying the whole buffer.
+    """
+    def __init__(self, terminator, max_length=16384):
+        if not terminator:
+            raise ValueError('PacketFramer requires a terminator.')
+        self.terminator = bytes(terminator)
+        self.max_length = max_length
+        self._buffer = bytearray(2 * max_length)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # beginning of incomplete packet
+        self._end = 0  # end of data in buffer
+        self._scan = 0  # position from which to search for next terminator
+        self._resync = False  # True when beginning of incomplete packet was dropped
+        # Statistics
+        self.overflows = 0
+        self.bytes_dropped = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def reset(self):
+        self._start, self._end, self._scan = 0, 0, 0
+        self._resync = False
+
+    def feed(self, data):
+        """
+        Append data to buffer and return all complete packets
+        :param data: bytes-like object
+        :return: list of memoryview, one per packet, terminator excluded
+        """
+        start, end, n = self._start, self._end, len(data)
+        if end + n > len(self._buffer):
+            if end - start + n > len(self._buffer):
+                # Allocate a larger buffer rather than resizing it as packets might still be referenced
+                buffer = bytearray(max(2 * len(self._buffer), end - start + n))
+                buffer[:end - start] = self._view[start:end]
+                self._buffer, self._view = buffer, memoryview(buffer)
+            else:
+                # Move incomplete packet to the front of the buffer
+                self._view[:end - start] = self._view[start:end]
+            end -= start
+            self._scan -= start
+            start = 0
+        self._view[end:end + n] = data
+        end += n
+        # Find all terminators in one pass
+        packets = []
+        terminator, terminator_length = self.terminator, len(self.terminator)
+        find, view = self._buffer.find, self._view
+        i = find(terminator, self._scan, end)
+        while i >= 0:
+            if self._resync:
+                # Beginning of packet was dropped, discard end of packet
+                self._resync = False
+                self.bytes_dropped += i + terminator_length - start
+            else:
+                packets.append(view[start:i])
+            start = i + terminator_length
+            i = find(terminator, start, end)
+        # Drop incomplete packet if too long, keeping bytes that could be the beginning of a terminator
+        if end - start > self.max_length:
+            drop = end - start - terminator_length + 1
+            self.bytes_dropped += drop
+            self.overflows += 1
+            self._resync = True
+            start += drop
+        self._start, self._end = start, end
+        self._scan = max(start, end - terminator_length + 1)
+        return packets
+
+
+class FrameClock:
+    """
+    Reconstruct the time at which each frame was received when a single read returns several frames
+
+    Frames are spread backwards from the time the chunk was read by the number of bytes received after
+    them times the duration of a byte on the line (serial interfaces only). If the instrument embeds a
+    counter in its frames (e.g. milliseconds since power on), it is mapped to host time instead: the offset
+    between host time and counter is tracked on the least delayed frames (minimum offset) and the drift of
+    the instrument clock is estimated from the change of that minimum offset between successive windows.
+    Timestamps returned by each method don't decrease across the frames spread back from a read, nor from one
+    read to the next, unless the host clock stepped back (e.g. NTP or GPS correction): when the time of a read
+    goes back by more than the duration of the chunk, the state is reset and host time is followed again.
+    Their state is separate as a frame is sampled before it's received: spread is called on reception, before
+    from_counter is called on the same frame.
+    """
+    DRIFT_WINDOW = 60  # seconds, duration on which the minimum offset is tracked
+    MAX_DRIFT = 1e-3  # relative drift of the instrument clock, estimates are bounded
+
+    def __init__(self, byte_duration=None, counter_scale=None):
+        """
+        :param byte_duration: seconds to transmit one byte, None if unknown (time of read is used)
+        :param counter_scale: seconds per unit of counter, None if frames have no counter
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.byte_duration = byte_duration
+        self.counter_scale = counter_scale
+        self._read = None  # time of last chunk read
+        self._last = float('-inf')  # last timestamp returned by spread
+        self._last_sampled = float('-inf')  # last timestamp returned by from_counter
+        self.reset()
+
+    def reset(self):
+        self.drift = 0  # relative (e.g. 1e-5 is instrument clock running 10 ppm slower than host)
+        self._counter = None  # last counter received (seconds)
+        self._reference = None  # (counter, offset) of host time = counter + offset + drift * (counter - reference)
+        self._window = None  # (start counter, counter of minimum offset, minimum offset) of current window
+        self._previous = None  # (counter, minimum offset) of previous window
+
+    def spread(self, timestamp, remaining):
+        """
+        :param timestamp: time at which the chunk was read
+        :param remaining: number of bytes received after the end of the frame
+        :return: time at which the frame was received
+        """
+        duration = 0 if self.byte_duration is None else remaining * self.byte_duration
+        if timestamp != self._read:
+            # First frame of chunk, bytes after it span the duration of the chunk
+            if self._read is not None and timestamp < self._read - duration:
+                self.logger.warning(f'Host clock stepped back by {self._read - timestamp:.3f} seconds')
+                self._last = float('-inf')
+            self._read = timestamp
+        timestamp, self._last = self._monotonic(timestamp - duration, self._last)
+        return timestamp
+
+    def from_counter(self, counter, timestamp):
+        """
+        :param counter: counter of instrument in frame
+        :param timestamp: time at which the frame was received (upper bound of time at which it was sampled)
+        :return: time at which the frame was sampled according to the instrument clock
+        """
+        if self.counter_scale is None:
+            return timestamp
+        if timestamp < self._last_sampled:
+            # Received before previous frame was sampled, host clock stepped back, map counter again
+            self.reset()
+            self._last_sampled = float('-inf')
+        t = counter * self.counter_scale
+        if self._counter is not None and t < self._counter:
+            self.reset()  # Counter reset, instrument restarted
+        self._counter = t
+        offset = timestamp - t
+        # Track least delayed frame of window, the lower envelope follows the instrument clock
+        if self._window is None:
+            self._window = (t, t, offset)
+        elif offset < self._window[2]:
+            self._window = (self._window[0], t, offset)
+        if t - self._window[0] >= self.DRIFT_WINDOW:
+            _, t_min, offset_min = self._window
+            if self._previous is not None:
+                drift = (offset_min - self._previous[1]) / (t_min - self._previous[0])
+                self.drift = max(-self.MAX_DRIFT, min(self.MAX_DRIFT, drift))
+            self._previous = (t_min, offset_min)
+            self._reference = (t_min, offset_min)
+            self._window = (t, t, offset)
+        # A frame can't be sampled after it's received
+        if self._reference is None or offset < self._predict(t) - t:
+            self._reference = (t, offset)
+        timestamp, self._last_sampled = self._monotonic(self._predict(t), self._last_sampled)
+        return timestamp
+
+    def _predict(self, t):
+        reference, offset = self._reference
+        return t + offset + self.drift * (t - reference)
+
+    @staticmethod
+    def _monotonic(timestamp, last):
+        # Timestamp not before last timestamp returned, and new last timestamp
+        timestamp = max(timestamp, last)
+        return timestamp, timestamp
+
+
+class GapStatistics:
+    """
+    Interruptions of acquisition due to interface failures, measured from failure to reconnection
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0  # seconds
+        self.longest = 0  # seconds
+        self.last = None  # (start timestamp, duration in seconds)
+
+    def reset(self):
+        self.__init__()
+
+    def add(self, start, duration):
+        self.count += 1
+        self.total += duration
+        self.longest = max(self.longest, duration)
+        self.last = (start, duration)
+
+    def __str__(self):
+        return f'gaps: {self.count}, downtime: {self.total:.1f} s, longest: {self.longest:.1f} s'
+
+
+class PipelineQueue(queue.Queue):
+    """
+    Bounded queue of timestamped chunks of bytes between the reading and the processing threads
+
+    Policies available when the queue is full:
+        block: reading thread waits for the processing thread to free space (backpressure)
+        drop_newest: chunk just read is discarded
+        drop_oldest: oldest chunk in queue is discarded to make space for the chunk just read
+    Pushes that must not block (e.g. from the event loop shared by several instruments) drop the chunk just
+    read with policy block.
+    """
+    POLICIES = ['block', 'drop_newest', 'drop_oldest']
+    DEFAULT_MAXSIZE = 8192  # chunks
+    DEFAULT_POLICY = 'block'
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, policy=DEFAULT_POLICY):
+        if policy not in self.POLICIES:
+            raise ValueError(f'Invalid pipeline policy {policy}')
+        super().__init__(maxsize)
+        self.policy = policy
+        # Statistics
+        self.max_depth = 0
+        self.dropped_chunks = 0
+        self.dropped_bytes = 0
+
+    @property
+    def depth(self) -> int:
+        return self.qsize()
+
+    def reset_counters(self):
+        self.max_depth = 0
+        self.dropped_chunks = 0
+        self.dropped_bytes = 0
+
+    def push(self, data, timestamp, block=True):
+        """
+        Add chunk of bytes to queue following policy
+        :param data: bytes read from interface
+        :param timestamp: time at which data was read
+        :param block: wait for space with policy block, otherwise the chunk is dropped if queue is full
+        :return: False if a chunk was dropped, True otherwise
+        """
+        dropped = None
+        if self.policy == 'block' and block:
+            self.put((data, timestamp))
+        else:
+            try:
+                self.put_nowait((data, timestamp))
+            except queue.Full:
+                if self.policy in ('block', 'drop_newest'):
+                    dropped = data
+                else:
+                    try:
+                        dropped = self.get_nowait()[0]
+                    except queue.Empty:  # emptied by processing thread in the meantime
+                        dropped = b''
+                    self.put((data, timestamp))
+        depth = self.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if dropped is not None:
+            self.dropped_chunks += 1
+            self.dropped_bytes += len(dropped)
+            return False
+        return True
+
+
+class IOLoop:
+    """
+    Event loop reading the interfaces of several instruments from a single thread
+
+    Interfaces exposing a file descriptor (sockets and serial ports on posix) are multiplexed with selectors,
+    chunks read are timestamped and fed to the instrument pipeline, and data timeouts are checked at every tick.
+    Unregistering an instrument is immediate, there is no blocking read to cancel. Chunks are fed without
+    waiting for space in the pipeline (dropped and counted if full) so a slow instrument doesn't stall the others.
+    """
+    TICK = 1  # seconds
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._selector = selectors.DefaultSelector()
+        self._lock = Lock()
+        self._instruments = dict()  # instrument: file descriptor
+        self._thread = None
+        self.alive = False
+
+    def register(self, instrument):
+        with self._lock:
+            if not instrument.alive or instrument in self._instruments.keys():
+                return
+            fd = instrument._interface.fileno()
+            self._selector.register(fd, selectors.EVENT_READ, instrument)
+            self._instruments[instrument] = fd
+            if not self.alive:
+                self.alive = True
+                self._thread = Thread(name='IOLoop', target=self.run)
+                self._thread.daemon = True
+                self._thread.start()
+        self.logger.debug(f'Registered {instrument.name}')
+
+    def unregister(self, instrument):
+        with self._lock:
+            self._unregister(instrument)
+
+    def _unregister(self, instrument):
+        if instrument in self._instruments.keys():
+            self._selector.unregister(self._instruments.pop(instrument))
+            self.logger.debug(f'Unregistered {instrument.name}')
+
+    def stop(self):
+        with self._lock:
+            for instrument in list(self._instruments.keys()):
+                self._unregister(instrument)
+            self.alive = False
+        if self._thread is not None:
+            self._thread.join(self.TICK)
+
+    def run(self):
+        while self.alive:
+            if not self._instruments:
+                sleep(self.TICK)  # select on no file descriptors is an error on some platforms
+                continue
+            events = self._selector.select(self.TICK)
+            timestamp = time()
+            chunks = []
+            with self._lock:
+                for key, mask in events:
+                    instrument = key.data
+                    if instrument not in self._instruments.keys():  # unregistered during select
+                        continue
+                    try:
+                        data = instrument._interface.read_nowait()
+                    except InterfaceException as e:
+                        self._unregister(instrument)
+                        Thread(name=instrument.name + ' closing', target=instrument.interface_failed, args=(e,),
+                               daemon=True).start()
+                        continue
+                    if data:
+                        chunks.append((instrument, data))
+                instruments = list(self._instruments.keys())
+            # Instruments are fed and checked without holding lock, so (un)registering never waits on them
+            for instrument, data in chunks:
+                instrument.feed(data, timestamp, block=False)
+            for instrument in instruments:
+                instrument.check_data_timeout(timestamp)
+
+
 class InterfaceException(Exception):
     pass
 
@@ -315,9 +892,19 @@ class Interface:
     def name(self) -> str:
         raise NotImplementedError
 
+    @property
+    def byte_duration(self):
+        # Seconds to transmit one byte, None if unknown (e.g. network)
+        return None
+
     def open(self, **kwargs):
         pass
 
+    def reopen(self, **kwargs):
+        # Open interface again with the same parameters after a failure
+        self.close()
+        self.open(**kwargs)
+
     def init(self):
         # typically run once after connection is openned
         pass
@@ -332,6 +919,14 @@ class Interface:
     def read(self):
         pass
 
+    def fileno(self):
+        # File descriptor to use with selectors, None if not supported
+        return None
+
+    def read_nowait(self):
+        # Read data available, only called when fileno is readable
+        return self.read()
+
     def write(self, data):
         pass
 
@@ -339,6 +934,7 @@ class Interface:
 class SerialInterface(Interface):
     def __init__(self):
         self._serial = serial.Serial()
+        self._usb_serial_number = None  # Identify USB serial adapter if port name changes on reconnection
 
     @property
     def is_open(self) -> bool:
@@ -348,6 +944,12 @@ class SerialInterface(Interface):
     def timeout(self) -> int:
         return self._serial.timeout
 
+    @property
+    def byte_duration(self):
+        # Start bit, data bits, parity bit, and stop bits
+        bits = 1 + self._serial.bytesize + (self._serial.parity != serial.PARITY_NONE) + self._serial.stopbits
+        return bits / self._serial.baudrate if self._serial.baudrate else None
+
     @property
     def name(self) -> str:
         if self.is_open:
@@ -369,6 +971,30 @@ class SerialInterface(Interface):
             self._serial.open()
         except serial.SerialException as e:
             raise InterfaceException(f'Unable to connect port {port}.\n{e}')
+        port_info = self.find_port(device=port)
+        self._usb_serial_number = port_info.serial_number if port_info is not None else None
+
+    def reopen(self, **kwargs):
+        # USB serial adapters re-enumerated might get another port name (e.g. ttyUSB0 becomes ttyUSB1)
+        self.close()
+        if self._usb_serial_number:
+            port_info = self.find_port(serial_number=self._usb_serial_number)
+            if port_info is not None:
+                kwargs = dict(kwargs, port=port_info.device)
+        self.open(**kwargs)
+
+    @staticmethod
+    def find_port(device=None, serial_number=None):
+        """
+        Find serial port currently available by name or USB serial number
+        :return: port information (serial.tools.list_ports_common.ListPortInfo) or None if not found
+        """
+        from serial.tools import list_ports
+        for port_info in list_ports.comports():
+            if (device is not None and port_info.device == device) or \
+                    (serial_number is not None and port_info.serial_number == serial_number):
+                return port_info
+        return None
 
     def init(self):
         # Empty buffers
@@ -390,42 +1016,182 @@ class SerialInterface(Interface):
         except serial.SerialException as e:
             raise InterfaceException(e)
 
+    def fileno(self):
+        # Only posix serial ports can be used with selectors
+        if os.name == 'posix' and self.is_open and hasattr(self._serial, 'fileno'):
+            return self._serial.fileno()
+        return None
+
+    def read_nowait(self):
+        try:
+            n = self._serial.in_waiting
+            if n == 0:
+                raise InterfaceException('Device reports readiness to read but returned no data '
+                                         '(device disconnected?)')
+            return self._serial.read(n)
+        except (serial.SerialException, OSError) as e:
+            raise InterfaceException(e)
+
     def write(self, data):
         self._serial.write(data)
 
 
 class SocketInterface(Interface):
+    """
+    Receive data from a UDP socket, or a TCP connection as client (e.g. serial to ethernet server) or server.
+    Data is received in a preallocated buffer and reads return after at most timeout seconds without data,
+    so the data timeout alarm of the instrument is raised. TCP connections lost are re-established (client)
+    or a new client is accepted (server) without closing the interface.
+    """
+    PROTOCOLS = ('udp', 'tcp_client', 'tcp_server')
+    BUFFER_SIZE = 65536  # bytes
+    KEEPALIVE_IDLE = 10  # seconds, idle time before first keepalive probe
+    KEEPALIVE_INTERVAL = 5  # seconds, between keepalive probes
+    KEEPALIVE_COUNT = 3  # unanswered probes before connection is considered lost
+
     def __init__(self):
         super().__init__()
-        self._socket = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._socket = None  # socket data is received from
+        self._server = None  # listening socket (tcp_server only)
+        self._protocol = 'udp'
+        self._address = None
+        self._buffer = bytearray(self.BUFFER_SIZE)
+        self._view = memoryview(self._buffer)
 
     @property
-    def timeout(self) -> int:
-        return self._socket.gettimeout()
+    def protocol(self) -> str:
+        return self._protocol
 
     @property
     def name(self) -> str:
         if self.is_open:
-            ip, port = self._socket.getsockname()
+            ip, port = self._address
+            if self._protocol == 'tcp_client':
+                return f'tcp:{ip}:{port}'
+            elif self._protocol == 'tcp_server':
+                return f'tcp:{port}'
             return f'socket:{port}'
         else:
             return f'socket'
 
-    def open(self, ip, port, timeout=1):
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self._socket.bind((ip, port))
-        # self._socket.settimeout(timeout)
+    def open(self, ip, port, timeout=1, protocol='udp'):
+        """
+        :param ip: udp and tcp_server: address to bind (0.0.0.0 for all); tcp_client: address of server
+        :param port: port to bind (udp and tcp_server) or connect to (tcp_client)
+        :param timeout: seconds, maximum time a read waits for data
+        :param protocol: udp, tcp_client, or tcp_server
+        """
+        if protocol not in self.PROTOCOLS:
+            raise ValueError(f'Invalid socket protocol {protocol}, expected {", ".join(self.PROTOCOLS)}.')
+        self._protocol, self._address, self._timeout = protocol, (ip, port), timeout
+        try:
+            if protocol == 'udp':
+                self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self._socket.bind(self._address)
+                self._socket.settimeout(timeout)
+            elif protocol == 'tcp_client':
+                self._connect()
+            else:
+                self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self._server.bind(self._address)
+                self._server.listen(1)
+                self._server.settimeout(timeout)
+        except OSError as e:
+            self.close()
+            raise InterfaceException(f'Unable to open {protocol} socket {ip}:{port}.\n{e}')
         self._is_open = True
 
+    def _connect(self):
+        self._socket = self._set_keepalive(socket.create_connection(self._address, self._timeout))
+        self._socket.settimeout(self._timeout)
+
+    def _accept(self):
+        try:
+            s, (ip, port) = self._server.accept()
+        except socket.timeout:
+            return False
+        self.logger.info(f'Connection from {ip}:{port}')
+        self._socket = self._set_keepalive(s)
+        self._socket.settimeout(self._timeout)
+        return True
+
+    def _set_keepalive(self, s):
+        # Detect half-open connections (e.g. network cable unplugged) instead of waiting on them forever
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in (('TCP_KEEPIDLE', self.KEEPALIVE_IDLE), ('TCP_KEEPINTVL', self.KEEPALIVE_INTERVAL),
+                              ('TCP_KEEPCNT', self.KEEPALIVE_COUNT)):
+            if hasattr(socket, option):
+                try:
+                    s.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+                except OSError:  # Not supported by platform
+                    pass
+        return s
+
+    def _disconnect(self, reason):
+        self.logger.warning(f'Connection lost on {self.name} ({reason})')
+        s, self._socket = self._socket, None
+        if s is not None:
+            s.close()
+
+    def _reconnect(self):
+        """
+        Attempt to re-establish TCP connection, blocks at most timeout seconds
+        :return: True if connected
+        """
+        start = time()
+        try:
+            if self._protocol == 'tcp_server':
+                return self._accept()
+            self._connect()
+            self.logger.info(f'Reconnected to {self.name}')
+            return True
+        except OSError as e:
+            if not self._is_open:
+                return False
+            self.logger.debug(f'Unable to reconnect: {e}')
+            # Pace attempts as refused connections fail immediately
+            sleep(max(0, self._timeout - (time() - start)))
+            return False
+
     def close(self):
         self._is_open = False
-        if self._socket is not None:
-            self._socket.close()
+        sockets, self._socket, self._server = (self._socket, self._server), None, None
+        for s in sockets:
+            if s is not None:
+                s.close()
 
     def read(self):
-        return self._socket.recv(65536)
-        # return self._socket.recvfrom(socket.CMSG_SPACE(200))[0]  # socket.CMSG_SPACE is not supported by Windows
+        s = self._socket
+        if s is None:
+            if not self._is_open or not self._reconnect():
+                return b''
+            s = self._socket
+        try:
+            n = s.recv_into(self._buffer)
+        except socket.timeout:
+            return b''
+        except OSError as e:
+            if not self._is_open:  # closed while reading
+                return b''
+            if self._protocol == 'udp':
+                raise InterfaceException(e)
+            self._disconnect(e)
+            return b''
+        if n == 0 and self._protocol != 'udp':
+            self._disconnect('closed by peer')
+            return b''
+        # Copy only bytes received as buffer is reused
+        return bytes(self._view[:n])
+
+    def fileno(self):
+        # TCP sockets are replaced on reconnection, hence read from a dedicated thread
+        return self._socket.fileno() if self.is_open and self._protocol == 'udp' else None
 
     def write(self, data):
-        self._socket.send(data)
-
+        s = self._socket
+        if s is None:
+            self.logger.warning(f'Data not sent, no connection on {self.name}')
+            return
+        s.sendall(data)
@@ -1,8 +1,8 @@
 from inlinino.instruments import Instrument
-from inlinino.log import LogBinary
+from inlinino.log import LogBinary, Log, LogNumpy
+from inlinino.readers import read_bin as read_bin_frames
 from pyACS.acs import ACS as ACSParser
 from pyACS.acs import ACSError
-import pyqtgraph as pg
 from time import time
 import numpy as np
 from threading import Lock
@@ -11,6 +11,7 @@ from threading import Lock
 class ACS(Instrument):
 
     REGISTRATION_BYTES = b'\xff\x00\xff\x00'
+    COUNTER_SCALE = 0.001  # seconds, frames embed milliseconds since power on
     REQUIRED_CFG_FIELDS = ['device_file',
                            'model', 'serial_number', 'module',
                            'log_path', 'log_raw', 'log_products',
@@ -21,29 +22,32 @@ class ACS(Instrument):
         self._parser = None
         self._timestamp_flag_out_T_cal = 0
 
-        # Init Graphic for real time spectrum visualization
+        # Init Graphic for real time spectrum visualization (skipped when running headless)
         # TODO Refactor code and move it to GUI
-        # Set Color mode
-        pg.setConfigOption('background', '#F8F8F2')
-        pg.setConfigOption('foreground', '#26292C')
-        self._pw = pg.plot(enableMenu=False)
-        self._pw.setWindowTitle('ACS Spectrum')
-        self._plot = self._pw.plotItem
-        self._plot.addLegend()
-        # Init Curve Items
-        self._plot_curve_c = pg.PlotCurveItem(pen=pg.mkPen(color='#1f77b4', width=2), name='c')
-        self._plot_curve_a = pg.PlotCurveItem(pen=pg.mkPen(color='#2ca02c', width=2), name='a')
-        # Add item to plot
-        self._plot.addItem(self._plot_curve_c)
-        self._plot.addItem(self._plot_curve_a)
-        # Decoration
-        self._plot.setLabel('bottom', 'Wavelength' , units='nm')
-        self._plot.setLabel('left', 'Signal', units='m<sup>-1</sup>')
-        # self.m_plot.setYRange(0, 5)
-        self._plot.setMouseEnabled(x=False, y=True)
-        self._plot.showGrid(x=True, y=True)
-        self._plot.enableAutoRange(x=True, y=True)
-        self._plot.getAxis('left').enableAutoSIPrefix(False)
+        self._pw = None
+        if not getattr(signal, 'headless', False):
+            import pyqtgraph as pg  # Imported only when needed as it loads Qt
+            # Set Color mode
+            pg.setConfigOption('background', '#F8F8F2')
+            pg.setConfigOption('foreground', '#26292C')
+            self._pw = pg.plot(enableMenu=False)
+            self._pw.setWindowTitle('ACS Spectrum')
+            self._plot = self._pw.plotItem
+            self._plot.addLegend()
+            # Init Curve Items
+            self._plot_curve_c = pg.PlotCurveItem(pen=pg.mkPen(color='#1f77b4', width=2), name='c')
+            self._plot_curve_a = pg.PlotCurveItem(pen=pg.mkPen(color='#2ca02c', width=2), name='a')
+            # Add item to plot
+            self._plot.addItem(self._plot_curve_c)
+            self._plot.addItem(self._plot_curve_a)
+            # Decoration
+            self._plot.setLabel('bottom', 'Wavelength' , units='nm')
+            self._plot.setLabel('left', 'Signal', units='m<sup>-1</sup>')
+            # self.m_plot.setYRange(0, 5)
+            self._plot.setMouseEnabled(x=False, y=True)
+            self._plot.showGrid(x=True, y=True)
+            self._plot.enableAutoRange(x=True, y=True)
+            self._plot.getAxis('left').enableAutoSIPrefix(False)
 
         super().__init__(cfg_id, signal, *args, **kwargs)
 
@@ -70,6 +74,11 @@ class ACS(Instrument):
             channel_name = 'a(%s)' % self._parser.lambda_a[np.argmin(np.abs(self._parser.lambda_a - wl))]
             self.udpate_active_timeseries_variables(channel_name, True)
 
+    @property
+    def frame_length(self) -> int:
+        # Length of frames, including registration bytes, logged in binary files
+        return self._parser.frame_length
+
     def setup(self, cfg):
         # Set ACS specific attributes
         if 'device_file' not in cfg.keys():
@@ -86,12 +95,15 @@ class ACS(Instrument):
         cfg['variable_precision'] = ['%d', '%s', '%s', '%.2f', '%.2f', '%s']
         cfg['terminator'] = self.REGISTRATION_BYTES
         # Set standard configuration and check cfg input
-        super().setup(cfg, LogBinary)
+        super().setup(cfg, LogBinary, LogNumpy if cfg.get('log_products_format', 'csv') == 'npy' else Log)
+        if isinstance(self._log_prod, LogNumpy):
+            self._log_prod.metadata = {'lambda_c': self._parser.lambda_c, 'lambda_a': self._parser.lambda_a}
         # Update Plot config
-        min_lambda = min(min(self._parser.lambda_c), min(self._parser.lambda_a))
-        max_lambda = max(max(self._parser.lambda_c), max(self._parser.lambda_a))
-        self._plot.setXRange(min_lambda, max_lambda)
-        self._plot.setLimits(minXRange=min_lambda, maxXRange=max_lambda)
+        if self._pw is not None:
+            min_lambda = min(min(self._parser.lambda_c), min(self._parser.lambda_a))
+            max_lambda = max(max(self._parser.lambda_c), max(self._parser.lambda_a))
+            self._plot.setXRange(min_lambda, max_lambda)
+            self._plot.setLimits(minXRange=min_lambda, maxXRange=max_lambda)
 
     # def open(self, port=None, baudrate=None, bytesize=8, parity='N', stopbits=1, timeout=1):
     #     if baudrate is None:
@@ -110,7 +122,8 @@ class ACS(Instrument):
                 if self.log_raw_enabled and self._log_active:
                     self._log_raw.write(unknown_bytes)
             if frame and valid:
-                self.handle_packet(frame, timestamp)
+                # Bytes left in buffer were received after frame
+                self.handle_packet(frame, self._clock.spread(timestamp, len(self._buffer)))
             if frame and not valid:
                 # Warn user
                 # Log only registration bytes as rest will be logged by unknown_bytes
@@ -127,9 +140,12 @@ class ACS(Instrument):
             self.logger.warning(e)
             self.logger.debug(self.REGISTRATION_BYTES + packet)
         data_cal = self._parser.calibrate_frame(data_raw, get_external_temperature=True)
-        return data_raw.time_stamp, data_cal
+        # Counter of instrument (ms since power on), field renamed timestamp in pyACS 0.2
+        return getattr(data_raw, 'time_stamp', getattr(data_raw, 'timestamp', None)), data_cal
 
     def handle_data(self, data, timestamp):
+        # Time of sampling from instrument clock (raw data keeps time of reception)
+        timestamp = self._clock.from_counter(data[0], timestamp)
         # Update timeseries plot
         if self.active_timeseries_variables_lock.acquire(timeout=0.125):
             try:
@@ -145,20 +161,24 @@ class ACS(Instrument):
                                        '%.2f' % data[1].external_temperature,
                                        '%s' % data[1].flag_outside_calibration_range])
         # Update spectrum plot
-        sel = np.logical_not(np.logical_or(np.isinf(data[1].c), np.isnan(data[1].c)))
-        self._plot_curve_c.setData(self._parser.lambda_c[sel], data[1].c[sel])
-        sel = np.logical_not(np.logical_or(np.isinf(data[1].a), np.isnan(data[1].a)))
-        self._plot_curve_a.setData(self._parser.lambda_a[sel], data[1].a[sel])
+        if self._pw is not None:
+            sel = np.logical_not(np.logical_or(np.isinf(data[1].c), np.isnan(data[1].c)))
+            self._plot_curve_c.setData(self._parser.lambda_c[sel], data[1].c[sel])
+            sel = np.logical_not(np.logical_or(np.isinf(data[1].a), np.isnan(data[1].a)))
+            self._plot_curve_a.setData(self._parser.lambda_a[sel], data[1].a[sel])
         # Flag outside temperature calibration range
         if data[1].flag_outside_calibration_range and time() - self._timestamp_flag_out_T_cal > 120:
             self._timestamp_flag_out_T_cal = time()
             self.logger.warning('Internal temperature outside calibration range.')
         # Log parsed data
         if self.log_prod_enabled and self._log_active:
+            if isinstance(self._log_prod, LogNumpy):
+                c, a = data[1].c, data[1].a  # Arrays are logged as is
+            else:
+                c = np.array2string(data[1].c, max_line_width=np.inf)  # pre-format np.array
+                a = np.array2string(data[1].a, max_line_width=np.inf)  # pre-format np.array
             self._log_prod.write([data[0],  # Instrument timestamp
-                                  np.array2string(data[1].c, max_line_width=np.inf),  # pre-format np.array
-                                  np.array2string(data[1].a, max_line_width=np.inf),  # pre-format np.array
-                                  data[1].internal_temperature, data[1].external_temperature,
+                                  c, a, data[1].internal_temperature, data[1].external_temperature,
                                   data[1].flag_outside_calibration_range], timestamp)
             if not self.log_raw_enabled:
                 self.signal.packet_logged.emit()
@@ -184,3 +204,30 @@ class ACS(Instrument):
         self.plugin_active_timeseries_variables_selected = \
             ['c(%s)' % wl for wl in self._parser.lambda_c[self.active_timeseries_c_wavelengths]] + \
             ['a(%s)' % wl for wl in self._parser.lambda_a[self.active_timeseries_a_wavelengths]]
+
+
+def frame_dtype(output_wavelength):
+    """
+    Structured type of ACS frames (big-endian as sent by the instrument), fields as in pyACS unpack_frame
+    except counts which are interleaved by wavelength: counts[..., 0] is c_ref, 1 a_ref, 2 c_sig, and 3 a_sig
+    :param output_wavelength: number of wavelengths of instrument
+    :return: numpy structured dtype
+    """
+    return np.dtype([('registration', 'V4'), ('frame_len', '>u2'), ('frame_type', 'u1'), ('reserved', 'u1'),
+                     ('serial_number', '>i4'), ('a_ref_dark', '>u2'), ('p', '>u2'), ('a_sig_dark', '>u2'),
+                     ('t_ext', '>u2'), ('t_int', '>u2'), ('c_ref_dark', '>u2'), ('c_sig_dark', '>u2'),
+                     ('timestamp', '>u4'), ('reserved2', 'u1'), ('output_wavelength', 'u1'),
+                     ('counts', '>u2', (output_wavelength, 4)), ('checksum', '>u2'), ('pad_byte', 'u1')])
+
+
+def read_bin(filename, parser):
+    """
+    Read all frames logged in a binary file (.bin) of an ACS at once, without instrument nor loop over frames
+        records = read_bin('ACS301_20210315_120000.bin', ACSParser('acs301.dev'))
+        records['time'], records['frame']['timestamp'], records['frame']['counts'][:, :, 2] (c_sig), ...
+    :param filename: path to binary file (compressed or not)
+    :param parser: pyACS parser initialized with the device file of the instrument
+    :return: structured array with fields time (reception, float64) and frame (see frame_dtype)
+    """
+    return read_bin_frames(filename, ACS.REGISTRATION_BYTES, parser.frame_length,
+                           frame_dtype(parser.output_wavelength))
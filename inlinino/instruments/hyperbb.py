@@ -1,5 +1,4 @@
 from inlinino.instruments import Instrument
-import pyqtgraph as pg
 import configparser
 import numpy as np
 from time import sleep
@@ -18,26 +17,29 @@ class HyperBB(Instrument):
         self._parser = None
         self.signal_reconstructed = None
 
-        # Init Graphic for real time spectrum visualization
+        # Init Graphic for real time spectrum visualization (skipped when running headless)
         # TODO Refactor code and move it to GUI
-        # Set Color mode
-        pg.setConfigOption('background', '#F8F8F2')
-        pg.setConfigOption('foreground', '#26292C')
-        self._pw = pg.plot(enableMenu=False)
-        self._pw.setWindowTitle('HyperBB Spectrum')
-        self._plot = self._pw.plotItem
-        # Init Curve Items
-        self._plot_curve = pg.PlotCurveItem(pen=pg.mkPen(color='#7f7f7f', width=2))
-        # Add item to plot
-        self._plot.addItem(self._plot_curve)
-        # Decoration
-        self._plot.setLabel('bottom', 'Wavelength', units='nm')
-        self._plot.setLabel('left', 'bb', units='1/m')
-        self._plot.setMouseEnabled(x=False, y=True)
-        self._plot.showGrid(x=True, y=True)
-        self._plot.enableAutoRange(x=True, y=True)
-        self._plot.getAxis('left').enableAutoSIPrefix(False)
-        self._plot.getAxis('bottom').enableAutoSIPrefix(False)
+        self._pw = None
+        if not getattr(signal, 'headless', False):
+            import pyqtgraph as pg  # Imported only when needed as it loads Qt
+            # Set Color mode
+            pg.setConfigOption('background', '#F8F8F2')
+            pg.setConfigOption('foreground', '#26292C')
+            self._pw = pg.plot(enableMenu=False)
+            self._pw.setWindowTitle('HyperBB Spectrum')
+            self._plot = self._pw.plotItem
+            # Init Curve Items
+            self._plot_curve = pg.PlotCurveItem(pen=pg.mkPen(color='#7f7f7f', width=2))
+            # Add item to plot
+            self._plot.addItem(self._plot_curve)
+            # Decoration
+            self._plot.setLabel('bottom', 'Wavelength', units='nm')
+            self._plot.setLabel('left', 'bb', units='1/m')
+            self._plot.setMouseEnabled(x=False, y=True)
+            self._plot.showGrid(x=True, y=True)
+            self._plot.enableAutoRange(x=True, y=True)
+            self._plot.getAxis('left').enableAutoSIPrefix(False)
+            self._plot.getAxis('bottom').enableAutoSIPrefix(False)
 
         super().__init__(cfg_id, signal, *args, **kwargs)
 
@@ -46,8 +48,9 @@ class HyperBB(Instrument):
         self.default_serial_timeout = 1
 
         # Set wavelength range
-        self._plot.setXRange(np.min(self._parser.wavelength), np.max(self._parser.wavelength))
-        self._plot.setLimits(minXRange=np.min(self._parser.wavelength), maxXRange=np.max(self._parser.wavelength))
+        if self._pw is not None:
+            self._plot.setXRange(np.min(self._parser.wavelength), np.max(self._parser.wavelength))
+            self._plot.setLimits(minXRange=np.min(self._parser.wavelength), maxXRange=np.max(self._parser.wavelength))
 
         # Auxiliary Data Plugin
         self.plugin_aux_data = True
@@ -108,7 +111,8 @@ class HyperBB(Instrument):
         self.signal.new_aux_data.emit([int(wl), gain, raw[self._parser.idx_LedTemp],
                                        raw[self._parser.idx_WaterTemp], raw[self._parser.idx_Depth],
                                        net_ref_zero_flag])
-        self._plot_curve.setData(self._parser.wavelength, self.signal_reconstructed)
+        if self._pw is not None:
+            self._plot_curve.setData(self._parser.wavelength, self.signal_reconstructed)
         # Log data as received
         if self.log_prod_enabled and self._log_active:
             # Update logger configuration
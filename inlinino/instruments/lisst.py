@@ -1,5 +1,5 @@
 from inlinino.instruments import Instrument
-import pyqtgraph as pg
+from inlinino.log import LogText, Log, LogNumpy
 import configparser
 import numpy as np
 from time import sleep
@@ -16,27 +16,31 @@ class LISST(Instrument):
     def __init__(self, cfg_id, signal, *args, **kwargs):
         self._parser = None
 
-        # Init Graphic for real time spectrum visualization
+        # Init Graphic for real time spectrum visualization (skipped when running headless)
         # TODO Refactor code and move it to GUI
-        # Set Color mode
-        pg.setConfigOption('background', '#F8F8F2')
-        pg.setConfigOption('foreground', '#26292C')
-        self._pw = pg.plot(enableMenu=False)
-        self._pw.setWindowTitle('LISST Spectrum')
-        self._plot = self._pw.plotItem
-        self._plot.setLogMode(x=True)
-        # Init Curve Items
-        self._plot_curve = pg.PlotCurveItem(pen=pg.mkPen(color='#d62728', width=2))
-        # Add item to plot
-        self._plot.addItem(self._plot_curve)
-        # Decoration
-        self._plot.setLabel('bottom', 'Angles', units='degrees')
-        self._plot.setLabel('left', 'Beta', units='1/m/sr')
-        self._plot.setMouseEnabled(x=False, y=True)
-        self._plot.showGrid(x=True, y=True)
-        self._plot.enableAutoRange(x=True, y=True)
-        self._plot.getAxis('left').enableAutoSIPrefix(False)
-        self._plot.getAxis('bottom').enableAutoSIPrefix(False)
+        self._pw = None
+        if not getattr(signal, 'headless', False):
+            import pyqtgraph as pg  # Imported only when needed as it loads Qt
+            # Set Color mode
+            pg.setConfigOption('background', '#F8F8F2')
+            pg.setConfigOption('foreground', '#26292C')
+            self._pw = pg.plot(enableMenu=False)
+            self._pw.setWindowTitle('LISST Spectrum')
+            self._plot = self._pw.plotItem
+            self._plot.setLogMode(x=True)
+            # Init Curve Items
+            self._plot_curve = pg.PlotCurveItem(pen=pg.mkPen(color='#d62728', width=2))
+            # Add item to plot
+            self._plot.addItem(self._plot_curve)
+            # Decoration
+            self._plot.setLabel('bottom', 'Angles', units='degrees')
+            self._plot.setLabel('left', 'Beta', units='1/m/sr')
+            self._plot.setMouseEnabled(x=False, y=True)
+            self._plot.showGrid(x=True, y=True)
+            self._plot.enableAutoRange(x=True, y=True)
+            self._plot.getAxis('left').enableAutoSIPrefix(False)
+            self._plot.getAxis('bottom').enableAutoSIPrefix(False)
+
         super().__init__(cfg_id, signal, *args, **kwargs)
 
         # Default serial communication parameters
@@ -78,15 +82,18 @@ class LISST(Instrument):
         cfg['variable_precision'] = ['%s', '%.6f', '%.2f', '%.2f', '%.6f', '%.2f', '%.2f', "%.6f"]
         cfg['terminator'] = b'L100x:>'
         # Set standard configuration and check cfg input
-        super().setup(cfg)
+        super().setup(cfg, LogText, LogNumpy if cfg.get('log_products_format', 'csv') == 'npy' else Log)
         # Update logger configuration
+        if isinstance(self._log_prod, LogNumpy):
+            self._log_prod.metadata = {'angles': self._parser.angles}
         self._log_raw.registration = self._terminator.decode(self._parser.ENCODING, self._parser.UNICODE_HANDLING)
         self._log_raw.terminator = ''  # Remove terminator
         self._log_raw.variable_names = []  # Disable header in raw file
         # Update plot with config
-        self._plot.setXRange(np.log10(np.min(self._parser.angles)), np.log10(np.max(self._parser.angles)))
-        self._plot.setLimits(minXRange=np.log10(np.min(self._parser.angles)),
-                             maxXRange=np.log10(np.max(self._parser.angles)))
+        if self._pw is not None:
+            self._plot.setXRange(np.log10(np.min(self._parser.angles)), np.log10(np.max(self._parser.angles)))
+            self._plot.setLimits(minXRange=np.log10(np.min(self._parser.angles)),
+                                 maxXRange=np.log10(np.max(self._parser.angles)))
 
     # def open(self, port=None, baudrate=9600, bytesize=8, parity='N', stopbits=1, timeout=10):
     #     super().open(port, baudrate, bytesize, parity, stopbits, timeout)
@@ -109,11 +116,13 @@ class LISST(Instrument):
         else:
             self.logger.error('Unable to acquire lock to update timeseries plot')
         self.signal.new_aux_data.emit(self.format_aux_data([data[i+1] for i in self.plugin_aux_data_variables_selected]))
-        self._plot_curve.setData(np.log10(self._parser.angles), beta)
+        if self._pw is not None:
+            self._plot_curve.setData(np.log10(self._parser.angles), beta)
         # Log raw beta and calibrated aux
         if self.log_prod_enabled and self._log_active:
-            # np arrays must be pre-formated to be written
-            data[0] = np.array2string(data[0], max_line_width=np.inf)
+            if not isinstance(self._log_prod, LogNumpy):
+                # np arrays must be pre-formated to be written
+                data[0] = np.array2string(data[0], max_line_width=np.inf)
             self._log_prod.write(data, timestamp)
             if not self.log_raw_enabled:
                 self.signal.packet_logged.emit()
@@ -0,0 +1,95 @@
+"""
+Registry of instrument classes keyed by the module field of the configuration
+
+Instrument classes are imported only when first requested, so loading an instrument doesn't pay
+for the dependencies of the others (e.g. scipy for HyperBB or pyACS for ACS). Additional instrument
+classes can be registered at runtime or distributed in separate packages declaring an entry point
+in the group inlinino.instruments, for example in setup.py:
+
+    entry_points={'inlinino.instruments': ['my_instrument = my_package.my_module:MyInstrument']}
+"""
+import importlib
+import logging
+
+
+ENTRY_POINT_GROUP = 'inlinino.instruments'
+BUILTIN_INSTRUMENTS = {'generic': 'inlinino.instruments:Instrument',
+                       'acs': 'inlinino.instruments.acs:ACS',
+                       'dataq': 'inlinino.instruments.dataq:DATAQ',
+                       'hyperbb': 'inlinino.instruments.hyperbb:HyperBB',
+                       'lisst': 'inlinino.instruments.lisst:LISST',
+                       'nmea': 'inlinino.instruments.nmea:NMEA',
+                       'sunav1': 'inlinino.instruments.suna:SunaV1',
+                       'sunav2': 'inlinino.instruments.suna:SunaV2',
+                       'taratsg': 'inlinino.instruments.taratsg:TaraTSG'}
+
+
+class InstrumentRegistry:
+    def __init__(self, instruments=None, entry_point_group=ENTRY_POINT_GROUP):
+        """
+        :param instruments: dictionary of module name: 'package.module:Class' or class
+        :param entry_point_group: group of entry points to discover instruments from (None to disable)
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._targets = dict(BUILTIN_INSTRUMENTS if instruments is None else instruments)
+        self._classes = dict()
+        self._entry_point_group = entry_point_group
+        self._entry_points_discovered = entry_point_group is None
+
+    def register(self, module, target):
+        """
+        Register an instrument class
+        :param module: name of module as found in configuration
+        :param target: instrument class or its path as 'package.module:Class' (imported when first used)
+        """
+        self._classes.pop(module, None)
+        self._targets[module] = target
+
+    def discover(self):
+        """
+        Register instruments declared by entry points of installed packages (built-in instruments take precedence)
+        """
+        if self._entry_points_discovered:
+            return
+        self._entry_points_discovered = True
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:  # Python < 3.8
+            return
+        eps = entry_points()
+        eps = eps.select(group=self._entry_point_group) if hasattr(eps, 'select') \
+            else eps.get(self._entry_point_group, [])
+        for ep in eps:
+            if ep.name not in self._targets.keys():
+                self._targets[ep.name] = ep.value
+
+    @property
+    def modules(self) -> list:
+        self.discover()
+        return list(self._targets.keys())
+
+    def __contains__(self, module) -> bool:
+        if module not in self._targets.keys():
+            self.discover()
+        return module in self._targets.keys()
+
+    def get(self, module):
+        """
+        Get instrument class, importing it if necessary
+        :param module: name of module as found in configuration
+        :return: instrument class
+        """
+        if module in self._classes.keys():
+            return self._classes[module]
+        if module not in self:
+            raise ValueError(f'Instrument module {module} not supported')
+        target = self._targets[module]
+        if isinstance(target, str):
+            self.logger.debug(f'Import {target}')
+            path, name = target.split(':')
+            target = getattr(importlib.import_module(path), name)
+        self._classes[module] = target
+        return target
+
+
+registry = InstrumentRegistry()
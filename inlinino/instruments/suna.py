@@ -1,7 +1,6 @@
 from collections import namedtuple
 
 from inlinino.instruments import Instrument
-import pyqtgraph as pg
 import numpy as np
 
 
@@ -49,29 +48,32 @@ class SunaV2(Instrument):
         self.df_maker = None
         self.wavelength = np.array([c for c in range(self.N_CHANNELS)])
 
-        # Init Graphic for real time spectrum visualization
+        # Init Graphic for real time spectrum visualization (skipped when running headless)
         # TODO Refactor code and move it to GUI
-        # Set Color mode
-        pg.setConfigOption('background', '#F8F8F2')
-        pg.setConfigOption('foreground', '#26292C')
-        self._pw = pg.plot(enableMenu=False)
-        self._pw.setWindowTitle('Suna Spectra')
-        self._plot = self._pw.plotItem
-        self._plot.addLegend()
-        # Init Curve Items
-        self._plot_curve_light = pg.PlotCurveItem(pen=pg.mkPen(color='#1f77b4', width=2), name='light')
-        self._plot_curve_dark = pg.PlotCurveItem(pen=pg.mkPen(color='#2ca02c', width=2), name='dark')
-        # Add item to plot
-        self._plot.addItem(self._plot_curve_light)
-        self._plot.addItem(self._plot_curve_dark)
-        # Decoration
-        self._plot.setLabel('bottom', 'Channel', units='#')
-        self._plot.setLabel('left', 'Signal', units='counts')
-        # self.m_plot.setYRange(0, 5)
-        self._plot.setMouseEnabled(x=False, y=True)
-        self._plot.showGrid(x=True, y=True)
-        self._plot.enableAutoRange(x=True, y=True)
-        self._plot.getAxis('left').enableAutoSIPrefix(False)
+        self._pw = None
+        if not getattr(signal, 'headless', False):
+            import pyqtgraph as pg  # Imported only when needed as it loads Qt
+            # Set Color mode
+            pg.setConfigOption('background', '#F8F8F2')
+            pg.setConfigOption('foreground', '#26292C')
+            self._pw = pg.plot(enableMenu=False)
+            self._pw.setWindowTitle('Suna Spectra')
+            self._plot = self._pw.plotItem
+            self._plot.addLegend()
+            # Init Curve Items
+            self._plot_curve_light = pg.PlotCurveItem(pen=pg.mkPen(color='#1f77b4', width=2), name='light')
+            self._plot_curve_dark = pg.PlotCurveItem(pen=pg.mkPen(color='#2ca02c', width=2), name='dark')
+            # Add item to plot
+            self._plot.addItem(self._plot_curve_light)
+            self._plot.addItem(self._plot_curve_dark)
+            # Decoration
+            self._plot.setLabel('bottom', 'Channel', units='#')
+            self._plot.setLabel('left', 'Signal', units='counts')
+            # self.m_plot.setYRange(0, 5)
+            self._plot.setMouseEnabled(x=False, y=True)
+            self._plot.showGrid(x=True, y=True)
+            self._plot.enableAutoRange(x=True, y=True)
+            self._plot.getAxis('left').enableAutoSIPrefix(False)
 
         super().__init__(cfg_id, signal, *args, **kwargs)
 
@@ -105,9 +107,10 @@ class SunaV2(Instrument):
         # Suna Specific named tuple maker
         self.df_maker = namedtuple('SunaDataFrame', self.variable_names)
         # Update Plot config
-        min_wl, max_wl = min(self.wavelength), max(self.wavelength)
-        self._plot.setXRange(min_wl, max_wl)
-        self._plot.setLimits(minXRange=min_wl, maxXRange=max_wl)
+        if self._pw is not None:
+            min_wl, max_wl = min(self.wavelength), max(self.wavelength)
+            self._plot.setXRange(min_wl, max_wl)
+            self._plot.setLimits(minXRange=min_wl, maxXRange=max_wl)
 
     def register_wavelengths(self, calibration_filename):
         # Read polynomial coefficients for wavelength calculation from pixel value
@@ -121,13 +124,15 @@ class SunaV2(Instrument):
                         c[int(l[1])] = float(l.split(' ')[1])
             x = np.arange(1, self.N_CHANNELS+1)
             self.wavelength = c[0] + c[1] * x + c[2] * x**2 + c[3] * x**3 + c[4] * x**4
-            self._plot.setLabel('bottom', 'Wavelength', units='nm')
+            if self._pw is not None:
+                self._plot.setLabel('bottom', 'Wavelength', units='nm')
         except:
             self.logger.warning('Error registering wavelengths.')
         if not np.all(np.diff(self.wavelength)):  # some wavelengths are identical
             self.logger.warning('Invalid wavelength registration.')
             self.wavelength = np.array([c for c in range(self.N_CHANNELS)])
-            self._plot.setLabel('bottom', 'Channel', units='#')
+            if self._pw is not None:
+                self._plot.setLabel('bottom', 'Channel', units='#')
 
     def parse(self, packet):
         try:
@@ -142,14 +147,16 @@ class SunaV2(Instrument):
         if 'L' in raw.header:    # Light (SATSLF)
             # Update plots
             self.signal.new_data.emit(self.get_ts(raw), timestamp)
-            self._plot_curve_light.setData(self.wavelength,
-                                           np.array(raw[self.CHANNELS_START_IDX:self.CHANNELS_END_IDX]))
+            if self._pw is not None:
+                self._plot_curve_light.setData(self.wavelength,
+                                               np.array(raw[self.CHANNELS_START_IDX:self.CHANNELS_END_IDX]))
             # Update Auxiliary Data Plugin
             self.signal.new_aux_data.emit(self.get_aux(raw))
         elif 'D' in raw.header:  # Dark (SATSDF)
             # Update spectrum plot
-            self._plot_curve_dark.setData(self.wavelength,
-                                          np.array(raw[self.CHANNELS_START_IDX:self.CHANNELS_END_IDX]))
+            if self._pw is not None:
+                self._plot_curve_dark.setData(self.wavelength,
+                                              np.array(raw[self.CHANNELS_START_IDX:self.CHANNELS_END_IDX]))
             # Do NOT update auxiliary data
         else:
             self.logger.info(f'Unknown data frame: {raw.header}')
@@ -1,14 +1,540 @@
 import os
+import gzip
+import json
+import lzma
+import queue
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Event, Lock, current_thread
 from time import gmtime, strftime, time
-from struct import pack
+from struct import pack, unpack
 import logging
 import atexit
 import numpy as np
 
 
+def _to_json(o):
+    # Serialize numpy arrays and scalars to json
+    return o.tolist() if hasattr(o, 'tolist') else str(o)
+
+
+class LogWriter:
+    """
+    Background thread executing the writes of a logger in order
+
+    Calls are queued (bounded queue, callers wait when it's full) so a slow disk doesn't stall acquisition.
+    The file of the logger is flushed every flush_interval seconds, rows are accumulated in the buffer of
+    the file in between and reach the disk in large writes. Synchronisation with the disk depends on the
+    fsync policy:
+        never: left to the operating system
+        close: when a file is closed
+        flush: at every flush (data lost on power failure is limited to flush_interval)
+    Crash safe loggers force the fsync policy flush and mark the size of their file committed to the disk
+    at every flush (see Log.recover).
+    """
+    DEFAULT_QUEUE_SIZE = 16384  # calls
+    DEFAULT_FLUSH_INTERVAL = 1  # seconds
+    DEFAULT_FSYNC = 'close'
+    FSYNC_POLICIES = ['never', 'close', 'flush']
+    ERROR_REPORT_INTERVAL = 60  # seconds
+    STOP_TIMEOUT = 10  # seconds, to execute calls queued when stopping (e.g. disk not responding)
+
+    def __init__(self, name, flush, queue_size=DEFAULT_QUEUE_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 fsync=DEFAULT_FSYNC):
+        """
+        :param name: name of thread
+        :param flush: function flushing file of logger, takes fsync (bool) as argument
+        """
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f'Invalid fsync policy {fsync}')
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.name = name
+        self.flush = flush
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._queue = queue.Queue(queue_size)
+        self._thread = None
+        self._last_error_report = 0
+        # Statistics
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.calls = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.total_latency = 0  # seconds, from call queued to executed
+        self.max_latency = 0  # seconds
+        self.max_flush_duration = 0  # seconds
+
+    @property
+    def queue_size(self) -> int:
+        return self._queue.maxsize
+
+    @queue_size.setter
+    def queue_size(self, value):
+        self._queue.maxsize = value
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0
+
+    def stats(self):
+        return {'calls': self.calls, 'errors': self.errors, 'max_depth': self.max_depth,
+                'mean_latency': self.mean_latency, 'max_latency': self.max_latency,
+                'max_flush_duration': self.max_flush_duration}
+
+    def submit(self, function, *args):
+        """
+        Queue call to be executed by writer thread, wait if queue is full
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = Thread(name=self.name, target=self.run)
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put((function, args, time()))
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def call(self, function, *args):
+        """
+        Execute function after all calls queued, and wait for it to complete
+        """
+        if self._thread is None or current_thread() is self._thread:
+            return function(*args)  # Nothing queued or called from writer thread
+        done = Event()
+        result = []
+
+        def wrapper():
+            try:
+                result.append(function(*args))
+            finally:
+                done.set()
+        self.submit(wrapper)
+        done.wait()
+        return result[0] if result else None
+
+    def drain(self):
+        """
+        Wait until all calls queued are executed and file flushed
+        """
+        self.call(self.flush, self.fsync == 'flush')
+
+    def stop(self, function=None, *args):
+        """
+        Execute calls queued and function (if any), flush file, and stop writer thread (started again by the
+        next call submitted). Gives up waiting after STOP_TIMEOUT, the thread then stops once unblocked.
+        :return: True if writer thread stopped
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive() or current_thread() is thread:
+            if function is not None:
+                function(*args)
+            return True
+        deadline = time() + self.STOP_TIMEOUT
+        try:
+            if function is not None:
+                self._queue.put((function, args, time()), timeout=self.STOP_TIMEOUT)
+            self._queue.put((None, (), time()), timeout=max(deadline - time(), 0))  # Sentinel, after calls queued
+        except queue.Full:
+            pass
+        thread.join(max(deadline - time(), 0))
+        if thread.is_alive():
+            self.logger.warning(f'{self.name} did not stop within {self.STOP_TIMEOUT} seconds')
+            return False
+        self._thread = None
+        return True
+
+    def run(self):
+        last_flush = time()
+        while True:
+            try:
+                # Flush is due every flush_interval even if calls are queued continuously
+                function, args, timestamp = self._queue.get(timeout=max(last_flush + self.flush_interval - time(), 0))
+                if function is None:  # Sentinel queued by stop
+                    self._flush()
+                    return
+                self._execute(function, args, timestamp)
+            except queue.Empty:
+                pass
+            if time() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time()
+
+    def _execute(self, function, args, timestamp):
+        try:
+            function(*args)
+        except Exception as e:
+            self._report_error(e)
+        latency = time() - timestamp
+        self.calls += 1
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+    def _flush(self):
+        start = time()
+        try:
+            self.flush(self.fsync == 'flush')
+        except Exception as e:
+            self._report_error(e)
+        self.max_flush_duration = max(self.max_flush_duration, time() - start)
+
+    def _report_error(self, exception):
+        # Reported once in a while as a full disk would fail every write
+        self.errors += 1
+        if time() - self._last_error_report > self.ERROR_REPORT_INTERVAL:
+            self.logger.error(f'{self.name}: {exception} ({self.errors} errors so far)')
+            self._last_error_report = time()
+
+
+COMPRESSIONS = {'gzip': ('.gz', gzip.open), 'lzma': ('.xz', lzma.open)}  # method: (suffix, open function)
+
+
+class Compressor:
+    """
+    Compress closed log files in a background thread, one file at a time
+
+    The compressed file is written next to the original file, which is deleted once compression is complete.
+    zlib and lzma release the GIL while compressing, so acquisition is not slowed down. Files left uncompressed
+    (e.g. Inlinino stopped during compression) remain readable and incomplete compressed files are removed.
+    """
+    CHUNK_SIZE = 1048576  # bytes
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._executor = None
+        self._lock = Lock()
+        self.pending = set()  # files queued or being compressed
+
+    def submit(self, filename, method):
+        """
+        Queue file to compress, returns immediately
+        :param filename: path to file
+        :param method: gzip or lzma
+        :return: concurrent.futures.Future returning path to compressed file
+        """
+        if method not in COMPRESSIONS.keys():
+            raise ValueError(f'Invalid compression {method}')
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(1, 'Compressor')
+            self.pending.add(filename)
+        return self._executor.submit(self.compress, filename, method)
+
+    def join(self):
+        """
+        Wait until files queued are compressed
+        """
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            try:
+                executor.submit(int).result()
+            except RuntimeError:  # Interpreter exiting, files queued were compressed
+                pass
+
+    def compress(self, filename, method):
+        suffix, open_compressed = COMPRESSIONS[method]
+        target = filename + suffix
+        try:
+            with open(filename, 'rb') as src, open_compressed(target + '.tmp', 'wb') as dst:
+                shutil.copyfileobj(src, dst, self.CHUNK_SIZE)
+            os.replace(target + '.tmp', target)
+            os.remove(filename)
+        except OSError as e:
+            self.logger.error(f'Unable to compress {filename}: {e}')
+            if os.path.exists(target + '.tmp'):
+                os.remove(target + '.tmp')
+            return None
+        finally:
+            with self._lock:
+                self.pending.discard(filename)
+        self.logger.debug(f'Compressed {os.path.basename(filename)}')
+        return target
+
+
+compressor = Compressor()
+
+
+class Closer:
+    """
+    Close files of loggers in a background thread, one file at a time
+
+    Synchronising a file with the disk and closing it can take a while (e.g. network share), so loggers switching
+    to their next file hand over the previous file and keep writing rows without waiting.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._executor = None
+        self._lock = Lock()
+        self.pending = set()  # files queued or being closed
+
+    def submit(self, filename, function, *args):
+        """
+        Queue function closing file, returns immediately
+        :param filename: path to file closed
+        :param function: function closing file, called with args
+        :return: concurrent.futures.Future, or None if closed immediately (interpreter exiting)
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(1, 'Closer')
+            self.pending.add(filename)
+        try:
+            return self._executor.submit(self.close, filename, function, *args)
+        except RuntimeError:  # Interpreter exiting, new threads can't be started
+            self.close(filename, function, *args)
+            return None
+
+    def join(self):
+        """
+        Wait until files queued are closed
+        """
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            try:
+                executor.submit(int).result()
+            except RuntimeError:  # Interpreter exiting, files queued were closed
+                pass
+
+    def close(self, filename, function, *args):
+        try:
+            function(*args)
+        except Exception as e:
+            self.logger.error(f'Unable to close {filename}: {e}')
+        finally:
+            with self._lock:
+                self.pending.discard(filename)
+
+
+closer = Closer()
+
+
+class DiskMonitor:
+    """
+    Watch free space of the volumes of log files in a background thread
+
+    The time left before a volume is full is projected from the rate at which the loggers on the volume write
+    (or at which free space decreases, if faster). Once it falls below WARNING_TIME, the policy of each logger
+    is applied to its closed files to free space before the volume is full:
+        alarm: none, alarm only
+        compress: files are compressed once closed (gzip), including files closed earlier
+        move: files are moved to a secondary path (e.g. another disk)
+    The alarm of the instruments is raised when the volume is about to be full (CRITICAL_TIME or MIN_FREE).
+    """
+    CHECK_INTERVAL = 30  # seconds
+    WARNING_TIME = 24 * 3600  # seconds before volume is full
+    CRITICAL_TIME = 3600  # seconds before volume is full
+    MIN_FREE = 104857600  # bytes, volume is considered full below
+    RATE_SMOOTHING = 0.2  # weight of last measurement of write rate
+    POLICIES = ['alarm', 'compress', 'move']
+    LEVELS = ['ok', 'warning', 'critical']
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._loggers = dict()  # log: (alarm, policy, secondary_path)
+        self._volumes = dict()  # device: state of volume
+        self._lock = Lock()
+        self._thread = None
+        self._stop = Event()
+
+    def register(self, log, alarm=None, policy='alarm', secondary_path=None):
+        """
+        Watch volume of logger, starting monitoring thread if needed
+        :param log: logger
+        :param alarm: function called with True when volume is about to be full, and False once it's not anymore
+        :param policy: alarm, compress, or move
+        :param secondary_path: directory where closed files are moved (policy move)
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f'Invalid disk policy {policy}')
+        if policy == 'move' and not secondary_path:
+            raise ValueError('Secondary path required by disk policy move')
+        with self._lock:
+            self._loggers[log] = (alarm, policy, secondary_path)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = Thread(target=self.run, name='DiskMonitor', daemon=True)
+                self._thread.start()
+
+    def unregister(self, log):
+        with self._lock:
+            self._loggers.pop(log, None)
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while not self._stop.wait(self.CHECK_INTERVAL):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.error(f'Unable to check free space: {e}')
+
+    def check(self, now=None):
+        """
+        Update free space, write rate, and time left of every volume, and apply policies
+        :param now: time of check (default: current time)
+        :return: dictionary of state of each volume (path, free, rate, time_left, level)
+        """
+        now = time() if now is None else now
+        with self._lock:
+            loggers = list(self._loggers.items())
+        volumes = dict()
+        for log, settings in loggers:
+            if os.path.isdir(log.path or '.'):
+                volumes.setdefault(os.stat(log.path or '.').st_dev, []).append((log, settings))
+        for device, items in volumes.items():
+            path = items[0][0].path or '.'
+            free = shutil.disk_usage(path).free
+            written = sum(log.bytes_written for log, _ in items)
+            v = self._volumes.setdefault(device, {'path': path, 'time': now, 'free': free, 'written': written,
+                                                  'rate': 0, 'time_left': float('inf'), 'level': 'ok'})
+            if now > v['time']:
+                rate = max((written - v['written']) / (now - v['time']), (v['free'] - free) / (now - v['time']), 0)
+                v['rate'] = self.RATE_SMOOTHING * rate + (1 - self.RATE_SMOOTHING) * v['rate'] if v['rate'] else rate
+            v.update(path=path, time=now, free=free, written=written)
+            v['time_left'] = max(free - self.MIN_FREE, 0) / v['rate'] if v['rate'] else \
+                (float('inf') if free > self.MIN_FREE else 0)
+            level = 'critical' if v['time_left'] < self.CRITICAL_TIME else \
+                'warning' if v['time_left'] < self.WARNING_TIME else 'ok'
+            if level != v['level']:
+                message = f'Disk of {path}: {level}, {free / 1048576:.0f} MiB free, ' \
+                          f'{v["rate"] / 1024:.1f} KiB/s written, {v["time_left"] / 3600:.1f} hours left'
+                (self.logger.info if level == 'ok' else
+                 self.logger.warning if level == 'warning' else self.logger.error)(message)
+                if 'critical' in (level, v['level']):
+                    for alarm in set(settings[0] for _, settings in items if settings[0] is not None):
+                        alarm(level == 'critical')
+                v['level'] = level
+            if level != 'ok':
+                for log, (_, policy, secondary_path) in items:
+                    self.apply_policy(log, policy, secondary_path)
+        return {v['path']: {k: v[k] for k in ('free', 'rate', 'time_left', 'level')} for v in self._volumes.values()}
+
+    def apply_policy(self, log, policy, secondary_path=None):
+        """
+        Free space used by files closed by logger
+        :param log: logger
+        :param policy: alarm (nothing done), compress, or move
+        :param secondary_path: directory where files are moved (policy move)
+        """
+        if policy == 'compress' and log.COMPRESSION_SUPPORTED:
+            if not log.compression and not log.compress_closed:
+                self.logger.warning(f'Compress files of {log.filename_prefix} once closed to save disk space')
+                log.compress_closed = 'gzip'
+            for filename in self.closed_files(log):
+                if filename.endswith('.' + log.FILE_EXT):
+                    compressor.submit(filename, log.compress_closed or 'gzip')
+        elif policy == 'move':
+            if not os.path.isdir(secondary_path):
+                os.makedirs(secondary_path)
+            for filename in self.closed_files(log):
+                try:
+                    shutil.move(filename, os.path.join(secondary_path, os.path.basename(filename)))
+                    self.logger.info(f'Moved {os.path.basename(filename)} to {secondary_path}')
+                except OSError as e:
+                    self.logger.error(f'Unable to move {os.path.basename(filename)}: {e}')
+                    break
+
+    @staticmethod
+    def closed_files(log) -> list:
+        """
+        Files closed by logger (data, compressed or not, and index) excluding files open, being compressed,
+        or left open by a crash
+        :param log: logger
+        :return: list of path to files
+        """
+        if not os.path.isdir(log.path or '.'):
+            return []
+        names = os.listdir(log.path or '.')
+        exts = ['.' + log.FILE_EXT] + ['.' + log.FILE_EXT + v[0] for v in COMPRESSIONS.values()] + \
+               ['.' + log.FILE_EXT + '.' + log.INDEX_EXT]
+        busy = set(n[:-len(log.MARKER_EXT) - 1] for n in names if n.endswith('.' + log.MARKER_EXT))
+        busy |= set(os.path.basename(f) for f in compressor.pending | closer.pending)
+        if not log._file.closed:
+            busy |= {log.filename, os.path.basename(log.index_filename)}
+        if log._next is not None:
+            busy.add(log._next['filename'])
+        files = []
+        for n in sorted(names):
+            if n.startswith(log.filename_prefix + '_') and any(n.endswith(e) for e in exts) and \
+                    not any(n.startswith(b) for b in busy):
+                files.append(os.path.join(log.path, n))
+        return files
+
+
+disk_monitor = DiskMonitor()
+
+
+class RowFormatter:
+    """
+    Format rows of log files: time of the row followed by values formatted with their precision
+
+    The format of the values is joined once in a single format string, and the date is formatted
+    once per day and the time once per second as consecutive rows usually share them.
+    """
+    def __init__(self, precision=None):
+        """
+        :param precision: list of printf-style format of each value, values are converted with str if empty
+        """
+        self.precision = list(precision) if precision else []
+        self._format = ', '.join(self.precision) + '\n' if self.precision else None
+        self._day, self._date = None, None
+        self._second, self._datetime = None, None
+
+    def timestamp(self, timestamp):
+        """
+        :return: timestamp formatted as yyyy/mm/dd HH:MM:SS.fff
+        """
+        second = int(timestamp)
+        if second != self._second:
+            day, s = divmod(second, 86400)
+            if day != self._day:
+                self._day, self._date = day, strftime('%Y/%m/%d ', gmtime(timestamp))
+            self._second = second
+            self._datetime = '%s%02d:%02d:%02d' % (self._date, s // 3600, s // 60 % 60, s % 60)
+        return self._datetime + ('%.3f' % timestamp)[-4:]
+
+    def __call__(self, data, timestamp):
+        """
+        :param data: list of values
+        :param timestamp: date and time associated with the values
+        :return: row of log file (including new line)
+        """
+        if self._format is None:
+            return self.timestamp(timestamp) + ', ' + ', '.join(str(d) for d in data) + '\n'
+        try:
+            return self.timestamp(timestamp) + ', ' + self._format % tuple(data)
+        except TypeError:
+            # Number of values different from number of formats, format values available
+            return self.timestamp(timestamp) + ', ' + \
+                ', '.join(p % d for p, d in zip(self.precision, data)) + '\n'
+
+
 class Log:
     FILE_EXT = 'csv'
     FILE_MODE = 'w'
+    BUFFER_SIZE = 1048576  # bytes, buffer of file, rows reach the disk in writes of this size
+    WRITER_CFG = {'asynchronous': True, 'flush_interval': LogWriter.DEFAULT_FLUSH_INTERVAL,
+                  'fsync': LogWriter.DEFAULT_FSYNC, 'queue_size': LogWriter.DEFAULT_QUEUE_SIZE,
+                  'crash_safe': False}
+    MARKER_EXT = 'open'  # Extension of marker of files open, left behind by a crash
+    INDEX_EXT = 'idx'  # Extension of index of files, see inlinino.readers.read_index
+    INDEX_SUPPORTED = True
+    INDEX_INTERVAL = 1000  # records, maximum between entries of index
+    INDEX_PERIOD = 1  # seconds, maximum between entries of index
+    COMPRESSION_CFG = {'compression': None, 'compress_closed': None}  # gzip, lzma, or None
+    COMPRESSION_SUPPORTED = True
+    ROTATION_CFG = {'max_size': None}  # MiB, files are rotated by size as well as by time (length)
+    PREOPEN_SUPPORTED = True
+    PREOPEN_TIME = 10  # seconds, next file is prepared this long before the end of the file open
+    # Attributes of file open, exchanged with next file prepared (see prepare)
+    FILE_STATE = ('filename', '_file', '_index_file', '_file_timestamp', '_file_start', '_file_end', '_file_size',
+                  '_index_records', '_index_timestamp', '_rotate')
 
     def __init__(self, cfg, signal_new_file=None):
         self.__logger = logging.getLogger(self.__class__.__name__)
@@ -28,9 +554,23 @@ class Log:
 
         self._file = type('obj', (object,), {'closed': True})
         self._file_timestamp = None
+        self._file_start, self._file_end = None, None  # period of file open (see file_period)
+        self._rotate = False  # file open reached max_size
+        self._next = None  # state of next file prepared ahead
+        self._file_size = 0  # bytes, size of file open at last flush
+        self.bytes_written = 0  # bytes, reached the disk since logger was created (see DiskMonitor)
+        self._index_file = type('obj', (object,), {'closed': True})
+        self._index_records = 0  # records since last entry of index
+        self._index_timestamp = float('-inf')  # time of last entry of index
         # self.file_mode_binary = cfg['mode_binary']
         self.file_length = cfg['length'] * 60  # seconds
+        self.max_size = cfg.get('max_size', self.ROTATION_CFG['max_size'])  # MiB
         self.filename_prefix = cfg['filename_prefix']
+        # Compression while logging (compression) or once files are closed (compress_closed)
+        for k, v in self.COMPRESSION_CFG.items():
+            if cfg.get(k, v) not in list(COMPRESSIONS.keys()) + [None]:
+                raise ValueError(f'Invalid {k} {cfg[k]}')
+            setattr(self, k, cfg.get(k, v) if self.COMPRESSION_SUPPORTED else None)
         self.filename = None
         self.set_filename()
         self.path = cfg['path']
@@ -38,61 +578,239 @@ class Log:
 
         self.variable_names = cfg['variable_names']
         self.variable_units = cfg['variable_units']
+        self._formatter = RowFormatter()
         self.variable_precision = cfg['variable_precision']
 
+        # Writes are executed by a background thread unless asynchronous is False
+        self._writer = None
+        self.crash_safe = False
+        self._recovered = None  # path and prefix of files recovered
+        self._configure_writer({k: cfg.get(k, v) for k, v in self.WRITER_CFG.items()})
+
         atexit.register(self.close)
 
+    def _configure_writer(self, cfg):
+        crash_safe = cfg.get('crash_safe', self.crash_safe)
+        if cfg.get('asynchronous', self._writer is not None):
+            if 'fsync' in cfg.keys() and cfg['fsync'] not in LogWriter.FSYNC_POLICIES:
+                raise ValueError(f'Invalid fsync policy {cfg["fsync"]}')
+            if self._writer is None:
+                self._writer = LogWriter(self.filename_prefix + ' ' + self.FILE_EXT + ' writer', self._flush)
+            for k in ['flush_interval', 'fsync', 'queue_size']:
+                if k in cfg.keys():
+                    setattr(self._writer, k, cfg[k])
+            if crash_safe:
+                self._writer.fsync = 'flush'
+        elif crash_safe:
+            raise ValueError('Crash safe logging requires asynchronous logging')
+        elif self._writer is not None:
+            if self._writer.stop():
+                self._writer = None
+            # else writer blocked (e.g. disk not responding) is kept, a file is never written by two threads
+        self.crash_safe = crash_safe
+
+    @property
+    def writer(self) -> LogWriter:
+        return self._writer
+
+    @property
+    def variable_precision(self) -> list:
+        return self._formatter.precision
+
+    @variable_precision.setter
+    def variable_precision(self, value):
+        # Row format is built when precision changes only
+        if value != self._formatter.precision:
+            self._formatter = RowFormatter(value)
+
     def update_cfg(self, cfg):
+        writer_cfg = {k: v for k, v in cfg.items() if k in self.WRITER_CFG.keys()}
+        cfg = {k: v for k, v in cfg.items() if k not in self.WRITER_CFG.keys()}
+        if self._writer is not None:
+            self._writer.call(self._update_cfg, cfg)
+        else:
+            self._update_cfg(cfg)
+        self._configure_writer(writer_cfg)
+
+    def _update_cfg(self, cfg):
         self.__logger.debug('Update configuration')
         for k in cfg.keys():
             setattr(self, k, cfg[k])
+        self._discard_next()  # Prepared with previous configuration
         self.set_filename()
 
+    @property
+    def file_ext(self) -> str:
+        # Extension of files written, including compression suffix
+        return self.FILE_EXT + (COMPRESSIONS[self.compression][0] if self.compression else '')
+
     def set_filename(self, timestamp=None):
         if timestamp:
             if not os.path.exists(self.path):
                 os.makedirs(self.path)
             self.filename = self.filename_prefix + '_' + strftime('%Y%m%d_%H%M%S', gmtime(timestamp)) + \
-                            '.' + self.FILE_EXT
+                            '.' + self.file_ext
             suffix = 0
             while os.path.exists(os.path.join(self.path, self.filename)):
                 self.filename = self.filename_prefix + '_' + strftime('%Y%m%d_%H%M%S', gmtime(timestamp)) + \
-                                '_' + str(suffix) + '.' + self.FILE_EXT
+                                '_' + str(suffix) + '.' + self.file_ext
                 suffix += 1
         else:
-            self.filename = self.filename_prefix + '_<date>_<time>' + '.' + self.FILE_EXT
+            self.filename = self.filename_prefix + '_<date>_<time>' + '.' + self.file_ext
 
     def write_header(self):
         if self.variable_names:
             self._file.write('time, ' + ', '.join(x for x in self.variable_names) + '\n')
             self._file.write('yyyy/mm/dd HH:MM:SS.fff, ' + ', '.join(x for x in self.variable_units) + '\n')
 
+    def file_period(self, timestamp):
+        """
+        Period of file of a row, aligned on multiples of the length of files since midnight (UTC), so files
+        start on wall-clock boundaries (e.g. every hour on the hour) and never span two days
+        :param timestamp: date and time associated with the row
+        :return: start and end of period
+        """
+        day = timestamp - timestamp % 86400
+        start = day + (timestamp - day) // self.file_length * self.file_length
+        return start, min(start + self.file_length, day + 86400)
+
     def open(self, timestamp):
+        self._open(timestamp)
+        if self.signal_new_file:
+            self.signal_new_file.emit()
+
+    def _open(self, timestamp):
+        if self.crash_safe and self._recovered != (self.path, self.filename_prefix):
+            # Files left open by a previous crash
+            self.recover(self.path, self.filename_prefix)
+            self._recovered = (self.path, self.filename_prefix)
         self.set_filename(timestamp)
-        # Create File
-        # TODO add exception in case can't open file
-        # TODO specify number of bytes in buffer depending on instrument
-        self._file = open(os.path.join(self.path, self.filename), self.FILE_MODE)
+        # Create File, errors (e.g. disk full, see DiskMonitor) are raised to the writer which reports them
+        if self.compression:
+            self._file = COMPRESSIONS[self.compression][1](os.path.join(self.path, self.filename),
+                                                           self.FILE_MODE if 'b' in self.FILE_MODE else
+                                                           self.FILE_MODE + 't')
+        else:
+            self._file = open(os.path.join(self.path, self.filename), self.FILE_MODE, buffering=self.BUFFER_SIZE)
+        if 'b' not in self.FILE_MODE:
+            # Pass rows to the binary buffer as written so its position is the offset of the next row
+            self._file.reconfigure(write_through=True)
+        self._file_size = 0
+        if self.INDEX_SUPPORTED:
+            try:
+                self._index_file = open(self.index_filename, 'wb')
+            except OSError as e:
+                self.__logger.warning(f'Unable to create index of {self.filename}: {e}')
+            self._index_records, self._index_timestamp = 0, float('-inf')
         self.__logger.info('Open file %s' % self.filename)
         # Write header
         self.write_header()
+        if self.crash_safe:
+            self.mark()
         # Time file open
         self._file_timestamp = timestamp
-        if self.signal_new_file:
-            self.signal_new_file.emit()
+        self._file_start, self._file_end = self.file_period(timestamp)
+        self._rotate = False
 
     def _smart_open(self, timestamp):
-        # Open file if necessary
-        if self._file.closed or \
-                gmtime(self._file_timestamp).tm_mday != gmtime(timestamp).tm_mday or \
-                timestamp - self._file_timestamp >= self.file_length:
-            # Close previous file if open
-            if not self._file.closed:
-                self.close()
-            # Create new file
+        # Open file if necessary, or switch to next file at the end of the period of the file open
+        if self._file.closed:
             self.open(timestamp)
+        elif not self._file_start <= timestamp < self._file_end or self._rotate:
+            self.rotate(timestamp)
+
+    def _swap_file(self, state=None):
+        # Exchange attributes of file open with state given (default: no file open), return previous state
+        previous = {k: getattr(self, k) for k in self.FILE_STATE}
+        if state is None:
+            state = {'_file': type('obj', (object,), {'closed': True}),
+                     '_index_file': type('obj', (object,), {'closed': True})}
+        for k, v in state.items():
+            setattr(self, k, v)
+        return previous
 
-    def write(self, data, timestamp):
+    def prepare(self):
+        """
+        Open next file ahead of the end of the period of the file open, so switching files doesn't delay rows.
+        Called by the writer between writes, once the time of the rows gets within PREOPEN_TIME of the end.
+        """
+        if self._next is not None or self._file.closed:
+            return
+        start = self._file_end
+        current = self._swap_file()
+        try:
+            self._open(start)
+        finally:
+            self._next = self._swap_file(current)
+
+    def rotate(self, timestamp):
+        """
+        Switch from file open to next file, prepared ahead if available. The previous file is closed in the
+        background (see Closer) so rows written next are not delayed.
+        :param timestamp: date and time associated with the first row of next file
+        """
+        if self._next is not None and (timestamp >= self._next['_file_end'] or self._next['_file'].closed):
+            self._discard_next()  # Rows skipped period of next file (e.g. gap in data) or failed to open
+        self._retire()
+        if self._next is not None and timestamp >= self._next['_file_start']:
+            self._swap_file(self._next)
+            self._next = None
+            self.__logger.debug('Switch to file %s' % self.filename)
+            if self.signal_new_file:
+                self.signal_new_file.emit()
+        else:  # Rotation by size, or next file not prepared (e.g. synchronous logging)
+            self.open(timestamp)
+
+    def _discard_next(self):
+        # Close and remove next file prepared but not used
+        if self._next is None:
+            return
+        current = self._swap_file(self._next)
+        self._next = None
+        try:
+            for f in (self._file, self._index_file):
+                if not f.closed:
+                    f.close()
+            for filename in (os.path.join(self.path, self.filename), self.index_filename, self.marker):
+                if os.path.exists(filename):
+                    os.remove(filename)
+            self.__logger.debug('Discard file %s' % self.filename)
+        finally:
+            self._swap_file(current)
+
+    @property
+    def index_filename(self) -> str:
+        # Index of uncompressed file, compressed or not, is shared
+        return os.path.join(self.path, self.filename[:len(self.filename) - len(self.file_ext)] +
+                            self.FILE_EXT + '.' + self.INDEX_EXT)
+
+    def index(self, timestamp):
+        """
+        Add entry (time and offset of row about to be written) to index of file every INDEX_INTERVAL records
+        or INDEX_PERIOD seconds, whichever comes first
+        :param timestamp: date and time associated with the row
+        """
+        self._index_records += 1
+        if self._index_records >= self.INDEX_INTERVAL or not 0 <= timestamp - self._index_timestamp < self.INDEX_PERIOD:
+            offset = getattr(self._file, 'buffer', self._file).tell()
+            if not self._index_file.closed:
+                self._index_file.write(pack('<dQ', timestamp, offset))
+            self._index_records, self._index_timestamp = 0, timestamp
+            if self.max_size and offset >= self.max_size * 1048576:
+                self._rotate = True
+
+    def write(self, data, timestamp=None):
+        """
+        Write data to file, from background thread if asynchronous (data must not be modified afterwards)
+        :param data: data frame, type depends on logger
+        :param timestamp: date and time associated with the data frame
+        """
+        if self._writer is not None:
+            self._writer.submit(self._write, data, timestamp)
+        else:
+            self._write(data, timestamp)
+
+    def _write(self, data, timestamp):
         """
         Write data to file
         :param data: list of values
@@ -100,21 +818,162 @@ class Log:
         :return:
         """
         self._smart_open(timestamp)
-        if self.variable_precision:
-            self._file.write(strftime('%Y/%m/%d %H:%M:%S', gmtime(timestamp)) + ("%.3f" % timestamp)[-4:] +
-                             ', ' + ', '.join(p % d for p, d in zip(self.variable_precision, data)) + '\n')
-        else:
-            self._file.write(strftime('%Y/%m/%d %H:%M:%S', gmtime(timestamp)) + ("%.3f" % timestamp)[-4:] +
-                             ', ' + ', '.join(str(d) for d in data) + '\n')    
-  
+        self.index(timestamp)
+        self._file.write(self._formatter(data, timestamp))
+
+    def flush(self, fsync=False):
+        if not self._file.closed:
+            self._file.flush()
+            if not self._index_file.closed:
+                self._index_file.flush()
+            size = os.fstat(self._file.fileno()).st_size
+            self.bytes_written += size - self._file_size
+            self._file_size = size
+            if fsync:
+                os.fsync(self._file.fileno())
+                if self.crash_safe:
+                    self.mark()
+
+    def _flush(self, fsync=False):
+        # Flush from writer, preparing next file when the rows get close to the end of the file open
+        self.flush(fsync)
+        if self.PREOPEN_SUPPORTED and self._next is None and not self._file.closed and \
+                self._file_end - self._index_timestamp <= self.PREOPEN_TIME:
+            self.prepare()
+
+    @property
+    def marker(self) -> str:
+        return os.path.join(self.path, self.filename + '.' + self.MARKER_EXT)
+
+    def mark(self):
+        """
+        Record size of file committed to the disk in marker, replaced atomically (marker removed once file closed)
+        """
+        with open(self.marker + '.tmp', 'w') as f:
+            json.dump(self._marker_content(), f, default=_to_json)
+        os.replace(self.marker + '.tmp', self.marker)
+
+    def _marker_content(self) -> dict:
+        return {'size': os.fstat(self._file.fileno()).st_size}
+
+    @classmethod
+    def recover(cls, path, filename_prefix=''):
+        """
+        Recover files left open by a crash (e.g. power loss), identified by their marker. Data written after
+        the size marked at the last flush might be incomplete, it's truncated to the last complete record.
+        :param path: directory of log files
+        :param filename_prefix: prefix of files to recover
+        :return: list of files recovered
+        """
+        logger = logging.getLogger(cls.__name__)
+        recovered = []
+        if not os.path.isdir(path):
+            return recovered
+        exts = ['.' + cls.FILE_EXT + '.' + cls.MARKER_EXT] + \
+               ['.' + cls.FILE_EXT + v[0] + '.' + cls.MARKER_EXT for v in COMPRESSIONS.values()]
+        for marker in sorted(os.listdir(path)):
+            if not marker.startswith(filename_prefix + '_') or not any(marker.endswith(e) for e in exts):
+                continue
+            marker = os.path.join(path, marker)
+            filename = marker[:-len(cls.MARKER_EXT) - 1]
+            try:
+                with open(marker) as f:
+                    content = json.load(f)
+            except (OSError, ValueError):
+                content = {}  # Marker incomplete, nothing known to be committed
+            try:
+                if not os.path.exists(filename):
+                    pass
+                elif any(filename.endswith(v[0]) for v in COMPRESSIONS.values()):
+                    # Compressed streams can't be truncated, readers stop at the last complete block
+                    logger.warning(f'Recovered {os.path.basename(filename)} (compressed, not truncated)')
+                else:
+                    lost = cls.recover_file(filename, content)
+                    logger.warning(f'Recovered {os.path.basename(filename)} ({lost} bytes of incomplete data removed)')
+                os.remove(marker)
+                recovered.append(filename)
+            except (OSError, ValueError) as e:
+                logger.error(f'Unable to recover {os.path.basename(filename)}: {e}')
+        return recovered
+
+    @classmethod
+    def recover_file(cls, filename, marker):
+        """
+        Truncate text file after its last complete line (rows end with a new line)
+        :param filename: path to file
+        :param marker: content of marker, size of file committed at last flush
+        :return: number of bytes removed
+        """
+        with open(filename, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            committed = min(marker.get('size', 0), size)
+            f.seek(committed)
+            tail = f.read()
+            # Blocks allocated but not written before a power loss are read as zeros
+            end = tail.find(b'\x00')
+            if end != -1:
+                tail = tail[:end]
+            length = committed + tail.rfind(b'\n') + 1
+            f.truncate(length)
+        return size - length
+
     def close(self):
+        """
+        Close file, once all data queued is written
+        """
+        if self._writer is not None:
+            self._writer.stop(self._close)
+            if self._writer.calls:
+                self.__logger.debug(f'Writer latency mean: {self._writer.mean_latency * 1000:.2f} ms, '
+                                    f'max: {self._writer.max_latency * 1000:.2f} ms, '
+                                    f'max flush duration: {self._writer.max_flush_duration * 1000:.2f} ms')
+        else:
+            self._close()
+
+    def _close(self):
         if not self._file.closed:
-            self._file.close()
-            self.__logger.debug('Close file %s' % self.filename)
+            self._retire(background=False)
             self.set_filename()
             if self.signal_new_file:
                 self.signal_new_file.emit()
+        self._discard_next()
         self._file_timestamp = None
+        closer.join()  # Files are closed once close returns (e.g. to be moved)
+
+    def _retire(self, background=True):
+        """
+        Flush file open and hand it over to be closed, leaving no file open
+        :param background: close file from background thread (see Closer), otherwise wait for it to be closed
+        """
+        self.flush()
+        args = (self._file, self._index_file, os.path.join(self.path, self.filename),
+                self._writer is not None and self._writer.fsync != 'never',
+                None if self.compression else self.compress_closed)
+        self._swap_file()
+        if background:
+            closer.submit(args[2], self._close_file, *args)
+        else:
+            self._close_file(*args)
+
+    def _close_file(self, file, index_file, filename, fsync, compress_closed):
+        """
+        Synchronise file with the disk, close it and its index, remove its marker, and compress it
+        :param file: file object
+        :param index_file: index file object
+        :param filename: path to file
+        :param fsync: synchronise file with the disk before closing it
+        :param compress_closed: compression method, or None
+        """
+        if fsync:
+            os.fsync(file.fileno())
+        file.close()
+        if not index_file.closed:
+            index_file.close()
+        self.__logger.debug('Close file %s' % os.path.basename(filename))
+        if os.path.exists(filename + '.' + self.MARKER_EXT):
+            os.remove(filename + '.' + self.MARKER_EXT)
+        if compress_closed:
+            compressor.submit(filename, compress_closed)
 
 
 class LogBinary(Log):
@@ -127,16 +986,30 @@ class LogBinary(Log):
     def write_header(self):
         pass
 
-    def write(self, data, timestamp=None):
+    def _write(self, data, timestamp=None):
         if timestamp:
             self._smart_open(timestamp)
+            self.index(timestamp)
             self._file.write(data + pack('!d', timestamp))
         else:
             # Open file only if doesn't exist (keep in same file as previous bytes logged)
             if self._file.closed:
                 self.open(time())
             self._file.write(data)
-        # TODO Test unpacking (especially for ACS and HyperSAS)
+
+    @classmethod
+    def recover_file(cls, filename, marker):
+        """
+        Truncate binary file to the size committed at the last flush (frames have no delimiter to resume from)
+        :param filename: path to file
+        :param marker: content of marker, size of file committed at last flush
+        :return: number of bytes removed
+        """
+        with open(filename, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            length = min(marker.get('size', size), size)
+            f.truncate(length)
+        return size - length
 
 
 class LogText(Log):
@@ -152,7 +1025,7 @@ class LogText(Log):
         self._file.write('time, packet' + '\n')
         self._file.write('yyyy/mm/dd HH:MM:SS.fff, ' + self.ENCODING + '\n')
 
-    def write(self, data, timestamp):
+    def _write(self, data, timestamp):
         """
         Write raw ascii data to file
         :param data: typically a binary array of ascii characters
@@ -160,5 +1033,208 @@ class LogText(Log):
         :return:
         """
         self._smart_open(timestamp)
-        self._file.write(strftime('%Y/%m/%d %H:%M:%S', gmtime(timestamp)) + ("%.3f" % timestamp)[-4:] +
-                         ', ' + self.registration + data.decode(self.ENCODING, self.UNICODE_HANDLING) + '\n')
+        self.index(timestamp)
+        self._file.write(self._formatter.timestamp(timestamp) + ', ' + self.registration +
+                         data.decode(self.ENCODING, self.UNICODE_HANDLING) + '\n')
+
+
+class LogNumpy(Log):
+    """
+    Log products as records of fixed type in NumPy files (.npy), loaded in one call with
+        records = np.load(filename, mmap_mode='r')
+
+    Each record holds the time followed by every variable, scalar or array (e.g. spectrum), the shape of
+    the fields is set by the first record of each file and their name by variable_names. Numbers are
+    stored as 64-bit floats whatever the type of the first record, so floats following integers are kept.
+    The metadata (units, metadata of the instrument such as wavelengths, and an index of the time of every
+    INDEX_INTERVAL records) is appended after the records, see read_metadata. Records are written by chunks
+    and the header and metadata are updated with every chunk, so files are readable while being written.
+    """
+    FILE_EXT = 'npy'
+    FILE_MODE = 'wb'
+    COMPRESSION_SUPPORTED = False  # Files are updated in place and must remain memory mappable
+    INDEX_SUPPORTED = False  # Index of time of records is in metadata
+    PREOPEN_SUPPORTED = False  # Type of records of next file is set by its first record
+    CHUNK_LENGTH = 256  # records
+    INDEX_INTERVAL = 1024  # records
+    FOOTER_MAGIC = b'INLININO'
+    NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+    def __init__(self, *args, **kwargs):
+        self.metadata = dict()  # Instrument specific (e.g. wavelengths)
+        self._first_record = None
+        self._dtype = None
+        self._header_length = 0
+        self._chunk = None
+        self._chunk_length = 0  # records in chunk not yet written
+        self._records = 0  # records written to file
+        self._index = []
+        self._last_timestamp = None
+        super().__init__(*args, **kwargs)
+
+    def record_dtype(self, data):
+        """
+        Type of records from a list of values
+        :param data: list of values (scalars or arrays)
+        :return: numpy structured dtype
+        """
+        fields = [('time', 'f8')]
+        for i, value in enumerate(data):
+            name = self.variable_names[i] if i < len(self.variable_names) else 'var%d' % i
+            value = np.asarray(value)
+            if value.dtype.kind == 'b':
+                dtype = '?'
+            elif value.dtype.kind in 'iuf':
+                dtype = 'f8'  # Type of numbers can vary between records (e.g. 20 then 20.5)
+            else:
+                raise ValueError(f'Variable {name} of type {value.dtype} not supported in {self.FILE_EXT} files')
+            fields.append((name, dtype, value.shape) if value.shape else (name, dtype))
+        return np.dtype(fields)
+
+    def _npy_header(self, records):
+        if not self._header_length:
+            # Reserve space for largest number of records, aligned on 64 bytes as numpy does
+            length = len(self._encode_header(self._dtype, records)) + 20
+            self._header_length = length + (-length) % 64
+        return self._encode_header(self._dtype, records, self._header_length)
+
+    @classmethod
+    def _encode_header(cls, dtype, records, header_length=0):
+        header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % \
+                 (np.lib.format.dtype_to_descr(dtype), records)
+        header = header.ljust(header_length - len(cls.NPY_MAGIC) - 2 - 1) + '\n'
+        return cls.NPY_MAGIC + pack('<H', len(header)) + header.encode('latin1')
+
+    def _footer(self):
+        return self._encode_footer({'variable_names': ['time'] + list(self.variable_names),
+                                    'variable_units': ['s'] + list(self.variable_units),
+                                    'records': self._records, 'index': self._index, 'metadata': self.metadata})
+
+    @classmethod
+    def _encode_footer(cls, metadata):
+        metadata = json.dumps(metadata, default=_to_json).encode('utf-8')
+        return metadata + pack('<Q', len(metadata)) + cls.FOOTER_MAGIC
+
+    def write_header(self):
+        self._dtype = self.record_dtype(self._first_record)
+        self._header_length = 0
+        self._chunk = np.empty(self.CHUNK_LENGTH, self._dtype)
+        self._chunk_length, self._records, self._index = 0, 0, []
+        self._file.write(self._npy_header(0))
+        self._file.write(self._footer())
+
+    def _write(self, data, timestamp):
+        """
+        Append record to file
+        :param data: list of values (scalars or arrays)
+        :param timestamp: date and time associated with the data frame
+        """
+        self._first_record = data  # Type of records of a new file is set by its first record
+        self._smart_open(timestamp)
+        self._chunk[self._chunk_length] = (timestamp, *data)
+        if (self._records + self._chunk_length) % self.INDEX_INTERVAL == 0:
+            self._index.append([self._records + self._chunk_length, timestamp])
+        self._chunk_length += 1
+        if self._chunk_length == self.CHUNK_LENGTH:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        # Overwrite footer with records, then write updated footer and header
+        self._file.seek(self._header_length + self._records * self._dtype.itemsize)
+        self._file.write(self._chunk[:self._chunk_length].tobytes())
+        self._records += self._chunk_length
+        self._chunk_length = 0
+        self._file.write(self._footer())
+        self._file.truncate()
+        self._file.seek(0)
+        self._file.write(self._npy_header(self._records))
+        if self.max_size and self._header_length + self._records * self._dtype.itemsize >= self.max_size * 1048576:
+            self._rotate = True
+
+    def flush(self, fsync=False):
+        if not self._file.closed and self._chunk_length:
+            self._write_chunk()
+        super().flush(fsync)
+
+    def _close(self):
+        if not self._file.closed and self._chunk_length:
+            self._write_chunk()
+        super()._close()
+
+    def _marker_content(self) -> dict:
+        # Metadata to rebuild footer if overwritten by a crash
+        return {'size': os.fstat(self._file.fileno()).st_size,
+                'variable_names': ['time'] + list(self.variable_names),
+                'variable_units': ['s'] + list(self.variable_units), 'metadata': self.metadata}
+
+    @classmethod
+    def recover_file(cls, filename, marker):
+        """
+        Repair header and metadata of NumPy file. A crash while writing a chunk leaves the header with the
+        records of the previous chunk and the metadata partially overwritten. Records after the header's are
+        kept while their time is valid (finite and increasing), then the header and metadata are rewritten.
+        :param filename: path to file
+        :param marker: content of marker, metadata of file
+        :return: number of bytes removed
+        """
+        with open(filename, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(0)
+            if np.lib.format.read_magic(f) != (1, 0):
+                raise ValueError(f'Unsupported format of {filename}')
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+            offset = f.tell()
+            try:
+                metadata = cls.read_metadata(filename)
+                if metadata['records'] == shape[0] and \
+                        offset + shape[0] * dtype.itemsize + len(cls._encode_footer(metadata)) == size:
+                    return 0  # Crash after file was consistent
+            except (ValueError, KeyError):
+                metadata = {k: marker[k] for k in ['variable_names', 'variable_units', 'metadata'] if k in marker}
+            # Records after the header's are valid while their time increases
+            records = shape[0]
+            f.seek(offset)
+            time = np.frombuffer(f.read((size - offset) // dtype.itemsize * dtype.itemsize), dtype)['time']
+            with np.errstate(invalid='ignore'):
+                valid = np.isfinite(time[records:]) & \
+                        (np.diff(time[max(records - 1, 0):], prepend=[] if records else time[:1]) >= 0)
+            records += len(valid) if valid.all() else int(np.argmin(valid))
+            metadata['records'] = records
+            metadata['index'] = [[i, float(time[i])] for i in range(0, records, cls.INDEX_INTERVAL)]
+            f.seek(offset + records * dtype.itemsize)
+            f.write(cls._encode_footer(metadata))
+            f.truncate()
+            f.seek(0)
+            f.write(cls._encode_header(dtype, records, offset))
+            return max(0, size - f.seek(0, os.SEEK_END))
+
+    @classmethod
+    def read_metadata(cls, filename):
+        """
+        Read metadata appended after the records
+        :param filename: path to file
+        :return: dictionary with keys variable_names, variable_units, records, index ([record, time], ...),
+            and metadata (instrument specific)
+        """
+        with open(filename, 'rb') as f:
+            if f.seek(0, os.SEEK_END) < len(cls.FOOTER_MAGIC) + 8:
+                raise ValueError(f'No metadata in {filename}')
+            f.seek(-len(cls.FOOTER_MAGIC) - 8, os.SEEK_END)
+            length, magic = unpack('<Q8s', f.read(8 + len(cls.FOOTER_MAGIC)))
+            if magic != cls.FOOTER_MAGIC:
+                raise ValueError(f'No metadata in {filename}')
+            f.seek(-len(cls.FOOTER_MAGIC) - 8 - length, os.SEEK_END)
+            return json.loads(f.read(length).decode('utf-8'))
+
+    @classmethod
+    def read(cls, filename, mmap_mode='r'):
+        """
+        Read records and metadata
+        :param filename: path to file
+        :param mmap_mode: memory map records (see np.load), None to load them in memory
+        :return: numpy structured array of records and dictionary of metadata
+        """
+        metadata = cls.read_metadata(filename)
+        if not metadata['records']:  # Empty files can't be memory mapped
+            mmap_mode = None
+        return np.load(filename, mmap_mode=mmap_mode), metadata
@@ -0,0 +1,361 @@
+"""
+Read files logged by Inlinino back into the packets, or bytes, received from instruments
+
+Files compressed (gzip .gz or lzma .xz), while logged or afterwards, are decompressed on the fly.
+Compressed files truncated by a crash are read up to their last complete block.
+
+Records logged within a time range are read from the index written alongside each file
+(<file>.idx), without scanning the files, for example the raw packets of a cast:
+
+    for packet, timestamp in iter_range(glob('ACS301_*.bin'), t0, t1, registration, frame_length): ...
+
+Binary files are also read at once into a NumPy array of frames with read_bin, frames are located by
+vectorized operations on the file memory mapped (no loop over frames).
+"""
+import gzip
+import lzma
+import os
+import re
+from bisect import bisect_right
+from calendar import timegm
+from functools import lru_cache
+from struct import unpack_from
+
+import numpy as np
+
+
+TIMESTAMP_LENGTH = 23  # bytes, yyyy/mm/dd HH:MM:SS.fff
+RAW_SEPARATOR = b', '
+BIN_TIMESTAMP_LENGTH = 8  # bytes, big-endian double appended to each frame by LogBinary
+BIN_TIMESTAMP_RANGE = (946684800, 4102444800)  # 2000-01-01 to 2100-01-01, used to validate timestamps
+READ_SIZE = 1048576  # bytes
+BLOCK_SIZE = 67108864  # bytes, searched at once for registration bytes by find_frames
+COMPRESSION_SUFFIXES = {'.gz': gzip.open, '.xz': lzma.open}
+INDEX_SUFFIX = '.idx'
+INDEX_DTYPE = np.dtype([('time', '<f8'), ('offset', '<u8')])  # offset in uncompressed file of row at time
+FILENAME_TIME = re.compile(r'_(\d{8}_\d{6})(?:_\d+)?\.[^_]+$')  # <prefix>_<yyyymmdd>_<HHMMSS>[_n].<ext>
+
+
+def open_log(filename):
+    """
+    Open log file for reading in binary mode, decompressing it if needed
+    :param filename: path to file, compressed if it ends with a suffix of COMPRESSION_SUFFIXES
+    :return: file object
+    """
+    opener = COMPRESSION_SUFFIXES.get(os.path.splitext(filename)[1], open)
+    return opener(filename, 'rb')
+
+
+def log_file_ext(filename) -> str:
+    """
+    Extension of log file, regardless of compression (e.g. raw for both file.raw and file.raw.gz)
+    """
+    root, ext = os.path.splitext(filename)
+    if ext in COMPRESSION_SUFFIXES.keys():
+        root, ext = os.path.splitext(root)
+    return ext[1:]
+
+
+def index_filename(filename) -> str:
+    """
+    Index of log file, shared by file compressed or not (e.g. file.raw.idx for both file.raw and file.raw.gz)
+    """
+    root, ext = os.path.splitext(filename)
+    return (root if ext in COMPRESSION_SUFFIXES.keys() else filename) + INDEX_SUFFIX
+
+
+def read_index(filename) -> np.ndarray:
+    """
+    Read index of log file, entries beyond the end of file (e.g. file truncated after a crash) are removed
+    :param filename: path to log file (compressed or not) or to its index
+    :return: structured array of time and offset of rows, empty if file has no index
+    """
+    if not filename.endswith(INDEX_SUFFIX):
+        filename = index_filename(filename)
+    if not os.path.exists(filename):
+        return np.empty(0, INDEX_DTYPE)
+    with open(filename, 'rb') as f:
+        data = f.read()
+    index = np.frombuffer(data[:len(data) // INDEX_DTYPE.itemsize * INDEX_DTYPE.itemsize], INDEX_DTYPE)
+    log_filename = filename[:-len(INDEX_SUFFIX)]
+    if os.path.exists(log_filename):
+        index = index[index['offset'] < os.path.getsize(log_filename)]
+    return index
+
+
+def seek_offset(filename, timestamp) -> int:
+    """
+    Offset of last row indexed at or before timestamp, O(log n) binary search of index
+    :param filename: path to log file (compressed or not)
+    :param timestamp: date and time to seek
+    :return: offset in uncompressed file (0 if not indexed)
+    """
+    index = read_index(filename)
+    i = np.searchsorted(index['time'], timestamp, side='right') - 1
+    return int(index['offset'][i]) if i >= 0 else 0
+
+
+def log_start_time(filename) -> float:
+    """
+    Time at which log file was open, from its name (<prefix>_<yyyymmdd>_<HHMMSS>[_n].<ext>)
+    """
+    m = FILENAME_TIME.search(os.path.basename(filename))
+    if m is None:
+        raise ValueError(f'No date and time in name of {filename}')
+    t = m.group(1)
+    return timegm((int(t[0:4]), int(t[4:6]), int(t[6:8]), int(t[9:11]), int(t[11:13]), int(t[13:15])))
+
+
+@lru_cache(maxsize=64)
+def _day_to_epoch(day):
+    return timegm((int(day[0:4]), int(day[5:7]), int(day[8:10]), 0, 0, 0))
+
+
+def parse_timestamp(line) -> float:
+    """
+    Parse timestamp written by loggers (yyyy/mm/dd HH:MM:SS.fff, UTC)
+    :param line: bytes starting with timestamp
+    :return: seconds since epoch
+    """
+    return _day_to_epoch(bytes(line[0:10])) + int(line[11:13]) * 3600 + int(line[14:16]) * 60 + \
+        float(line[17:TIMESTAMP_LENGTH])
+
+
+def is_timestamped(line) -> bool:
+    return line[TIMESTAMP_LENGTH:TIMESTAMP_LENGTH + len(RAW_SEPARATOR)] == RAW_SEPARATOR and \
+        line[4:5] == b'/' and line[0:4].isdigit()
+
+
+def iter_raw(filename, registration=b'', start=0):
+    """
+    Iterate over packets logged in a raw text file (LogText, .raw)
+
+    Lines not starting with a timestamp are either part of the header or the continuation of
+    a packet spanning multiple lines. Note that bytes which could not be decoded when logged
+    were replaced and can't be recovered.
+    :param filename: path to raw file (compressed or not)
+    :param registration: bytes prepended to each packet by the logger (e.g. LISST)
+    :param start: offset of first packet read (see seek_offset)
+    :return: generator of (packet, timestamp), packets exclude registration and terminator
+    """
+    offset = TIMESTAMP_LENGTH + len(RAW_SEPARATOR)
+    packet, timestamp = None, None
+    with open_log(filename) as f:
+        f.seek(start)
+        for line in _iter_lines(f):
+            if is_timestamped(line):
+                if packet is not None:
+                    yield _trim_raw_packet(packet, registration), timestamp
+                packet, timestamp = [line[offset:]], parse_timestamp(line)
+            elif packet is not None:
+                packet.append(line)
+    if packet is not None:
+        yield _trim_raw_packet(packet, registration), timestamp
+
+
+def iter_csv(filename, start=0):
+    """
+    Iterate over rows logged in a product file (Log, .csv)
+    :param filename: path to csv file (compressed or not)
+    :param start: offset of first row read (see seek_offset)
+    :return: generator of (row, timestamp), rows are the values (str) following the timestamp
+    """
+    offset = TIMESTAMP_LENGTH + len(RAW_SEPARATOR)
+    with open_log(filename) as f:
+        f.seek(start)
+        for line in _iter_lines(f):
+            if is_timestamped(line):
+                yield line[offset:].rstrip(b'\r\n').decode('utf-8', 'replace'), parse_timestamp(line)
+
+
+def iter_records(filename, start=0, registration=b'', frame_length=None):
+    """
+    Iterate over records of a log file, by type of file: packets of raw files (see iter_raw), frames of binary files
+    (see iter_bin, requires frame_length), or rows of csv files (see iter_csv)
+    :param filename: path to log file (compressed or not)
+    :param start: offset of first record read (see seek_offset)
+    :param registration: bytes starting packets or frames
+    :param frame_length: length of frames of binary files including registration bytes
+    :return: generator of (record, timestamp)
+    """
+    ext = log_file_ext(filename)
+    if ext == 'raw':
+        return iter_raw(filename, registration, start=start)
+    elif ext == 'bin':
+        if frame_length is None:
+            raise ValueError('Length of frames required to read binary files')
+        return iter_bin(filename, registration, frame_length, start=start)
+    elif ext == 'csv':
+        return iter_csv(filename, start=start)
+    raise ValueError(f'File extension {ext} not supported')
+
+
+def iter_range(filenames, t0, t1, registration=b'', frame_length=None):
+    """
+    Iterate over records logged between t0 and t1 in a set of log files of an instrument (e.g. all the files
+    of a cruise). Files overlapping the range are found from the time in their names and reading starts at the
+    last entry of their index before t0, so only records close to the range are read. Timestamps of records
+    are assumed increasing (as logged by instruments).
+    :param filenames: paths to log files (compressed or not) in any order
+    :param t0: start of range (seconds since epoch)
+    :param t1: end of range (seconds since epoch, included)
+    :param registration: bytes starting packets or frames (see iter_records)
+    :param frame_length: length of frames of binary files including registration bytes
+    :return: generator of (record, timestamp)
+    """
+    files = sorted((log_start_time(f), f) for f in filenames)
+    starts = [t for t, _ in files]
+    for _, filename in files[max(bisect_right(starts, t0) - 1, 0):bisect_right(starts, t1)]:
+        for record, timestamp in iter_records(filename, seek_offset(filename, t0), registration, frame_length):
+            if timestamp > t1:
+                break
+            if timestamp >= t0:
+                yield record, timestamp
+
+
+def _iter_lines(f):
+    # Stop at the end of compressed streams truncated by a crash
+    try:
+        yield from f
+    except EOFError:
+        return
+
+
+def _read(f, size):
+    # Read what's available up to size so data preceding the truncation of a compressed stream is returned
+    try:
+        return f.read1(size)
+    except EOFError:
+        return b''
+
+
+def _trim_raw_packet(lines, registration):
+    packet = b''.join(lines)
+    if packet[-1:] == b'\n':  # Added by logger
+        packet = packet[:-1]
+    if registration and packet.startswith(registration):
+        packet = packet[len(registration):]
+    return packet
+
+
+def iter_bin(filename, registration, frame_length, read_size=READ_SIZE, start=0):
+    """
+    Iterate over bytes logged in a binary file (LogBinary, .bin)
+
+    Valid frames are logged followed by their timestamp, while other bytes (e.g. pad bytes
+    or corrupted frames) are logged as received without timestamp. Frames are located with their
+    registration bytes and the timestamp following them must be within BIN_TIMESTAMP_RANGE.
+    :param filename: path to binary file (compressed or not)
+    :param registration: bytes starting each frame
+    :param frame_length: length of frames including registration bytes
+    :param read_size: number of bytes read from file at once
+    :param start: offset of first frame read (see seek_offset)
+    :return: generator of (data, timestamp), data are the bytes received up to the end of a frame
+        (timestamps removed), bytes left after the last frame get the timestamp of the last frame
+    """
+    buffer, scan, timestamp = bytearray(), 0, None
+    with open_log(filename) as f:
+        f.seek(start)
+        while True:
+            chunk = _read(f, read_size)
+            if not chunk:
+                break
+            buffer.extend(chunk)
+            i = buffer.find(registration, scan)
+            while i != -1:
+                end = i + frame_length
+                if end + BIN_TIMESTAMP_LENGTH > len(buffer):
+                    break  # Wait for more data
+                candidate = unpack_from('!d', buffer, end)[0]
+                if BIN_TIMESTAMP_RANGE[0] <= candidate <= BIN_TIMESTAMP_RANGE[1]:
+                    timestamp = candidate
+                    yield bytes(buffer[:end]), timestamp
+                    del buffer[:end + BIN_TIMESTAMP_LENGTH]
+                    i = buffer.find(registration)
+                else:
+                    i = buffer.find(registration, i + 1)
+            # Resume search where it stopped (registration might be split between chunks)
+            scan = i if i != -1 else max(0, len(buffer) - len(registration) + 1)
+    if buffer and timestamp is not None:
+        yield bytes(buffer), timestamp
+
+
+def map_log(filename) -> np.ndarray:
+    """
+    Memory map log file, or read it if compressed
+    :param filename: path to file
+    :return: array of bytes (uint8)
+    """
+    if os.path.splitext(filename)[1] in COMPRESSION_SUFFIXES.keys():
+        with open_log(filename) as f:
+            return np.frombuffer(f.read(), np.uint8)
+    if not os.path.getsize(filename):
+        return np.empty(0, np.uint8)  # Empty files can't be memory mapped
+    return np.memmap(filename, np.uint8, 'r').view(np.ndarray)  # Mapping kept open by view
+
+
+def _rows(data, offsets, length):
+    # Copy bytes from each offset, row by row (overlapping view of data indexed by rows)
+    return np.lib.stride_tricks.as_strided(data, (max(len(data) - length + 1, 0), length),
+                                           (data.strides[0], data.strides[0]), writeable=False)[offsets]
+
+
+def find_frames(data, registration, frame_length, block_size=BLOCK_SIZE):
+    """
+    Locate frames followed by their timestamp in bytes logged by LogBinary, equivalent to iter_bin
+    :param data: array of bytes (uint8), see map_log
+    :param registration: bytes starting each frame
+    :param frame_length: length of frames including registration bytes
+    :param block_size: number of bytes searched at once for registration bytes (bounds memory used)
+    :return: offsets of frames (int64) and their timestamps (float64)
+    """
+    registration = np.frombuffer(registration, np.uint8)
+    n = len(data) - frame_length - BIN_TIMESTAMP_LENGTH + 1  # frames starting after don't fit
+    if n <= 0 or not len(registration):
+        return np.empty(0, np.int64), np.empty(0, np.float64)
+    # Candidates: first byte of registration, then filtered by the next ones
+    candidates = []
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = data[start:stop + len(registration) - 1]
+        c = np.flatnonzero(block[:stop - start] == registration[0])
+        for k in range(1, len(registration)):
+            c = c[block[c + k] == registration[k]]
+        candidates.append(c + start)
+    offsets = np.concatenate(candidates).astype(np.int64)
+    # Frames are followed by a valid timestamp
+    timestamps = _rows(data, offsets + frame_length, BIN_TIMESTAMP_LENGTH).view('>f8').ravel()
+    with np.errstate(invalid='ignore'):
+        valid = (BIN_TIMESTAMP_RANGE[0] <= timestamps) & (timestamps <= BIN_TIMESTAMP_RANGE[1])
+    offsets, timestamps = offsets[valid], timestamps[valid].astype(np.float64)
+    # Frames can't overlap (e.g. registration bytes within a frame), keep first ones as iter_bin does
+    span = frame_length + BIN_TIMESTAMP_LENGTH
+    while len(offsets) > 1:
+        overlap = np.diff(offsets) < span
+        if not overlap.any():
+            break
+        # Remove frames overlapping a frame which is not itself overlapping the previous one
+        drop = np.flatnonzero(overlap & ~np.concatenate(([False], overlap[:-1]))) + 1
+        offsets, timestamps = np.delete(offsets, drop), np.delete(timestamps, drop)
+    return offsets, timestamps
+
+
+def read_bin(filename, registration, frame_length, dtype=None):
+    """
+    Read all frames logged in a binary file (LogBinary, .bin) at once, bytes not part of frames are ignored
+    :param filename: path to binary file (memory mapped if not compressed)
+    :param registration: bytes starting each frame
+    :param frame_length: length of frames including registration bytes
+    :param dtype: structured type of frames, of size frame_length (default: frame_length bytes)
+    :return: structured array with fields time (float64) and frame (dtype)
+    """
+    dtype = np.dtype((np.uint8, (frame_length,)) if dtype is None else dtype)
+    if dtype.itemsize != frame_length:
+        raise ValueError(f'Size of type ({dtype.itemsize}) differs from frame length ({frame_length})')
+    data = map_log(filename)
+    offsets, timestamps = find_frames(data, registration, frame_length)
+    records = np.empty(len(offsets), [('time', np.float64), ('frame', dtype)])
+    records['time'] = timestamps
+    frames = _rows(data, offsets, frame_length)
+    records['frame'] = frames.view(dtype).reshape(len(offsets)) if dtype.names else frames
+    return records
@@ -0,0 +1,149 @@
+"""
+Replay files logged by Inlinino through the processing path of an instrument
+
+Bytes are fed to Instrument.data_received with their original timestamps, hence packets are
+framed, parsed, and logged (if enabled) exactly as when received from the instrument. No interface
+is opened and the user interface is optional, which allows to regenerate product files
+(e.g. after a calibration update) or to benchmark the throughput of instrument modules.
+
+    python -m inlinino.replay <cfg_id> <file.raw|file.bin> [...] [--speed N] [--log-products] [--log-raw]
+                              [--start "yyyy/mm/dd HH:MM:SS"] [--end "yyyy/mm/dd HH:MM:SS"]
+"""
+import argparse
+import logging
+from calendar import timegm
+from time import time, sleep, strptime
+from inlinino.log import LogText, LogBinary
+from inlinino.readers import iter_raw, iter_bin, log_file_ext, seek_offset
+
+
+class Replay:
+    """
+    Replay raw (.raw) or binary (.bin) files of an instrument at real time, N times real time, or
+    as fast as possible (speed=None)
+    """
+    def __init__(self, instrument, speed=None):
+        """
+        :param instrument: instrument (not opened) which logged the files
+        :param speed: replay speed relative to real time (1: real time, 10: ten times faster,
+            None or 0: as fast as possible)
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.instrument = instrument
+        self.speed = speed
+        self.alive = False
+
+    def iter_file(self, filename, t0=None, t1=None):
+        """
+        Read file logged by instrument
+        :param filename: path to raw or binary file, compressed or not (.gz or .xz)
+        :param t0: start of time range read (seconds since epoch), reading starts from index of file
+        :param t1: end of time range read (seconds since epoch, included)
+        :return: generator of (data, timestamp) as received from instrument
+        """
+        ext = log_file_ext(filename)
+        start = seek_offset(filename, t0) if t0 is not None else 0
+        if ext == LogText.FILE_EXT:
+            registration = getattr(self.instrument._log_raw, 'registration', '')
+            terminator = self.instrument._terminator
+            data = ((packet + terminator, timestamp) for packet, timestamp in
+                    iter_raw(filename, registration.encode(LogText.ENCODING), start=start))
+        elif ext == LogBinary.FILE_EXT:
+            if not hasattr(self.instrument, 'frame_length'):
+                raise ValueError(f'Instrument {self.instrument.name} does not support replay of binary files')
+            data = iter_bin(filename, self.instrument._terminator, self.instrument.frame_length, start=start)
+        else:
+            raise ValueError(f'File extension {ext} not supported')
+        for d, timestamp in data:
+            if t1 is not None and timestamp > t1:
+                break
+            if t0 is None or timestamp >= t0:
+                yield d, timestamp
+
+    def run(self, filenames, log_raw=False, log_products=False, t0=None, t1=None):
+        """
+        Replay files, blocking until all files are replayed or stop is called
+        :param filenames: list of path to files logged by instrument, replayed in order
+        :param log_raw: log raw data replayed (into instrument log path)
+        :param log_products: log products of data replayed (into instrument log path)
+        :param t0: replay data logged from t0 only (seconds since epoch)
+        :param t1: replay data logged until t1 only (seconds since epoch)
+        :return: dictionary of statistics
+        """
+        if self.instrument.alive:
+            raise RuntimeError('Instrument must be closed to replay data')
+        log_raw_enabled, log_prod_enabled = self.instrument.log_raw_enabled, self.instrument.log_prod_enabled
+        if log_raw or log_products:
+            self.instrument.log_raw_enabled, self.instrument.log_prod_enabled = log_raw, log_products
+            self.instrument.log_start()
+        stats = {'files': 0, 'chunks': 0, 'bytes': 0}
+        self.alive = True
+        start, first_timestamp = time(), None
+        try:
+            for filename in filenames:
+                self.logger.info(f'Replay {filename}')
+                self.instrument.reset_buffers()
+                for data, timestamp in self.iter_file(filename, t0, t1):
+                    if not self.alive:
+                        break
+                    if self.speed:
+                        if first_timestamp is None:
+                            first_timestamp = timestamp
+                        delay = (timestamp - first_timestamp) / self.speed - (time() - start)
+                        if delay > 0:
+                            sleep(delay)
+                    self.instrument.data_received(data, timestamp)
+                    stats['chunks'] += 1
+                    stats['bytes'] += len(data)
+                stats['files'] += 1
+                if not self.alive:
+                    break
+        finally:
+            self.alive = False
+            if log_raw or log_products:
+                self.instrument.log_stop()
+                self.instrument.log_raw_enabled, self.instrument.log_prod_enabled = log_raw_enabled, log_prod_enabled
+        stats['elapsed'] = time() - start
+        if getattr(self.instrument.signal, 'headless', False):
+            snapshot = self.instrument.signal.snapshot()
+            stats['packets_received'] = snapshot.packets_received
+            stats['packets_corrupted'] = snapshot.packets_corrupted
+        return stats
+
+    def stop(self):
+        self.alive = False
+
+
+def parse_time(value) -> float:
+    return timegm(strptime(value, '%Y/%m/%d %H:%M:%S'))
+
+
+def main():
+    from inlinino.acquisition import AcquisitionManager
+    from inlinino.signals import HeadlessSignals
+
+    parser = argparse.ArgumentParser(prog='python -m inlinino.replay', description='Replay files logged by Inlinino.')
+    parser.add_argument('cfg_id', type=int, help='index of instrument in configuration')
+    parser.add_argument('filenames', nargs='+', help='raw (.raw) or binary (.bin) files logged by instrument, compressed or not (.gz, .xz)')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='replay speed relative to real time (default: as fast as possible)')
+    parser.add_argument('--log-raw', action='store_true', help='log raw data replayed')
+    parser.add_argument('--log-products', action='store_true', help='log products of data replayed')
+    parser.add_argument('--log-path', default=None, help='directory of files logged (default: instrument log_path)')
+    parser.add_argument('--start', type=parse_time, default=None,
+                        help='replay data logged from "yyyy/mm/dd HH:MM:SS" (UTC) only')
+    parser.add_argument('--end', type=parse_time, default=None,
+                        help='replay data logged until "yyyy/mm/dd HH:MM:SS" (UTC) only')
+    args = parser.parse_args()
+
+    instrument = AcquisitionManager(HeadlessSignals).load(args.cfg_id)
+    if args.log_path is not None:
+        instrument.log_update_cfg({'path': args.log_path})
+    stats = Replay(instrument, args.speed).run(args.filenames, args.log_raw, args.log_products, args.start, args.end)
+    print(f"Replayed {stats['bytes']} bytes from {stats['files']} file(s) in {stats['elapsed']:.3f} s "
+          f"({stats['bytes'] / max(stats['elapsed'], 1e-9) / 1e6:.2f} MB/s), "
+          f"{stats['packets_received']} packets received, {stats['packets_corrupted']} corrupted")
+
+
+if __name__ == '__main__':
+    main()
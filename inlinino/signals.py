@@ -0,0 +1,107 @@
+from collections import deque, namedtuple
+from threading import Lock
+
+
+SignalsSnapshot = namedtuple('SignalsSnapshot', ['packets_received', 'packets_corrupted', 'packets_logged',
+                                                 'data', 'aux_data'])
+
+
+class CounterSignal:
+    """
+    Count emissions instead of delivering them, count is reset when popped
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._count = 0
+
+    def emit(self):
+        with self._lock:
+            self._count += 1
+
+    def pop(self) -> int:
+        with self._lock:
+            count, self._count = self._count, 0
+        return count
+
+
+class BufferedSignal:
+    """
+    Keep arguments of the last maxlen emissions until popped
+    """
+    def __init__(self, maxlen=None):
+        self._buffer = deque(maxlen=maxlen)
+
+    def emit(self, *args):
+        self._buffer.append(args)  # deque.append and deque.popleft are thread-safe
+
+    def pop(self) -> list:
+        items = []
+        for _ in range(len(self._buffer)):
+            items.append(self._buffer.popleft())
+        return items
+
+
+class LatestSignal:
+    """
+    Keep arguments of the last emission only until popped
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._args = None
+
+    def emit(self, *args):
+        with self._lock:
+            self._args = args
+
+    def pop(self):
+        with self._lock:
+            args, self._args = self._args, None
+        return args
+
+
+class CoalescedSignals:
+    """
+    High rate instrument signals gathered in a thread-safe snapshot polled by the user interface
+
+    Instruments emit packet_received, packet_corrupted, packet_logged, new_data, and new_aux_data
+    from their processing thread. Instead of being delivered one by one, counters and values are
+    accumulated until the user interface takes a snapshot, typically at a fixed refresh rate,
+    making the cost of the user interface independent of the packet rate.
+    """
+    def __init__(self, data_maxlen=None):
+        self.packet_received = CounterSignal()
+        self.packet_corrupted = CounterSignal()
+        self.packet_logged = CounterSignal()
+        self.new_data = BufferedSignal(data_maxlen)  # all (data, timestamp) since last snapshot
+        self.new_aux_data = LatestSignal()  # last (aux_data,) since last snapshot
+
+    def snapshot(self) -> SignalsSnapshot:
+        aux_data = self.new_aux_data.pop()
+        return SignalsSnapshot(self.packet_received.pop(), self.packet_corrupted.pop(), self.packet_logged.pop(),
+                               self.new_data.pop(), aux_data[0] if aux_data is not None else None)
+
+
+class NullSignal:
+    """
+    Discard emissions, used in place of user interface signals when running without user interface
+    """
+    def emit(self, *args):
+        pass
+
+    def connect(self, slot):
+        pass
+
+
+class HeadlessSignals(CoalescedSignals):
+    """
+    Instrument signals without user interface
+
+    Packet counters are kept (and can be read with snapshot) while only the latest data is retained.
+    Instruments check the headless attribute to skip creating their own plots.
+    """
+    headless = True
+
+    def __init__(self, data_maxlen=1):
+        super().__init__(data_maxlen)
+        self.status_update = NullSignal()
+        self.alarm = NullSignal()
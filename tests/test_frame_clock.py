@@ -0,0 +1,103 @@
+"""
+Timestamps of ACS frames from the instrument counter (timestamp_source counter), from reception of the
+bytes (data_received) to the data signaled (handle_data), and steps back of the host clock
+"""
+import os
+import tempfile
+import unittest
+from struct import pack
+
+import numpy as np
+
+from inlinino import CFG, package_dir
+from inlinino.acquisition import AcquisitionManager
+from inlinino.instruments import FrameClock
+from inlinino.signals import BufferedSignal, HeadlessSignals
+
+DEVICE_FILE = os.path.join(package_dir, 'cfg', 'acs301_20180129.dev')
+BYTE_DURATION = 10 / 115200  # seconds, serial line at 115200 bauds
+PERIOD = 0.25  # seconds, between frames sampled
+
+
+def load_acs():
+    cfg = dict(model='Test', serial_number='ACS', module='acs', device_file=DEVICE_FILE,
+               log_path=tempfile.mkdtemp(prefix='inlinino_test_'), log_raw=False, log_products=False)
+    CFG.instruments.append(cfg)
+    try:
+        return AcquisitionManager(HeadlessSignals).load(len(CFG.instruments) - 1)
+    finally:
+        CFG.instruments.pop()
+
+
+def acs_frame(parser, registration, counter):
+    n = parser.output_wavelength
+    header = pack('!HBBlHHHHHHHIBB', parser.frame_length, 5, 1, int(parser.serial_number, 16),
+                  1520, 0, 1510, 32000, 48000, 1530, 1540, counter, 1, n)
+    frame = registration + header + b''.join(pack('!HHHH', 2800, 2500, 2700, 2400) for _ in range(n))
+    return frame + pack('!H', sum(frame) % 65536) + b'\x00'
+
+
+class TestCounterTimestamps(unittest.TestCase):
+
+    def test_data_received_to_handle_data(self):
+        instrument = load_acs()
+        instrument.timestamp_source = 'counter'
+        instrument._clock = FrameClock(BYTE_DURATION, instrument.COUNTER_SCALE)
+        instrument.signal.new_data = BufferedSignal()
+        received = []
+        handle_packet = instrument.handle_packet
+
+        def spy(packet, timestamp):
+            received.append(timestamp)
+            handle_packet(packet, timestamp)
+        instrument.handle_packet = spy
+
+        # Frames sampled every PERIOD, transmitted, then read by chunks of 1 to 3 frames with a random delay
+        rng = np.random.default_rng(0)
+        t0, k, sampled = 1615809600.0, 0, []
+        while k < 400:
+            frames = []
+            for _ in range(rng.integers(1, 4)):
+                frames.append(acs_frame(instrument._parser, instrument.REGISTRATION_BYTES, 123456 + 250 * k))
+                sampled.append(t0 + PERIOD * k)
+                k += 1
+            chunk = b''.join(frames)
+            instrument.data_received(chunk, sampled[-1] + len(frames[-1]) * BYTE_DURATION + rng.uniform(0, 0.1))
+        timestamps = np.array([t for _, t in instrument.signal.new_data.pop()])
+        received, sampled = np.array(received), np.array(sampled)
+
+        self.assertEqual(len(timestamps), len(sampled))
+        # Time of sampling is before reception and follows the instrument clock, not the jitter of reads
+        self.assertFalse(np.array_equal(timestamps, received))
+        self.assertTrue(np.all(timestamps <= received))
+        self.assertLess(np.max(np.abs(np.diff(timestamps[50:]) - PERIOD)), 0.005)
+        self.assertGreater(np.max(np.abs(np.diff(received) - PERIOD)), 0.02)
+        # Offset to sampling is the transmission delay of the least delayed frames
+        delay = instrument._parser.frame_length * BYTE_DURATION
+        self.assertLess(np.max(np.abs(timestamps[50:] - sampled[50:] - delay)), 0.01)
+
+
+class TestHostClockStep(unittest.TestCase):
+
+    def test_spread(self):
+        clock, t0 = FrameClock(10 / 19200), 1615809600.0
+        # Frames spread back within a read don't go below previous frame
+        self.assertEqual(clock.spread(t0, 0), t0)
+        self.assertEqual(clock.spread(t0 + 0.01, 96), t0)
+        self.assertEqual(clock.spread(t0 + 0.01, 0), t0 + 0.01)
+        # Host clock stepped back, host time is followed again
+        self.assertEqual(clock.spread(t0 - 3600, 0), t0 - 3600)
+        self.assertEqual(clock.spread(t0 - 3000, 0), t0 - 3000)
+        self.assertEqual(clock.spread(t0 - 3000 + 1, 192), t0 - 3000 + 1 - 0.1)
+
+    def test_counter(self):
+        clock, t0 = FrameClock(10 / 19200, 0.001), 1615809600.0
+        for k in range(10):
+            clock.from_counter(1000 * k, clock.spread(t0 + k + 0.05, 0))
+        timestamps = [clock.from_counter(1000 * k, clock.spread(t0 - 3600 + k + 0.05, 0)) for k in range(10, 20)]
+        self.assertEqual(timestamps[0], t0 - 3600 + 10.05)
+        np.testing.assert_allclose(np.diff(timestamps), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+"""
+Records of NumPy product files (LogNumpy) keep values when the type of numbers varies between records
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from inlinino.log import LogNumpy
+
+
+class TestLogNumpy(unittest.TestCase):
+
+    def test_int_then_float(self):
+        path = tempfile.mkdtemp(prefix='inlinino_test_')
+        log = LogNumpy(dict(path=path, filename_prefix='Test', variable_names=['x', 'spectrum'],
+                            variable_units=['', ''], asynchronous=False))
+        t0 = 1615809600.0
+        log.write([20, np.array([1, 2])], t0)
+        log.write([20.5, np.array([1.25, 2.5])], t0 + 1)
+        filename = os.path.join(path, log.filename)
+        log.close()
+        records, _ = LogNumpy.read(filename, mmap_mode=None)
+        np.testing.assert_array_equal(records['time'], [t0, t0 + 1])
+        np.testing.assert_array_equal(records['x'], [20, 20.5])
+        np.testing.assert_array_equal(records['spectrum'], [[1, 2], [1.25, 2.5]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+Writer thread of loggers (LogWriter): periodic flush under continuous load and stop with a blocked disk
+"""
+import unittest
+from threading import Event
+from time import sleep, time
+
+from inlinino.log import LogWriter
+
+
+class TestLogWriter(unittest.TestCase):
+
+    def test_flush_under_load(self):
+        flushes = []
+        writer = LogWriter('test writer', lambda fsync: flushes.append(time()), flush_interval=0.05)
+        # Calls are queued faster than they're executed, the queue never empties
+        writer.submit(sleep, 0.001)
+        for _ in range(500):
+            writer.submit(sleep, 0.001)
+        self.assertGreater(writer._queue.qsize(), 0)
+        start = time()
+        self.assertTrue(writer.stop())
+        self.assertGreater(len(flushes), 0.5 * (time() - start) / writer.flush_interval)
+
+    def test_stop_blocked(self):
+        blocked, closed = Event(), []
+        writer = LogWriter('test writer', lambda fsync: None)
+        writer.STOP_TIMEOUT = 0.2
+        writer.submit(blocked.wait)
+        start = time()
+        self.assertFalse(writer.stop(closed.append, True))
+        self.assertLess(time() - start, 1)
+        # Calls queued are executed and thread stops once unblocked
+        thread = writer._thread
+        blocked.set()
+        thread.join(1)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(closed, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Circular RingBuffer against the original implementation based on numpy.roll, and edge cases
+"""
+import unittest
+
+import numpy as np
+
+from inlinino import History, RingBuffer
+
+
+class RollingBuffer:
+    # Original implementation of RingBuffer
+    def __init__(self, length):
+        self.data = np.full(length, np.nan)
+
+    def extend(self, x):
+        x = np.array(x)
+        self.data = np.roll(self.data, -x.size)
+        self.data[-x.size:] = x
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_same_as_roll(self):
+        rng = np.random.default_rng(0)
+        for length in (1, 5, 240):
+            reference, buffer = RollingBuffer(length), RingBuffer(length)
+            for _ in range(50):
+                x = rng.random(rng.integers(1, length + 1))
+                reference.extend(x)
+                buffer.extend(x)
+                for n in (1, max(length // 2, 1), length):
+                    np.testing.assert_array_equal(buffer.get(n), reference.data[-n:])
+                    np.testing.assert_array_equal(buffer.getleft(n), reference.data[:n])
+                np.testing.assert_array_equal(buffer.data, reference.data)
+
+    def test_edge_cases(self):
+        buffer = RingBuffer(4)
+        buffer.extend([1, 2, 3, 4, 5, 6])  # more values than length
+        np.testing.assert_array_equal(buffer.data, [3, 4, 5, 6])
+        self.assertEqual(len(buffer.get(0)), 0)  # whole buffer with the original implementation
+        self.assertEqual(len(buffer.getleft(0)), 0)
+        np.testing.assert_array_equal(buffer.get(10), [3, 4, 5, 6])  # bounded by length
+
+    def test_copy(self):
+        buffer = RingBuffer(4)
+        buffer.extend([1, 2])
+        buffer.get(2)[:] = 0  # view, not wrapping
+        buffer.get(2, copy=True)[:] = 1
+        np.testing.assert_array_equal(buffer.get(2), [0, 0])
+
+    def test_channels(self):
+        buffer = RingBuffer(3, _channels=2)
+        for k in range(5):
+            buffer.extend([k, 10 + k])
+        np.testing.assert_array_equal(buffer.get(2), [[3, 13], [4, 14]])
+
+
+class TestHistory(unittest.TestCase):
+
+    def test_empty_period(self):
+        history = History(8, 2)
+        history.extend([1, 2], 10)
+        timestamp, values = history.get(20)
+        self.assertEqual(len(timestamp), 0)
+        self.assertEqual(values.shape, (0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()